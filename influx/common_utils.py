@@ -1,22 +1,32 @@
 '''
 Utilities common across all pipelines
 '''
+import functools
 import json
 import math
-import matplotlib.patches as mpatches
-import matplotlib.pyplot as plt
 import numpy as np
 import os
-import pandas as pd
 import re
-import seaborn as sns
-import yaml
 
 
-# Import config of default paths to use for pipeline process
+# Config of default paths to use for pipeline process. It is read on first use rather than at import, and plotting
+# libraries are imported inside the visualization functions, so that importing this module stays cheap.
 script_dir = os.path.dirname(os.path.abspath(__file__))
-with open(f"{script_dir}/config.yaml", "r") as f:
-    config = yaml.safe_load(f)
+CONFIG_PATH = f"{script_dir}/config.yaml"
+
+@functools.lru_cache(maxsize=None)
+def get_config():
+    import yaml
+
+    with open(CONFIG_PATH, "r") as f:
+        return yaml.safe_load(f)
+
+def __getattr__(name):
+    # Keeps `from common_utils import config` working for scripts outside lut_creation, which load the config when they
+    # import it; library modules call get_config() where the config is needed instead
+    if name == 'config':
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 ### OS UTILS
@@ -45,6 +55,10 @@ def flag_missing(flag_name, flags_dir, skip_if_exists=True):
     return not (os.path.isfile(os.path.join(flags_dir, flag_name)) and skip_if_exists)
 
 ### GETTING EXPERIMENT NAMES
+# Setting indices and lens in experiment names, e.g. real_exp_zoom_<i>_focus_distance_<j>_<lens>
+EXP_NAME_IDXS_PATTERN = re.compile(r'zoom_(\d+)_focus_distance_(\d+)')
+EXP_NAME_LENS_PATTERN = re.compile(r'focus_distance_\d+_([^_]+)')
+
 def get_param_string(focal_length_idx, focus_distance_idx):
     return f'zoom_{focal_length_idx}_focus_distance_{focus_distance_idx}'
 
@@ -65,25 +79,48 @@ def get_synth_drone_exp_name(focal_length_mm, focus_distance_m, lens, settings_p
 ### EXPERIMENT NAME <----> EXPERIMENT SETTINGS <----> SETTINGS INDICES
 def get_exp_settings_filename(lens, empirical_mode, settings_path=None):
     if not settings_path:
-        settings_dir = config['LENS_SETTINGS_DIR'] if empirical_mode else config['LENS_SETTINGS_DIR_SYNTH']
+        settings_dir = get_config()['LENS_SETTINGS_DIR'] if empirical_mode else get_config()['LENS_SETTINGS_DIR_SYNTH']
         suffix = '_synth' if not empirical_mode else ''
         settings_path = f"{settings_dir}/{lens}{suffix}.json"
 
     return settings_path
 
-def get_exp_settings_by_lens(lens, empirical_mode, settings_path=None):
+# Parsed settings files by path, with the (mtime, size) of the file when it was parsed
+_exp_settings_cache = {}
+
+def load_exp_settings(path):
     '''
-    Returns all experiment settings for the specified lens and empirical mode option. If settings_path is provided, it overrides the settings location retrieved.
+    Returns (focal_lengths_mm, focus_distances_mm, exp_details) of a settings file, parsing it only if it changed since it
+    was last loaded. The arrays are read-only, and exp_details is shared between callers and must not be modified.
     '''
-    path = get_exp_settings_filename(lens, empirical_mode, settings_path=settings_path)
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _exp_settings_cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
 
     with open(path, "r") as f:
         obj = json.load(f)
-        focal_lengths_mm = np.array(obj["zooms"])
-        focus_distances_mm = np.array(obj["focus_distances"])
+        focal_lengths_mm = np.array(obj["zooms"]).astype(np.float64)
+        focus_distances_mm = np.array(obj["focus_distances"]).astype(np.float64)
         exp_details = obj["exp_details"]
 
-    return focal_lengths_mm.astype(np.float64), focus_distances_mm.astype(np.float64), exp_details
+    focal_lengths_mm.flags.writeable = False
+    focus_distances_mm.flags.writeable = False
+
+    settings = (focal_lengths_mm, focus_distances_mm, exp_details)
+    _exp_settings_cache[key] = (signature, settings)
+    return settings
+
+def get_exp_settings_by_lens(lens, empirical_mode, settings_path=None):
+    '''
+    Returns all experiment settings for the specified lens and empirical mode option. If settings_path is provided, it overrides the settings location retrieved.
+    Settings are cached until the settings file changes; the returned arrays are read-only, and the exp_details dict must not be modified.
+    '''
+    path = get_exp_settings_filename(lens, empirical_mode, settings_path=settings_path)
+    return load_exp_settings(path)
 
 def get_settings_by_exp_name(exp_name, settings_path=None):
     '''
@@ -91,7 +128,7 @@ def get_settings_by_exp_name(exp_name, settings_path=None):
     NOTE: this assumes that real appears in real experiment names, and synth appears in synthetic experiment names!
     '''
     param_string = re.search(r'(zoom_\d+_focus_distance_\d+)', exp_name).group(1)
-    lens = re.search(r'focus_distance_\d+_([^_]+)', exp_name).group(1)
+    lens = EXP_NAME_LENS_PATTERN.search(exp_name).group(1)
     empirical_mode = 'real' in exp_name
 
     _, _, all_exp_details = get_exp_settings_by_lens(lens, empirical_mode, settings_path=settings_path)
@@ -102,21 +139,34 @@ def get_settings_by_exp_name(exp_name, settings_path=None):
         raise Exception(f"No exp_details entry for {param_string}. This should not happen.")
 
 def get_idxs_by_exp_name(exp_name):
-    zoom_idx, focus_idx = map(int, re.search(r'zoom_(\d+)_focus_distance_(\d+)', exp_name).groups())
+    zoom_idx, focus_idx = map(int, EXP_NAME_IDXS_PATTERN.search(exp_name).groups())
     return zoom_idx, focus_idx
 
 def get_idxs_snapping_to_settings(focal_length_mm, focus_distance_m, lens, empirical_mode, settings_path=None, verbose=False):
+    '''
+    Returns the indices of the settings closest to the given focal lengths and focus distances. Accepts scalars, returning
+    scalar indices, or arrays of queries, returning index arrays of their broadcast shape.
+    '''
     # find settings that these are closest to those in the lens metadata file
     # NOTE: we are correctly using focus_distance here, not pinhole_to_obj
     # NOTE: indices should match regardless of empirical mode; only thing that changes is board size
+    focal_length_mm, focus_distance_m = np.broadcast_arrays(np.asarray(focal_length_mm, dtype=np.float64), np.asarray(focus_distance_m, dtype=np.float64))
     focus_distance_mm = focus_distance_m * 1000
     focal_lengths_mm, focus_distances_mm, _ = get_exp_settings_by_lens(lens, empirical_mode, settings_path=settings_path)
-    focal_length_idx = np.argmin(np.abs(focal_lengths_mm - focal_length_mm))
-    focus_distance_idx = np.argmin(np.abs(focus_distances_mm - focus_distance_mm))
+
+    # Nearest setting of every query at once; ties go to the first setting
+    focal_length_idx = np.argmin(np.abs(focal_lengths_mm - focal_length_mm[..., None]), axis=-1)
+    focus_distance_idx = np.argmin(np.abs(focus_distances_mm - focus_distance_mm[..., None]), axis=-1)
     if verbose:
         print("Snapping settings:")
-        print(f"\t{focal_length_mm}mm --> {focal_lengths_mm[focal_length_idx]}mm")
-        print(f"\t{focus_distance_mm}mm --> {focus_distances_mm[focus_distance_idx]}mm")
+        for query_focal_length_mm, query_focus_distance_mm, query_focal_length_idx, query_focus_distance_idx in zip(
+            focal_length_mm.reshape(-1), focus_distance_mm.reshape(-1), focal_length_idx.reshape(-1), focus_distance_idx.reshape(-1)
+        ):
+            print(f"\t{query_focal_length_mm}mm --> {focal_lengths_mm[query_focal_length_idx]}mm")
+            print(f"\t{query_focus_distance_mm}mm --> {focus_distances_mm[query_focus_distance_idx]}mm")
+
+    if focal_length_idx.ndim == 0:
+        return focal_length_idx[()], focus_distance_idx[()]
     return focal_length_idx, focus_distance_idx
 
 def get_param_string_by_zoom_and_focus(focal_length_mm, focus_distance_mm, lens, empirical_mode, settings_path=None):
@@ -126,21 +176,21 @@ def get_param_string_by_zoom_and_focus(focal_length_mm, focus_distance_mm, lens,
 
 ### RETRIEVING LENSES, CAMERAS, AND DISTORTION INFO
 def get_lens_info(lens):
-    assert lens in config['lenses'].keys()
-    min_lens_focal_length = config['lenses'][lens]['min_lens_focal_length']
-    max_lens_focal_length = config['lenses'][lens]['max_lens_focal_length']
-    min_focus_distance = config['lenses'][lens]['min_focus_distance']
-    lens_name = config['lenses'][lens]['lens_name']
+    assert lens in get_config()['lenses'].keys()
+    min_lens_focal_length = get_config()['lenses'][lens]['min_lens_focal_length']
+    max_lens_focal_length = get_config()['lenses'][lens]['max_lens_focal_length']
+    min_focus_distance = get_config()['lenses'][lens]['min_focus_distance']
+    lens_name = get_config()['lenses'][lens]['lens_name']
 
     return min_lens_focal_length, max_lens_focal_length, min_focus_distance, lens_name
 
 def get_camera_info(camera):
-    assert camera in config['cameras'].keys()
-    sensor_width_mm = config['cameras'][camera]['sensor_width_mm']
-    sensor_height_mm = config['cameras'][camera]['sensor_height_mm']
-    sensor_resolution_x = config['cameras'][camera]['sensor_resolution_x']
-    sensor_resolution_y = config['cameras'][camera]['sensor_resolution_y']
-    resolution_percentage = config['cameras'][camera]['resolution_percentage']
+    assert camera in get_config()['cameras'].keys()
+    sensor_width_mm = get_config()['cameras'][camera]['sensor_width_mm']
+    sensor_height_mm = get_config()['cameras'][camera]['sensor_height_mm']
+    sensor_resolution_x = get_config()['cameras'][camera]['sensor_resolution_x']
+    sensor_resolution_y = get_config()['cameras'][camera]['sensor_resolution_y']
+    resolution_percentage = get_config()['cameras'][camera]['resolution_percentage']
 
     return sensor_width_mm, sensor_height_mm, sensor_resolution_x, sensor_resolution_y, resolution_percentage
 
@@ -151,7 +201,7 @@ def compute_k1(focal_length_mm, pixels_per_mm, min_lens_focal_length, max_lens_f
     # Compute focal lengths in pixelst
 
     # Determine k1 value to use
-    min_k1 = config['lenses'][lens]['min_k1']
+    min_k1 = get_config()['lenses'][lens]['min_k1']
 
     min_lens_focal_length_in_pixels = min_lens_focal_length #* pixels_per_mm
     focal_length_in_pixels = focal_length_mm #* pixels_per_mm
@@ -167,71 +217,32 @@ def compute_k1(focal_length_mm, pixels_per_mm, min_lens_focal_length, max_lens_f
     return k1
 
 ### BOARD SIZE ASSIGNMENTS AND SAMPLING SETTINGS
-def get_board_assignments(expanded_lens_focal_lengths, expanded_focus_distances, lens_focal_lengths, focus_distances, lens, camera, max_board_size=6.4, empirical_mode=True):
-    # assumes expanded_lens_focal_lengths and expanded_focus_distances are flattened & in same order
-    # and lens_focal_lengths and focus_distances are in increasing order
-
-    # Determine board assignments
-    sensor_width_mm, sensor_height_mm, _, _, resolution_percentage = get_camera_info(camera)
-
-    # NOTE: we assign boards based on camera_focal_length. We estimate these with thin lens equation
-    _, camera_focal_lengths, _, pinhole_to_objs = get_thin_lens_conversions(expanded_lens_focal_lengths, expanded_focus_distances)
+# Calibration boards, from smallest to largest; boards larger than the max board size of a lens are not used
+BOARD_SIZES = [0.1, 0.2, 0.4, 0.8, 1.6, 3.2, 6.4]
+BOARD_WIDTHS = [100, 200, 400, 800, 1600, 3200, 6400]
+BOARD_HEIGHTS = [75, 150, 300, 600, 1200, 2400, 4800]
+BOARD_COLORS = ['violet', 'red', 'green', 'blue', "#FF7B7B", "#B2FF6AEC", "#60CDFF"]
+BOARD_COLOR_LABELS = ['AprilGrid 6 mm', 'AprilGrid 12 mm', 'AprilGrid 24 mm', 'AprilGrid 48 mm', 'AprilGrid 96 mm', 'AprilGrid 192 mm', 'AprilGrid 384 mm']
 
-    fov_widths = sensor_width_mm * (pinhole_to_objs / camera_focal_lengths)
-    fov_heights = sensor_height_mm * (pinhole_to_objs / camera_focal_lengths)
-    obj_dists = pinhole_to_objs
-
-    fov_widths = fov_widths.flatten()
-    fov_heights = fov_heights.flatten()
-    obj_dists = obj_dists.flatten()
-
-    # Determine which boards cover which FOVs; add largest boards last to maximize board size
-    board_sizes = [0.1, 0.2, 0.4, 0.8, 1.6, 3.2, 6.4]
-    # truncate the below lists based on if board_sizes are <= max_board_size
-    idx = next(filter(lambda x: x[1] > max_board_size, enumerate(board_sizes)), (len(board_sizes), None))[0]
-    board_sizes = board_sizes[:idx]
-    board_widths = [100, 200, 400, 800, 1600, 3200, 6400][:idx]
-    board_heights = [75, 150, 300, 600, 1200, 2400, 4800][:idx]
-    board_colors = ['violet', 'red', 'green', 'blue', "#FF7B7B", "#B2FF6AEC", "#60CDFF"][:idx]
-    board_color_labels = ['AprilGrid 6 mm', 'AprilGrid 12 mm', 'AprilGrid 24 mm', 'AprilGrid 48 mm', 'AprilGrid 96 mm', 'AprilGrid 192 mm', 'AprilGrid 384 mm'][:idx]
-
-    if lens in ['canon17', 'premista80']:
-        # add drone option for large FSF for canon17 and premista80 experiments
-        board_colors = [*board_colors, 'turquoise']
-        board_color_labels = [*board_color_labels, 'Drone']
-
-    board_colors = [*board_colors, 'grey']
-    board_color_labels = [*board_color_labels, 'Skipped']
+# Lenses calibrated with drones for large FSF settings
+DRONE_LENSES = ['canon17', 'premista80']
+DRONE_COLOR = 'turquoise'
+SKIPPED_COLOR = 'grey'
 
-    colors = np.repeat('              ', len(fov_widths))
-    colors[True] = 'grey'
+# Colors of all board, drone and skipped settings; settings colors are computed as indices into this list
+BOARD_PALETTE = [*BOARD_COLORS, DRONE_COLOR, SKIPPED_COLOR]
 
-    sizes = np.repeat(0.0, len(fov_widths))
-
-    for bw, bh, bs, bc in zip(board_widths, board_heights, board_sizes, board_colors):
-        angle = 45
-        width_scale_factor = (1 - (bh / 2 * math.sin(math.radians(angle))) / obj_dists)
-        height_scale_factor = (1 - (bw / 2 * math.sin(math.radians(angle))) / obj_dists)
-
-        selected = (bw <= fov_widths * width_scale_factor) & (bh <= fov_heights * height_scale_factor)
-        colors[selected] = bc
-        sizes[selected] = bs
+# Number of settings get_experiment_params_batch assigns boards to at a time
+BOARD_ASSIGNMENT_CHUNK_SIZE = 65536
 
+def get_board_hardcodes(lens, empirical_mode=True):
+    '''
+    Returns the (lens, zoom_idx, focus_distance_idx, board size, color) experiment setting overrides that apply to lens.
+    '''
     # Empirical experiment setting overrides
     hardcodes = []
 
-    # If using drones for large FSF calibration, determine cutoff between boards and drones based on camera height
-    if lens in ['canon17', 'premista80']:
-        camera_height = 1.44 # m
-        cutoff_dists = (2 * camera_height * expanded_lens_focal_lengths / sensor_height_mm) * 1000 # mm
-        selected = (sizes == 0.0) & (obj_dists <= cutoff_dists)
-        colors[selected] = board_colors[-2]
-        sizes[selected] = board_sizes[-2]
-
-        unselected = (obj_dists > cutoff_dists)
-        colors[unselected] = board_colors[-1]
-        sizes[unselected] = 0.0
-
+    if lens in DRONE_LENSES:
         # Designate drone experiments; drone size will be designated as -1, skippd will be 0.0
         hardcodes += [
             ('canon17', 0, 7, -1, 'turquoise'),
@@ -282,19 +293,141 @@ def get_board_assignments(expanded_lens_focal_lengths, expanded_focus_distances,
             ('premista80v2', 8, 0, 0.1, 'violet')
         ]
 
+    return [hardcode for hardcode in hardcodes if hardcode[0] == lens]
+
+def get_board_legend(lens, max_board_size=6.4):
+    '''
+    Returns the sizes, colors and color labels of the boards used for lens, followed by the drone (for drone lenses) and
+    skipped colors and labels.
+    '''
+    # truncate the board lists based on if board_sizes are <= max_board_size
+    n_boards = next(filter(lambda x: x[1] > max_board_size, enumerate(BOARD_SIZES)), (len(BOARD_SIZES), None))[0]
+    board_sizes = BOARD_SIZES[:n_boards]
+    board_colors = BOARD_COLORS[:n_boards]
+    board_color_labels = BOARD_COLOR_LABELS[:n_boards]
+
+    if lens in DRONE_LENSES:
+        # add drone option for large FSF for canon17 and premista80 experiments
+        board_colors = [*board_colors, DRONE_COLOR]
+        board_color_labels = [*board_color_labels, 'Drone']
+
+    board_colors = [*board_colors, SKIPPED_COLOR]
+    board_color_labels = [*board_color_labels, 'Skipped']
+
+    return board_sizes, board_colors, board_color_labels
+
+def assign_boards(expanded_lens_focal_lengths, expanded_focus_distances, max_board_sizes, lens, camera):
+    '''
+    Assigns the largest board that covers the FOV of each setting, as one broadcast over (settings x boards), then
+    replaces settings no board covers with drones or skips them for drone lenses.
+
+    Args:
+        expanded_lens_focal_lengths (np.ndarray): (N,) lens focal length of each setting, in mm
+        expanded_focus_distances (np.ndarray): (N,) focus distance of each setting, in mm
+        max_board_sizes (np.ndarray): (N,) largest board size that may be assigned to each setting
+        lens (str): lens of the settings
+        camera (str): camera of the settings
+
+    Returns:
+        np.ndarray: (N,) board size of each setting, 0.0 if skipped
+        np.ndarray: (N,) index into BOARD_PALETTE of the board, drone or skipped color of each setting
+    '''
+    sensor_width_mm, sensor_height_mm, _, _, _ = get_camera_info(camera)
+
+    # NOTE: we assign boards based on camera_focal_length. We estimate these with thin lens equation
+    _, camera_focal_lengths, _, pinhole_to_objs = get_thin_lens_conversions(expanded_lens_focal_lengths, expanded_focus_distances)
+
+    fov_widths = (sensor_width_mm * (pinhole_to_objs / camera_focal_lengths)).flatten()
+    fov_heights = (sensor_height_mm * (pinhole_to_objs / camera_focal_lengths)).flatten()
+    obj_dists = pinhole_to_objs.flatten()
+
+    # Number of boards usable at each setting, since boards are sorted by size
+    n_boards = np.searchsorted(BOARD_SIZES, max_board_sizes, side='right')
+
+    # Determine which boards cover which FOVs, for all settings and boards at once
+    angle = 45
+    board_widths = np.array(BOARD_WIDTHS, dtype=np.float64)
+    board_heights = np.array(BOARD_HEIGHTS, dtype=np.float64)
+    width_scale_factor = (1 - (board_heights[None] / 2 * math.sin(math.radians(angle))) / obj_dists[:, None])
+    height_scale_factor = (1 - (board_widths[None] / 2 * math.sin(math.radians(angle))) / obj_dists[:, None])
+
+    fits = (board_widths[None] <= fov_widths[:, None] * width_scale_factor) & (board_heights[None] <= fov_heights[:, None] * height_scale_factor)
+    fits &= np.arange(len(BOARD_SIZES))[None] < n_boards[:, None]
+
+    # Use the largest board that fits
+    board_idxs = len(BOARD_SIZES) - 1 - np.argmax(fits[:, ::-1], axis=1)
+    has_board = fits.any(axis=1)
+
+    color_idxs = np.where(has_board, board_idxs, BOARD_PALETTE.index(SKIPPED_COLOR)).astype(np.int8)
+    sizes = np.where(has_board, np.array(BOARD_SIZES)[board_idxs], 0.0)
+
+    # If using drones for large FSF calibration, determine cutoff between boards and drones based on camera height
+    if lens in DRONE_LENSES:
+        if (n_boards < 2).any():
+            raise ValueError(f"Lens {lens} needs a max board size of at least {BOARD_SIZES[1]} to assign drone settings")
+
+        camera_height = 1.44 # m
+        cutoff_dists = (2 * camera_height * expanded_lens_focal_lengths / sensor_height_mm) * 1000 # mm
+        selected = (sizes == 0.0) & (obj_dists <= cutoff_dists)
+        color_idxs[selected] = BOARD_PALETTE.index(DRONE_COLOR)
+        sizes[selected] = np.array(BOARD_SIZES)[n_boards[selected] - 2]
+
+        unselected = (obj_dists > cutoff_dists)
+        color_idxs[unselected] = BOARD_PALETTE.index(SKIPPED_COLOR)
+        sizes[unselected] = 0.0
+
+    return sizes, color_idxs
+
+def apply_board_hardcodes(sizes, color_idxs, expanded_lens_focal_lengths, expanded_focus_distances, hardcode_lens_focal_lengths, hardcode_focus_distances, hardcodes):
+    '''
+    Applies hardcoded settings overrides in place, with later overrides taking precedence. hardcode_lens_focal_lengths and
+    hardcode_focus_distances hold the settings values each override applies to, as (H,) arrays or (N, H) arrays when the
+    values differ between settings.
+    '''
+    if len(hardcodes) == 0:
+        return
+
+    matches = (expanded_lens_focal_lengths[:, None] == hardcode_lens_focal_lengths) & (expanded_focus_distances[:, None] == hardcode_focus_distances)
+    hardcode_idxs = len(hardcodes) - 1 - np.argmax(matches[:, ::-1], axis=1)
+    has_hardcode = matches.any(axis=1)
+
+    sizes[has_hardcode] = np.array([hardcode[3] for hardcode in hardcodes], dtype=np.float64)[hardcode_idxs[has_hardcode]]
+    color_idxs[has_hardcode] = np.array([BOARD_PALETTE.index(hardcode[4]) for hardcode in hardcodes], dtype=np.int8)[hardcode_idxs[has_hardcode]]
+
+def get_board_assignments(expanded_lens_focal_lengths, expanded_focus_distances, lens_focal_lengths, focus_distances, lens, camera, max_board_size=6.4, empirical_mode=True):
+    # assumes expanded_lens_focal_lengths and expanded_focus_distances are flattened & in same order
+    # and lens_focal_lengths and focus_distances are in increasing order
+    expanded_lens_focal_lengths = np.asarray(expanded_lens_focal_lengths)
+    expanded_focus_distances = np.asarray(expanded_focus_distances)
+
+    board_sizes, board_colors, board_color_labels = get_board_legend(lens, max_board_size=max_board_size)
+    sizes, color_idxs = assign_boards(expanded_lens_focal_lengths, expanded_focus_distances, np.full(len(expanded_lens_focal_lengths), max_board_size), lens, camera)
+
+    hardcodes = get_board_hardcodes(lens, empirical_mode=empirical_mode)
     for hardcode in hardcodes:
-        if lens != hardcode[0]:
-            continue
         print("Hardcoding: ", hardcode)
-        idx = (expanded_lens_focal_lengths == lens_focal_lengths[hardcode[1]]) & (expanded_focus_distances == focus_distances[hardcode[2]])
-        sizes[idx] = hardcode[3]
-        colors[idx] = hardcode[4]
+
+    apply_board_hardcodes(
+        sizes,
+        color_idxs,
+        expanded_lens_focal_lengths,
+        expanded_focus_distances,
+        np.asarray(lens_focal_lengths)[[hardcode[1] for hardcode in hardcodes]],
+        np.asarray(focus_distances)[[hardcode[2] for hardcode in hardcodes]],
+        hardcodes,
+    )
+
+    colors = np.repeat('              ', len(sizes))
+    colors[:] = np.array(BOARD_PALETTE)[color_idxs]
 
     return sizes, colors, board_color_labels, board_colors
 
-# Get list of (lens_focal_length, focus_distance) values based on lens and camera
-def get_experiment_params(lens, camera, n_focus_distance_samples, soft_min_focus_distance, max_board_size=6.4, verbose=False, empirical_mode=True):
-    # Get lens and camera info
+def get_experiment_grid(lens, n_focus_distance_samples, soft_min_focus_distance):
+    '''
+    Returns the sampled lens focal lengths and focus distances of lens, and the indices and values of every
+    (lens_focal_length, focus_distance) setting in their grid.
+    '''
+    # Get lens info
     min_lens_focal_length, max_lens_focal_length, lens_min_focus_distance, _ = get_lens_info(lens)
     assert lens_min_focus_distance <= soft_min_focus_distance
 
@@ -325,6 +458,12 @@ def get_experiment_params(lens, camera, n_focus_distance_samples, soft_min_focus
     experiment_raw_values = np.array(np.meshgrid(lens_focal_lengths, focus_distances)).T.reshape(-1, 2)  # (lens_focal_length, focus_distance)
     experiment_indices = np.array(np.meshgrid(range(len(lens_focal_lengths)), range(len(focus_distances)))).T.reshape(-1, 2)  # (lens_focal_length, focus_distance)
 
+    return lens_focal_lengths, focus_distances, experiment_indices, experiment_raw_values
+
+# Get list of (lens_focal_length, focus_distance) values based on lens and camera
+def get_experiment_params(lens, camera, n_focus_distance_samples, soft_min_focus_distance, max_board_size=6.4, verbose=False, empirical_mode=True):
+    lens_focal_lengths, focus_distances, experiment_indices, experiment_raw_values = get_experiment_grid(lens, n_focus_distance_samples, soft_min_focus_distance)
+
     expanded_lens_focal_lengths = experiment_raw_values[:, 0]
     expanded_focus_distances = experiment_raw_values[:, 1]
 
@@ -336,9 +475,68 @@ def get_experiment_params(lens, camera, n_focus_distance_samples, soft_min_focus
 
     return lens_focal_lengths, focus_distances, experiment_indices, experiment_raw_values, sizes
 
+def get_experiment_params_batch(lens, camera, planning_configs, empirical_mode=True):
+    '''
+    Plans the experiments of lens for many configurations at once, assigning boards to the settings of all configurations
+    together. Hardcoded setting overrides are applied as in get_experiment_params, but not printed.
+
+    Args:
+        lens (str): lens to plan experiments for
+        camera (str): camera to plan experiments for
+        planning_configs (list): (n_focus_distance_samples, soft_min_focus_distance, max_board_size) of each configuration
+        empirical_mode (bool): whether to apply the real (True) or synthetic (False) setting overrides
+
+    Returns:
+        list: (lens_focal_lengths, focus_distances, experiment_indices, experiment_raw_values, sizes) of each configuration,
+            as returned by get_experiment_params
+    '''
+    grids = [get_experiment_grid(lens, n_focus_distance_samples, soft_min_focus_distance) for n_focus_distance_samples, soft_min_focus_distance, _ in planning_configs]
+    if len(grids) == 0:
+        return []
+
+    n_settings = [len(experiment_raw_values) for _, _, _, experiment_raw_values in grids]
+    experiment_raw_values = np.concatenate([experiment_raw_values for _, _, _, experiment_raw_values in grids])
+    max_board_sizes = np.repeat([max_board_size for _, _, max_board_size in planning_configs], n_settings)
+
+    expanded_lens_focal_lengths = experiment_raw_values[:, 0]
+    expanded_focus_distances = experiment_raw_values[:, 1]
+
+    # Settings values each override applies to, per configuration
+    hardcodes = get_board_hardcodes(lens, empirical_mode=empirical_mode)
+    hardcode_lens_focal_lengths = np.array([np.asarray(lens_focal_lengths, dtype=np.float64)[[hardcode[1] for hardcode in hardcodes]] for lens_focal_lengths, _, _, _ in grids]).reshape(len(grids), len(hardcodes))
+    hardcode_focus_distances = np.array([focus_distances[[hardcode[2] for hardcode in hardcodes]] for _, focus_distances, _, _ in grids]).reshape(len(grids), len(hardcodes))
+    config_idxs = np.repeat(np.arange(len(grids)), n_settings)
+
+    # Assign boards in chunks of settings, so the (settings x boards) temporaries stay small
+    sizes = np.empty(len(experiment_raw_values))
+    color_idxs = np.empty(len(experiment_raw_values), dtype=np.int8)
+    for start in range(0, len(experiment_raw_values), BOARD_ASSIGNMENT_CHUNK_SIZE):
+        chunk = slice(start, start + BOARD_ASSIGNMENT_CHUNK_SIZE)
+        sizes[chunk], color_idxs[chunk] = assign_boards(expanded_lens_focal_lengths[chunk], expanded_focus_distances[chunk], max_board_sizes[chunk], lens, camera)
+        apply_board_hardcodes(
+            sizes[chunk],
+            color_idxs[chunk],
+            expanded_lens_focal_lengths[chunk],
+            expanded_focus_distances[chunk],
+            hardcode_lens_focal_lengths[config_idxs[chunk]],
+            hardcode_focus_distances[config_idxs[chunk]],
+            hardcodes,
+        )
+
+    split_idxs = np.cumsum(n_settings)[:-1]
+    return [
+        (lens_focal_lengths, focus_distances, experiment_indices, grid_raw_values, grid_sizes)
+        for (lens_focal_lengths, focus_distances, experiment_indices, grid_raw_values), grid_sizes in zip(grids, np.split(sizes, split_idxs))
+    ]
+
 
 ### VISUALIZING EXPERIMENT SETTINGS
 def show_exp_grid(board_colors, board_color_labels, colors, experiment_indices, lens, lfls_short, fds_short):
+    import matplotlib.patches as mpatches
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+
     # Get max grid size
     grid_size_x = len(lfls_short)
     grid_size_y = len(fds_short)
@@ -385,6 +583,8 @@ def show_exp_grid(board_colors, board_color_labels, colors, experiment_indices,
     plt.savefig(f'{lens}_real_experiments.pdf', bbox_inches="tight")
 
 def show_distance_based_plot(experiment_params, colors, lens):
+    import matplotlib.pyplot as plt
+
     x = experiment_params[:, 0]
     y = experiment_params[:, 1]
 
@@ -490,7 +690,7 @@ def create_per_frame_meta_from_metadata_export(metapath, lens_name_suffix):
         obj["clipMetadata"] = {item["metadataSetName"]: item["metadataSetPayload"] | { "schema": item["metadataSetSchemaUri"] } for item in meta["clipBasedMetadataSets"]}
 
         lensModel = obj['descriptiveMetadata']['Lens Device']['lensModel'] # get lens from metadata
-        lens = f"{config['metadata_lens_mapping'][lensModel]}{lens_name_suffix}"
+        lens = f"{get_config()['metadata_lens_mapping'][lensModel]}{lens_name_suffix}"
         obj["lens"] = lens
 
         frames = meta["frameBasedMetadata"]["frames"]
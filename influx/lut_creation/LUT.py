@@ -1,26 +1,38 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
 import json
-import matplotlib.pyplot as plt
 import numpy as np
 import os
-import seaborn as sns
 import sys
+import threading
+import zipfile
 
 if __name__ == "__main__":
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
     sys.path.append(os.path.dirname(SCRIPT_DIR))
 
-from common_utils import config, get_camera_info
-from scipy.spatial import Delaunay
+from common_utils import get_camera_info, get_config
 
 
 np.set_printoptions(linewidth=np.inf)
 
 class LUT:
+    # Bump whenever the layout of saved LUT artifacts changes, so that older artifacts are rebuilt
+    ARTIFACT_VERSION = 1
+
     def __init__(self, experiment_data_path, lens):
         # Check that the specified lens is valid
-        assert lens in config['lenses'].keys()
+        assert lens in get_config()['lenses'].keys()
+
+        self.init_constants()
+
+        self.from_json(experiment_data_path, lens)
+        self.make_regions()
+        self.make_extrapolations()
+
 
+    def init_constants(self):
         # Ordering of how intrinsics are stored in intrinsics grid
         self.intrinsics_ordering = ['fx', 'fy', 'cx', 'cy', 'k1', 'k2', 'p1', 'p2']
         self.dim_map = {intr_str: idx for idx, intr_str in enumerate(self.intrinsics_ordering)}
@@ -28,17 +40,16 @@ class LUT:
         # Color mapping for visualization
         self.color_map = {"l" : np.array([1.,1,1]), "r" : np.array([1.,0,0]), "g" : np.array([0.,1,0]), "b" : np.array([0.,0,1]),}
 
-        self.from_json(experiment_data_path, lens)
-        self.make_regions()
-        self.make_extrapolations()
-
 
     def from_json(self, experiment_data_path, lens):
         self.lens = lens
 
-        # Read in selected experiment raw data
-        with open(experiment_data_path, "r") as f:
-            experiment_data = json.load(f)
+        # Read in selected experiment raw data, keeping a content hash to detect stale saved artifacts
+        with open(experiment_data_path, "rb") as f:
+            raw_experiment_data = f.read()
+
+        self.source_hash = hashlib.sha256(raw_experiment_data).hexdigest()
+        experiment_data = json.loads(raw_experiment_data)
 
         self.approx_zooms = experiment_data['zooms']
         self.approx_fds = experiment_data['focus_distances']
@@ -125,6 +136,131 @@ class LUT:
             self.color_grid[(4, 9)] = 'b'
 
 
+    def save(self, path):
+        '''
+        Save the constructed LUT as an uncompressed .npz artifact that LUT.load can restore without rebuilding.
+
+        The artifact stores the grids, drone vertices, regions, point-location index, and extrapolation constants, along
+        with the hash of the selected trials JSON it was built from. Per-zoom fitting data is not stored. The artifact is
+        written to a temporary file in the same folder that then replaces path, so an interrupted save never leaves a
+        truncated artifact behind.
+        '''
+        drone_keys = list(self.drone.keys())
+        color_keys = list(self.color_grid.keys())
+        extrapolation_zooms = list(self.extrapolation_constants.keys())
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    artifact_version=self.ARTIFACT_VERSION,
+                    source_hash=self.source_hash,
+                    lens=self.lens,
+                    approx_zooms=np.array(self.approx_zooms, dtype=np.float64),
+                    approx_fds=np.array(self.approx_fds, dtype=np.float64),
+                    actual_metadata_grid=self.actual_metadata_grid,
+                    grid=self.grid,
+                    experiments_json=json.dumps(self.experiments),
+                    drone_keys=np.array(drone_keys, dtype=np.int64).reshape(-1, 2),
+                    drone_values=np.array([self.drone[key] for key in drone_keys]).reshape(-1, self.nintr),
+                    color_keys=np.array(color_keys, dtype=np.int64).reshape(-1, 2),
+                    color_values=np.array([self.color_grid[key] for key in color_keys], dtype=str),
+                    grid_regions=np.array(self.grid_regions, dtype=np.int64).reshape(-1, 4, 2),
+                    drone_regions=np.array(self.drone_regions, dtype=np.int64).reshape(-1, 3, 2),
+                    vertex_values=self.vertex_values,
+                    vertex_colors=self.vertex_colors,
+                    region_vertex_ids=self.region_vertex_ids,
+                    region_points=self.region_points,
+                    region_triangles=self.region_triangles,
+                    index_zoom_edges=self.index_zoom_edges,
+                    index_fdist_edges=self.index_fdist_edges,
+                    index_candidates=self.index_candidates,
+                    extrapolation_zooms=np.array(extrapolation_zooms, dtype=np.int64),
+                    extrapolation_constants=np.array([self.extrapolation_constants[zoom] for zoom in extrapolation_zooms], dtype=np.float64),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Restore a LUT saved with LUT.save, without parsing the selected trials JSON or rerunning Delaunay and the
+        extrapolation fits.
+        '''
+        lut = cls.__new__(cls)
+        lut.init_constants()
+
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['artifact_version']) != cls.ARTIFACT_VERSION:
+                raise ValueError(f"LUT artifact {path} has version {int(data['artifact_version'])}, expected {cls.ARTIFACT_VERSION}")
+
+            lut.source_hash = str(data['source_hash'])
+            lut.lens = str(data['lens'])
+            lut.approx_zooms = data['approx_zooms'].tolist()
+            lut.approx_fds = data['approx_fds'].tolist()
+            lut.nzoom = len(lut.approx_zooms)
+            lut.nfdist = len(lut.approx_fds)
+            lut.nintr = len(lut.dim_map)
+
+            lut.actual_metadata_grid = data['actual_metadata_grid']
+            lut.grid = data['grid']
+            lut.experiments = json.loads(str(data['experiments_json']))
+            lut.drone = {tuple(map(int, key)): value for key, value in zip(data['drone_keys'], data['drone_values'])}
+            lut.color_grid = {tuple(map(int, key)): str(value) for key, value in zip(data['color_keys'], data['color_values'])}
+
+            lut.grid_regions = list(data['grid_regions'])
+            lut.drone_regions = list(data['drone_regions'])
+            lut.n_regions = len(lut.grid_regions) + len(lut.drone_regions)
+
+            lut.vertex_values = data['vertex_values']
+            lut.vertex_colors = data['vertex_colors']
+            lut.region_vertex_ids = data['region_vertex_ids']
+            lut.region_points = data['region_points']
+            lut.region_triangles = data['region_triangles']
+            lut.index_zoom_edges = data['index_zoom_edges']
+            lut.index_fdist_edges = data['index_fdist_edges']
+            lut.index_candidates = data['index_candidates']
+
+            lut.extrapolation_constants = {
+                int(zoom): float(constant) for zoom, constant in zip(data['extrapolation_zooms'], data['extrapolation_constants'])
+            }
+
+        return lut
+
+
+    @classmethod
+    def from_artifact(cls, experiment_data_path, lens, artifact_path):
+        '''
+        Load the LUT artifact at artifact_path if it was built from the current contents of experiment_data_path; otherwise
+        rebuild the LUT from the JSON and overwrite the artifact.
+        '''
+        if os.path.exists(artifact_path):
+            with open(experiment_data_path, "rb") as f:
+                source_hash = hashlib.sha256(f.read()).hexdigest()
+
+            try:
+                lut = cls.load(artifact_path)
+                if lut.source_hash == source_hash and lut.lens == lens:
+                    return lut
+            except (KeyError, OSError, ValueError, EOFError, zipfile.BadZipFile) as e:
+                print(f"WARNING: Could not load LUT artifact {artifact_path} ({e}), rebuilding...")
+
+        lut = cls(experiment_data_path, lens)
+
+        artifact_dir = os.path.dirname(artifact_path)
+        if artifact_dir != '':
+            os.makedirs(artifact_dir, exist_ok=True)
+        lut.save(artifact_path)
+
+        return lut
+
+
     def get_colors(self, region):
         if region.shape[0] == 3:
             (x_0, y_0), (x_1, y_1), (x_2, y_2) = region
@@ -182,6 +318,8 @@ class LUT:
 
 
     def make_regions(self):
+        from scipy.spatial import Delaunay
+
         # all regions are lists of np.arrays, 3x2 for triangles and 4x2 for quads
         self.grid_regions = []
         edge_points = []
@@ -215,43 +353,208 @@ class LUT:
         else:
             self.drone_regions = []
 
+        self.make_region_index()
+
+
+    def make_region_index(self):
+        '''
+        Build a point-location index over all interpolation regions.
+
+        Regions are numbered in first-match order: grid quads first, then drone triangles. Each region is stored as a pair of
+        triangles in actual (zoom, fdist) values (triangle regions are repeated), quads split along their (0, 3) diagonal.
+        Cells of the index form a rectilinear grid whose lines are the distinct vertex zoom and fdist values, so the
+        exponentially spaced LUT samples are resolved evenly; each cell lists its candidate regions in first-match order.
+        '''
+        regions = self.grid_regions + self.drone_regions
+        self.n_regions = len(regions)
+
+        # Flattened (zoom_ind * nfdist + fdist_ind) vertex table; drone values fill the grid entries left NaN for drone experiments
+        self.vertex_values = self.grid.reshape(-1, self.nintr).copy()
+        for (zoom_ind, fdist_ind), data in self.drone.items():
+            self.vertex_values[zoom_ind * self.nfdist + fdist_ind] = data
+
+        # Visualization colors per vertex; vertices without an assigned color are NaN
+        self.vertex_colors = np.full((self.nzoom * self.nfdist, 3), np.nan)
+        for (zoom_ind, fdist_ind), color in self.color_grid.items():
+            if color in self.color_map:
+                self.vertex_colors[zoom_ind * self.nfdist + fdist_ind] = self.color_map[color]
+
+        # Per-region vertex ids and actual (zoom, fdist) values; triangles are padded by repeating their first vertex
+        self.region_vertex_ids = np.zeros((self.n_regions, 4), dtype=np.int64)
+        self.region_points = np.zeros((self.n_regions, 4, 2))
+        self.region_triangles = np.zeros((self.n_regions, 2, 3, 2))
+        for region_id, region in enumerate(regions):
+            padded_region = region[[0, 1, 2, 3]] if region.shape[0] == 4 else region[[0, 1, 2, 0]]
+            self.region_vertex_ids[region_id] = padded_region[:, 0] * self.nfdist + padded_region[:, 1]
+            self.region_points[region_id] = self.actual_metadata_grid[padded_region[:, 0], padded_region[:, 1]]
+
+            if region.shape[0] == 4:
+                triangles = [region[[0, 1, 3]], region[[0, 2, 3]]]
+            else:
+                triangles = [region, region]
 
-    def region_mask(self, zoom_and_fdist, region):
-        if region.shape[0] == 4:
-            triangle1 = region[[0, 1, 3]]
-            triangle2 = region[[0, 2, 3]]
+            for tri_idx, triangle in enumerate(triangles):
+                self.region_triangles[region_id, tri_idx] = self.actual_metadata_grid[triangle[:, 0], triangle[:, 1]]
+
+        if self.n_regions == 0:
+            self.index_zoom_edges = np.zeros(0)
+            self.index_fdist_edges = np.zeros(0)
+            self.index_candidates = np.full((1, 0), -1, dtype=np.int64)
+            return
+
+        region_points = self.region_triangles.reshape(self.n_regions, -1, 2)
+        self.index_zoom_edges = np.unique(region_points[..., 0])
+        self.index_fdist_edges = np.unique(region_points[..., 1])
+        n_zoom_cells = len(self.index_zoom_edges) + 1
+        n_fdist_cells = len(self.index_fdist_edges) + 1
+
+        # Pad region bounding boxes so points accepted by the edge tolerance of edge_function_mask are never missed
+        bbox_min = region_points.min(axis=1)
+        bbox_max = region_points.max(axis=1)
+        pad = 1e-4 * np.linalg.norm(bbox_max - bbox_min, axis=-1, keepdims=True) + 1e-6
+        zoom_cells_min, fdist_cells_min = self.get_index_cells(bbox_min - pad)
+        zoom_cells_max, fdist_cells_max = self.get_index_cells(bbox_max + pad)
+
+        # Cell bounds along each axis; the unbounded outer cells are clipped to each region's padded bounding box below
+        zoom_cell_bounds = np.concatenate(([-np.inf], self.index_zoom_edges, [np.inf]))
+        fdist_cell_bounds = np.concatenate(([-np.inf], self.index_fdist_edges, [np.inf]))
+
+        cell_candidates = [[] for _ in range(n_zoom_cells * n_fdist_cells)]
+        for region_id in range(self.n_regions):
+            zoom_cells = np.arange(zoom_cells_min[region_id], zoom_cells_max[region_id] + 1)
+            fdist_cells = np.arange(fdist_cells_min[region_id], fdist_cells_max[region_id] + 1)
+            zoom_cells, fdist_cells = [cells.flatten() for cells in np.meshgrid(zoom_cells, fdist_cells, indexing='ij')]
+
+            # Only keep cells that a padded region triangle actually overlaps, since thin triangles span many cells
+            rect_min = np.stack((zoom_cell_bounds[zoom_cells], fdist_cell_bounds[fdist_cells]), axis=-1)
+            rect_max = np.stack((zoom_cell_bounds[zoom_cells + 1], fdist_cell_bounds[fdist_cells + 1]), axis=-1)
+            rect_min = np.maximum(rect_min, bbox_min[region_id] - pad[region_id]) - pad[region_id]
+            rect_max = np.minimum(rect_max, bbox_max[region_id] + pad[region_id]) + pad[region_id]
+
+            overlaps = np.zeros(len(zoom_cells), dtype=bool)
+            for triangle in self.region_triangles[region_id]:
+                overlaps |= triangle_overlaps_rectangles(triangle, rect_min, rect_max)
+
+            for zoom_cell, fdist_cell in zip(zoom_cells[overlaps], fdist_cells[overlaps]):
+                cell_candidates[zoom_cell * n_fdist_cells + fdist_cell].append(region_id)
+
+        max_candidates = max(len(candidates) for candidates in cell_candidates)
+        self.index_candidates = np.full((len(cell_candidates), max_candidates), -1, dtype=np.int64)
+        for cell, candidates in enumerate(cell_candidates):
+            self.index_candidates[cell, :len(candidates)] = candidates
+
+
+    def get_index_cells(self, zoom_and_fdist):
+        # Cell 0 lies below the first edge and the last cell above the last edge along each axis
+        zoom_cells = np.searchsorted(self.index_zoom_edges, zoom_and_fdist[:, 0], side='right')
+        fdist_cells = np.searchsorted(self.index_fdist_edges, zoom_and_fdist[:, 1], side='right')
+        return zoom_cells, fdist_cells
+
+
+    def locate_regions(self, zoom_and_fdist):
+        '''
+        Return the index of the first region (in grid_regions + drone_regions order) containing each point, or -1.
+        '''
+        region_ids = np.full(zoom_and_fdist.shape[0], -1, dtype=np.int64)
+
+        valid = np.isfinite(zoom_and_fdist).all(axis=-1)
+        if self.n_regions == 0 or not valid.any():
+            return region_ids
+
+        valid_indices = np.where(valid)[0]
+        points = zoom_and_fdist[valid]
+
+        zoom_cells, fdist_cells = self.get_index_cells(points)
+        candidates = self.index_candidates[zoom_cells * (len(self.index_fdist_edges) + 1) + fdist_cells]
+
+        region_ids[valid_indices] = locate_in_candidates(points, candidates, self.region_triangles)
+        return region_ids
+
+
+    def compute_region_weights(self, zoom_and_fdist, region_ids):
+        '''
+        Return the vertex ids (N, 4) into vertex_values and the interpolation weights (N, 4) of each point within its region.
+
+        Triangle regions get a zero weight on their padded fourth vertex. Points outside every region get NaN weights.
+        '''
+        return region_weights(zoom_and_fdist, region_ids, self.region_vertex_ids, self.region_points, region_ids >= len(self.grid_regions))
+
+
+    def plan(self, input, deduplicate=True):
+        '''
+        Locate every query point and compute its interpolation weights, for reuse across intrinsics and colors.
+
+        Args:
+            input (np.ndarray): (N, 2) array of (zoom, focus distance) query points
+            deduplicate (bool): whether to locate and weight only the unique query points and scatter the results back,
+                which pays off for video metadata where the lens setting stays fixed over long stretches of frames
+
+        Returns:
+            InterpolationPlan: region ids, region types, vertex ids, and weights of every query point
+        '''
+        if deduplicate and input.shape[0] > 1:
+            # Viewing each (zoom, fdist) row as one complex number sorts much faster than np.unique(..., axis=0)
+            packed = np.ascontiguousarray(input, dtype=np.float64).view(np.complex128).reshape(-1)
+            unique_packed, inverse = np.unique(packed, return_inverse=True, equal_nan=False)
+            unique_input = unique_packed.view(np.float64).reshape(-1, 2)
+            inverse = inverse.reshape(-1)
+        else:
+            unique_input, inverse = input, None
 
-            return self.check_in_triangle(zoom_and_fdist, triangle1) | self.check_in_triangle(zoom_and_fdist, triangle2)
+        region_ids = self.locate_regions(unique_input)
+        vertex_ids, weights = self.compute_region_weights(unique_input, region_ids)
 
-        return self.check_in_triangle(zoom_and_fdist, region)
+        region_types = np.full(unique_input.shape[0], -1, dtype=np.int8)
+        region_types[region_ids >= 0] = InterpolationPlan.QUADRILATERAL
+        region_types[region_ids >= len(self.grid_regions)] = InterpolationPlan.TRIANGULAR
 
+        if inverse is not None:
+            region_ids, region_types, vertex_ids, weights = region_ids[inverse], region_types[inverse], vertex_ids[inverse], weights[inverse]
+
+        return InterpolationPlan(self.lens, region_ids, region_types, vertex_ids, weights, n_unique=unique_input.shape[0], unique_inverse=inverse)
+
+
+    def rasterize(self, zoom_step=0.1, fd_step=10.0, rtol=1e-4, atol=1e-12, n_verify_samples=100000):
+        '''
+        Build a verified RasterizedLUT of this LUT's normal interpolation, for constant-time per-frame lookups.
+
+        Args:
+            zoom_step (float): table spacing along zoom, in mm
+            fd_step (float): table spacing along focus distance, in mm
+            rtol (float): allowed error relative to the largest magnitude of each intrinsic
+            atol (float): allowed absolute error
+            n_verify_samples (int): number of random points and cell centers checked against exact interpolation
+        '''
+        return RasterizedLUT(self, zoom_step=zoom_step, fd_step=fd_step, rtol=rtol, atol=atol, n_verify_samples=n_verify_samples)
 
-    def check_in_triangle(self, zoom_and_fdist, triangle, loose_check_percent_threshold=None):
 
-        def area(x1, y1, x2, y2, x3, y3):
-            return abs((x1*(y2 - y3) + x2*(y3 - y1) + x3*(y1 - y2)) / 2.0)
+    def get_region(self, region_id):
+        if region_id < len(self.grid_regions):
+            return self.grid_regions[region_id]
+        return self.drone_regions[region_id - len(self.grid_regions)]
 
+
+    def check_in_triangle(self, zoom_and_fdist, triangle, loose_check_percent_threshold=None):
         # Check if within the triangle of actual zoom and fdist values, not their index
         x1, y1, x2, y2, x3, y3 = self.get_point_values(triangle)
 
+        if loose_check_percent_threshold is None:
+            return edge_function_mask(zoom_and_fdist, np.array([[x1, y1], [x2, y2], [x3, y3]]))
+
         # px, py = zoom_val, fdist_val
         px, py = zoom_and_fdist[:, 0], zoom_and_fdist[:, 1]
 
         # Area of the full triangle
-        A = area(x1, y1, x2, y2, x3, y3)
+        A = triangle_area(x1, y1, x2, y2, x3, y3)
 
         # Area of the three sub-triangles with the point
-        A1 = area(px, py, x2, y2, x3, y3)
-        A2 = area(x1, y1, px, py, x3, y3)
-        A3 = area(x1, y1, x2, y2, px, py)
-
-        if loose_check_percent_threshold is not None:
-            # Allow for some error in the area comparison
-            threshold = loose_check_percent_threshold * A
-            return np.abs(A - (A1 + A2 + A3)) < threshold
-        else:
-            # Check if sum of A1, A2, and A3 is equal to A
-            return np.isclose(A, A1 + A2 + A3)
+        A1 = triangle_area(px, py, x2, y2, x3, y3)
+        A2 = triangle_area(x1, y1, px, py, x3, y3)
+        A3 = triangle_area(x1, y1, x2, y2, px, py)
+
+        # Allow for some error in the area comparison
+        threshold = loose_check_percent_threshold * A
+        return np.abs(A - (A1 + A2 + A3)) < threshold
 
 
     def trapezoidal_interpolation(self, input, quad, intrinsic, ensure_region_type=True):
@@ -358,110 +661,172 @@ class LUT:
             self.extrapolation_constants[zoom] = 1 / one_over_c
 
 
-    def extrapolate_fx_fy(self, input, zoom_min, zoom_max, intrinsic):
+    def extrapolate_fx_fy(self, input, intrinsic, interval_ids=None):
+        '''
+        Extrapolate fx or fy with the thin lens fit of the two approx_zooms bounding each query point.
+
+        Args:
+            input (np.ndarray): (N, 2) array of (zoom, focus distance) query points
+            intrinsic (str): 'fx' or 'fy'
+            interval_ids (np.ndarray): (N,) approx_zooms interval of every point as returned by get_interval_ids, computed
+                if not provided
+
+        Returns:
+            np.ndarray: (N, 1) array of extrapolated values, NaN for points outside of approx_zooms
+        '''
         assert intrinsic in ['fx', 'fy']
 
         # Get camera sensor info for pixel size conversions
         sensor_width_mm, sensor_height_mm, sensor_resolution_x, sensor_resolution_y, _ = get_camera_info('arri')
 
-        # Compute CFL at zoom_min and zoom_max, based on focus distance
-        def compute_cfl(fd, c):
-            # Compute based on 1 / cfl + 1 / (fd - cfl) = 1 / c
-            cfl_mm = (fd - np.sqrt(fd ** 2 - 4 * c * fd)) / 2
+        zoom_edges = np.array(self.approx_zooms, dtype=np.float64)
+        if interval_ids is None:
+            interval_ids = get_interval_ids(input[:, 0], zoom_edges)
+
+        output = np.full((input.shape[0], 1), np.nan)
+        mask = interval_ids >= 0
+        if not mask.any():
+            return output
 
-            # When fd is -1 (infinity), cfl = c
-            cfl_mm[fd == -1] = c
+        # Gather interval bounds and their thin lens constants for every point at once
+        constants = self.get_extrapolation_constants()
+        lower = interval_ids[mask]
+        output[mask, 0] = thin_lens_extrapolation(
+            input[mask], zoom_edges[lower], zoom_edges[lower + 1], constants[lower], constants[lower + 1], sensor_width_mm, sensor_resolution_x
+        )
 
-            # Convert from mm back to pixels
-            cfl = cfl_mm * sensor_resolution_x / sensor_width_mm
-            return cfl
+        return output
 
-        fd = input[:, 1]
-        cfls_zoom_min = compute_cfl(fd, self.extrapolation_constants[zoom_min])
-        cfls_zoom_max = compute_cfl(fd, self.extrapolation_constants[zoom_max])
 
-        # Interpolate between zooms
-        frac = (input[:, 0] - zoom_min) / (zoom_max - zoom_min)
-        return ((1 - frac) * cfls_zoom_min + frac * cfls_zoom_max)[:, None]
+    def get_extrapolation_constants(self):
+        # Thin lens constant of every approx_zooms entry, NaN where no constant could be fit
+        return np.array([self.extrapolation_constants.get(zoom, np.nan) for zoom in self.approx_zooms], dtype=np.float64)
 
-    def snap_to_highest_fd(self, input):
-        # Keep track of which inputs have not been rectified yet
-        output = np.full((input.shape[0], 2), np.nan)
 
-        # Go through all zoom ranges with non-zero fd, and snap fd
+    def get_top_boundary(self):
+        # Zoom and fdist of the highest-fd vertex at every zoom with non-zero fd
         zooms = self.actual_metadata_grid[:, -1, 0]
         fds = self.actual_metadata_grid[:, -1, 1]
         non_zero_mask = zooms != 0
-        zooms = zooms[non_zero_mask]
-        fds = fds[non_zero_mask]
+        return zooms[non_zero_mask], fds[non_zero_mask]
 
-        for zoom_idx in range(len(zooms) - 1):
-            zoom_min, zoom_max = zooms[zoom_idx], zooms[zoom_idx + 1]
 
-            # Define helper function that does rectification
-            fd1 = fds[zoom_idx]
-            fd2 = fds[zoom_idx + 1]
-            def rectify(unrectified_input):
-                zoom = unrectified_input[:, 0]
-                old_fd = unrectified_input[:, 1]
+    def get_top_boundary_fds(self, input):
+        '''
+        Focus distance of the top LUT boundary at the zoom of every query point, linearly interpolated between the
+        highest-fd vertices of the enclosing zoom interval, or NaN outside of the boundary's zoom range.
+        '''
+        zooms, fds = self.get_top_boundary()
 
-                frac = (zoom - zoom_min) / (zoom_max - zoom_min)
-                new_fd =  (1 - frac) * fd1 + frac * fd2
+        interval_ids = get_interval_ids(input[:, 0], zooms)
+        mask = interval_ids >= 0
+        lower = interval_ids[mask]
 
-                assert ((old_fd >= new_fd) | (old_fd == -1)).all()
+        frac = (input[mask, 0] - zooms[lower]) / (zooms[lower + 1] - zooms[lower])
+        output = np.full(input.shape[0], np.nan)
+        output[mask] = (1 - frac) * fds[lower] + frac * fds[lower + 1]
 
-                return np.hstack((zoom[:, None], new_fd[:, None]))
+        return output
+
+
+    def is_below_top_boundary(self, input):
+        '''
+        Whether each query point lies below the top LUT boundary at its zoom. Such points cannot be snapped up to the
+        boundary, so they are left without extrapolated values.
+        '''
+        top_fds = self.get_top_boundary_fds(input)
+        return (input[:, 1] < top_fds) & (input[:, 1] != -1)
 
-            # Select all inputs within consecutive zoom values, and still not rectified
-            mask = (zoom_min <= input[:, 0]) & (input[:, 0] <= zoom_max) & np.isnan(output).any(axis=-1)
-            if mask.sum() > 0:
-                output[mask] = rectify(input[mask])
+
+    def snap_to_highest_fd(self, input):
+        '''
+        Snap the focus distance of every query point to the top LUT boundary at its zoom. Points outside of the boundary's
+        zoom range, or below the boundary, become NaN.
+        '''
+        output = np.full((input.shape[0], 2), np.nan)
+
+        top_fds = self.get_top_boundary_fds(input)
+        mask = (input[:, 1] >= top_fds) | ((input[:, 1] == -1) & ~np.isnan(top_fds))
+
+        output[mask, 0] = input[mask, 0]
+        output[mask, 1] = top_fds[mask]
 
         return output
 
 
-    def interpolate_all(self, input, intrinsic, extrapolate=False):
-        output = np.full((input.shape[0], 1), np.nan)
-        colors = np.zeros((input.shape[0], 3))
+    def interpolate_all(self, input, intrinsic, extrapolate=False, plan=None):
+        if plan is None:
+            plan = self.plan(input)
 
-        used_triangles = []
+        output = self.interpolate_many(input, [intrinsic], extrapolate=extrapolate, plan=plan)
 
-        for quad in self.grid_regions:
-            mask = self.region_mask(input, quad) & np.isnan(output).flatten()
-            if mask.sum() > 0:
-                o, c = self.trapezoidal_interpolation(input[mask], quad, intrinsic)
-                output[mask], colors[mask] = o, c
+        # Compute color assignment
+        colors = plan.apply(self.vertex_colors)
+        colors[~plan.is_within_lut] = 0.0
 
-        for tri in self.drone_regions:
-            mask = self.region_mask(input, tri) & np.isnan(output).flatten()
-            if mask.sum() > 0:
-                output[mask], colors[mask] = self.triangular_interpolation(input[mask], tri, intrinsic)
-                used_triangles.append(tri)
+        used_triangles = [self.get_region(region_id) for region_id in plan.get_used_region_ids() if region_id >= len(self.grid_regions)]
+
+        return output, colors, used_triangles
+
+
+    def interpolate_many(self, input, intrinsics=None, extrapolate=False, plan=None):
+        '''
+        Interpolate several intrinsics in a single pass over the LUT regions.
+
+        Regions and interpolation weights are computed once and applied to the gathered vertex values of every requested
+        intrinsic. Values match calling interpolate_all once per intrinsic.
+
+        Args:
+            input (np.ndarray): (N, 2) array of (zoom, focus distance) query points
+            intrinsics (list): intrinsics to interpolate, defaults to intrinsics_ordering
+            extrapolate (bool): whether to extrapolate values for points outside of the interpolation regions
+            plan (InterpolationPlan): precomputed plan for input, computed if not provided
+
+        Returns:
+            np.ndarray: (N, len(intrinsics)) array of interpolated values
+        '''
+        if intrinsics is None:
+            intrinsics = self.intrinsics_ordering
+        dims = [self.dim_map[intrinsic] for intrinsic in intrinsics]
+
+        if plan is None:
+            plan = self.plan(input)
+        output = plan.apply(self.vertex_values[:, dims])
 
         if extrapolate:
-            if intrinsic in ['fx', 'fy']:
-                # Split input based on zoom values
-                for zoom_idx in range(len(self.approx_zooms) - 1):
-                    zoom_min, zoom_max = self.approx_zooms[zoom_idx], self.approx_zooms[zoom_idx + 1]
+            snapped_cols = []
+
+            # Assign every point to its approx_zooms interval once
+            zoom_edges = np.array(self.approx_zooms, dtype=np.float64)
+            interval_ids = get_interval_ids(input[:, 0], zoom_edges)
+
+            # A point on a shared zoom boundary falls through to the upper interval if the lower one gives NaN
+            on_upper_edge = (interval_ids >= 0) & (interval_ids + 2 < len(zoom_edges))
+            on_upper_edge[on_upper_edge] = input[on_upper_edge, 0] == zoom_edges[interval_ids[on_upper_edge] + 1]
+            upper_ids = np.where(on_upper_edge, interval_ids + 1, -1)
+
+            for col, intrinsic in enumerate(intrinsics):
+                if intrinsic in ['fx', 'fy']:
+                    for ids in (interval_ids, upper_ids):
+                        mask = (ids >= 0) & np.isnan(output[:, col])
+                        if mask.sum() > 0:
+                            output[mask, col] = self.extrapolate_fx_fy(input[mask], intrinsic, interval_ids=ids[mask])[:, 0]
+                else:
+                    snapped_cols.append(col)
 
-                    # Select all inputs within consecutive zoom values, and still missing value; note that NaN lens metadata will never be picked up for extrapolation
-                    mask = (zoom_min <= input[:, 0]) & (input[:, 0] <= zoom_max) & np.isnan(output).flatten()
-                    if mask.sum() > 0:
-                        output[mask] = self.extrapolate_fx_fy(input[mask], zoom_min, zoom_max, intrinsic)
-            else:
-                # Select all inputs with non-NaN lens metadata, and missing output
-                mask = (~np.isnan(input)).all(axis=-1) & np.isnan(output).flatten()
+            # All remaining intrinsics share the snapped inputs, so they are located and weighted once
+            if len(snapped_cols) > 0:
+                mask = (~np.isnan(input)).all(axis=-1) & np.isnan(output[:, snapped_cols]).any(axis=-1)
                 if mask.sum() > 0:
-                    # Get highest fds supported by LUT
-                    modified_input = self.snap_to_highest_fd(input[mask])
+                    modified_plan = self.plan(self.snap_to_highest_fd(input[mask]))
+                    output[np.ix_(mask, snapped_cols)] = modified_plan.apply(self.vertex_values[:, [dims[col] for col in snapped_cols]])
 
-                    # Requery interpolation with in bound points
-                    output[mask], _, _ = self.interpolate_all(modified_input, intrinsic, extrapolate=False)
-
-        return output, colors, used_triangles
+        return output
 
 
     def visualize_regions(self, input, colors, used_triangles, n_zooms=150, n_fdists=150, region=None, show=True, alpha=0.5, ecol='black', save_path=None):
+        import matplotlib.pyplot as plt
+
         plt.rcParams['font.family'] = 'serif'
         fig, ax = plt.subplots(figsize=(6, 6))
 
@@ -504,7 +869,29 @@ class LUT:
 
 
     # Leave-one-out cross-validation experiment code
-    def get_surrounding_regions(self, zoom_ind, fdist_ind):
+    def get_vertex_stars(self):
+        '''
+        Map every LUT vertex (zoom_ind, fdist_ind) to the grid and drone regions containing it, in region order, so that
+        leave-one-out evaluation does not rescan all regions for every vertex.
+        '''
+        stars = {}
+
+        for reg in self.grid_regions:
+            for vertex in set(map(tuple, np.asarray(reg).tolist())):
+                stars.setdefault(vertex, ([], []))[0].append(reg)
+
+        for reg in self.drone_regions:
+            for vertex in set(map(tuple, np.asarray(reg).tolist())):
+                stars.setdefault(vertex, ([], []))[1].append(reg)
+
+        return stars
+
+
+    def get_surrounding_regions(self, zoom_ind, fdist_ind, stars=None):
+        if stars is not None:
+            grid_regions, drone_regions = stars.get((zoom_ind, fdist_ind), ([], []))
+            return list(grid_regions), list(drone_regions)
+
         exp = np.array([zoom_ind, fdist_ind])
 
         grid_regions = []
@@ -521,10 +908,69 @@ class LUT:
         return grid_regions, drone_regions
 
 
+    def get_leave_one_out_region(self, zoom_ind, fdist_ind, input_val, grs, drs):
+        '''
+        Find the region used to interpolate vertex (zoom_ind, fdist_ind) from the vertices of its surrounding regions, with
+        the vertex itself left out. Only the local neighbourhood of the vertex is re-triangulated.
+
+        Returns:
+            str: "quadrilateral" or "triangular", None if no region contains the vertex
+            np.ndarray: (4, 2) quadrilateral or (3, 2) triangle of vertex indices, None if no region contains the vertex
+        '''
+        from scipy.spatial import Delaunay
+
+        # Get unique set of all vertices of surrounding regions
+        all_vertices = np.unique(np.vstack(grs + drs), axis=0)
+
+        # Remove current vertex from consideration for interpolation
+        idx = np.where((all_vertices == np.array([zoom_ind, fdist_ind])).all(axis=1))[0][0]
+        all_vertices = np.delete(all_vertices, idx, axis=0)
+
+        # Find all axis-aligned rectangles that can be formed with the surrounding vertices
+        rectangle_indices = get_axis_aligned_rectangles(all_vertices)
+
+        # Use rectangular interpolation if possible
+        if len(rectangle_indices) > 0:
+            # Identify rectangle with least span over zoom indices; tiebreaks broken by overall rectangle size (all sizes computed in index differences)
+            rectangle_diagonals = np.array([[rectangle[0], rectangle[1]] for rectangle in rectangle_indices])
+            rectangle_diagonals = all_vertices[rectangle_diagonals]
+            rectangle_diagonals = np.abs(rectangle_diagonals[:, 1] - rectangle_diagonals[:, 0])
+
+            # Perform rectangle selection
+            row_sum = rectangle_diagonals.sum(axis=1)
+            idx = np.lexsort((row_sum, rectangle_diagonals[:, 0]))[0]
+            selected_rectangle = rectangle_indices[idx]
+            selected_rectangle = all_vertices[np.array(selected_rectangle)]
+
+            zmin, zmax = np.min(selected_rectangle[:, 0]), np.max(selected_rectangle[:, 0])
+            fdmin, fdmax = np.min(selected_rectangle[:, 1]), np.max(selected_rectangle[:, 1])
+
+            quad_reg = np.array([[zmin, fdmin],
+                                [zmin, fdmax],
+                                [zmax, fdmin],
+                                [zmax, fdmax]])
+
+            return "quadrilateral", quad_reg
+
+        # Use triangular interpolation if possible
+        triangulation_points = all_vertices
+
+        triangles = Delaunay(triangulation_points).simplices
+        tri_regs = [triangulation_points[simplex] for simplex in triangles]
+
+        for tri_reg in tri_regs:
+            if self.check_in_triangle(input_val, tri_reg, loose_check_percent_threshold=1.0)[0]:
+                return "triangular", tri_reg
+
+        return None, None
+
+
     def get_interpolation_trial_errors(self, intrinsic='fx', use_percent_error=True):
         error_grid = np.zeros((self.nzoom, self.nfdist)) * np.nan
         interpolation_type_color_grid = np.ones((self.nzoom, self.nfdist, 3))
 
+        stars = self.get_vertex_stars()
+
         for nz in range(0, self.nzoom):
             for nfd in range(0, self.nfdist):
                 zoom_extreme = (nz == 0 or nz == self.nzoom - 1)
@@ -535,44 +981,15 @@ class LUT:
                 input_ind = np.array([[nz, nfd]])
                 input_val = np.array([self.get_point_values(input_ind)])
 
-                grs, drs = self.get_surrounding_regions(nz, nfd)
+                grs, drs = self.get_surrounding_regions(nz, nfd, stars=stars)
 
                 if len(grs) == 0 and len(drs) == 0:  # no experiment performed, skip
                     continue
 
-                # Get unique set of all vertices of surrounding regions
-                all_vertices = np.unique(np.vstack(grs + drs), axis=0)
-
-                # Remove current vertex from consideration for interpolation
-                idx = np.where((all_vertices == np.array([nz, nfd])).all(axis=1))[0][0]
-                all_vertices = np.delete(all_vertices, idx, axis=0)
-
-                # Find all axis-aligned rectangles that can be formed with the surrounding vertices
-                rectangle_indices = get_axis_aligned_rectangles(all_vertices)
-
-                # Use rectangular interpolation if possible
-                if len(rectangle_indices) > 0:
-                    # Identify rectangle with least span over zoom indices; tiebreaks broken by overall rectangle size (all sizes computed in index differences)
-                    rectangle_diagonals = np.array([[rectangle[0], rectangle[1]] for rectangle in rectangle_indices])
-                    rectangle_diagonals = all_vertices[rectangle_diagonals]
-                    rectangle_diagonals = np.abs(rectangle_diagonals[:, 1] - rectangle_diagonals[:, 0])
-
-                    # Perform rectangle selection
-                    row_sum = rectangle_diagonals.sum(axis=1)
-                    idx = np.lexsort((row_sum, rectangle_diagonals[:, 0]))[0]
-                    selected_rectangle = rectangle_indices[idx]
-                    selected_rectangle = all_vertices[np.array(selected_rectangle)]
-
-                    # Perform interpolation
-                    zmin, zmax = np.min(selected_rectangle[:, 0]), np.max(selected_rectangle[:, 0])
-                    fdmin, fdmax = np.min(selected_rectangle[:, 1]), np.max(selected_rectangle[:, 1])
+                interpolation_type, reg = self.get_leave_one_out_region(nz, nfd, input_val, grs, drs)
 
-                    quad_reg = np.array([[zmin, fdmin],
-                                        [zmin, fdmax],
-                                        [zmax, fdmin],
-                                        [zmax, fdmax]])
-
-                    interp, _ = self.trapezoidal_interpolation(input_val, quad_reg, intrinsic, ensure_region_type=False)
+                if interpolation_type == "quadrilateral":
+                    interp, _ = self.trapezoidal_interpolation(input_val, reg, intrinsic, ensure_region_type=False)
                     interp = interp[0, 0]
 
                     true_intrinsic = self.get_intrinsic(input_ind.squeeze(), intrinsic, is_drone=False, ensure_region_type=False)
@@ -581,144 +998,98 @@ class LUT:
 
                     interpolation_type_color_grid[nz, nfd] = np.array([0, 1, 0])  # green for quadrilateral interpolation
 
-                else:
-                    # Use triangular interpolation if possible
-                    triangulation_points = all_vertices
-
-                    triangles = Delaunay(triangulation_points).simplices
-                    tri_regs = [triangulation_points[simplex] for simplex in triangles]
-
-                    for tri_reg in tri_regs:
-                        if self.check_in_triangle(input_val, tri_reg, loose_check_percent_threshold=1.0)[0]:
-                            interp, _ = self.triangular_interpolation(input_val, tri_reg, intrinsic, ensure_region_type=False)
-                            interp = interp[0, 0]
+                elif interpolation_type == "triangular":
+                    interp, _ = self.triangular_interpolation(input_val, reg, intrinsic, ensure_region_type=False)
+                    interp = interp[0, 0]
 
-                            true_intrinsic = self.get_intrinsic(input_ind.squeeze(), intrinsic, is_drone=True, ensure_region_type=False)
+                    true_intrinsic = self.get_intrinsic(input_ind.squeeze(), intrinsic, is_drone=True, ensure_region_type=False)
 
-                            error_grid[nz, nfd] = np.abs(interp - true_intrinsic) / true_intrinsic if use_percent_error else np.abs(interp - true_intrinsic)
-                            interpolation_type_color_grid[nz, nfd] = np.array([1, 0, 0])  # red for triangular interpolation
-                            break
+                    error_grid[nz, nfd] = np.abs(interp - true_intrinsic) / true_intrinsic if use_percent_error else np.abs(interp - true_intrinsic)
+                    interpolation_type_color_grid[nz, nfd] = np.array([1, 0, 0])  # red for triangular interpolation
 
         return error_grid, interpolation_type_color_grid
 
 
-    def get_leave_one_out_records(self):
-        records = {}
-
-        def intrinsics_to_dict(values):
-            return {
-                intr: float(values[self.dim_map[intr]])
-                for intr in self.intrinsics_ordering
-            }
+    def get_leave_one_out_record(self, nz, nfd, stars=None):
+        '''
+        Interpolate all intrinsics at vertex (nz, nfd) with the vertex left out of the LUT, and compare to its ground truth.
+        '''
+        exp_name = f"zoom_{nz}_focus_distance_{nfd}"
 
-        for nz in range(0, self.nzoom):
-            for nfd in range(0, self.nfdist):
-                exp_name = f"zoom_{nz}_focus_distance_{nfd}"
-
-                record = {
-                    "status": "skipped",
-                    "reason": None,
-                    "interpolation_type": None,
-                    "intrinsics_gt": None,
-                    "intrinsics_interpolated": None,
-                }
-
-                if exp_name not in self.experiments.keys() or self.experiments[exp_name]["selected_trial"] == "invalid":
-                    record["reason"] = "no_experiment"
-                    records[exp_name] = record
-                    continue
-
-                true_values = np.array([self.experiments[exp_name][intr] for intr in self.intrinsics_ordering])
-                record["intrinsics_gt"] = intrinsics_to_dict(true_values)
-
-                zoom_extreme = (nz == 0 or nz == self.nzoom - 1)
-                fdist_extreme = (nfd == 0 or nfd == self.nfdist - 1)
-                if zoom_extreme and fdist_extreme:  # skip corner points, no interpolation possible
-                    record["reason"] = "corner_point"
-                    records[exp_name] = record
-                    continue
-
-                input_ind = np.array([[nz, nfd]])
-                input_val = np.array([self.get_point_values(input_ind)])
-
-                grs, drs = self.get_surrounding_regions(nz, nfd)
-
-                if len(grs) == 0 and len(drs) == 0:  # no experiment performed, skip
-                    record["reason"] = "no_surrounding_regions"
-                    records[exp_name] = record
-                    continue
+        record = {
+            "status": "skipped",
+            "reason": None,
+            "interpolation_type": None,
+            "intrinsics_gt": None,
+            "intrinsics_interpolated": None,
+        }
 
-                # Get unique set of all vertices of surrounding regions
-                all_vertices = np.unique(np.vstack(grs + drs), axis=0)
+        if exp_name not in self.experiments.keys() or self.experiments[exp_name]["selected_trial"] == "invalid":
+            record["reason"] = "no_experiment"
+            return record
 
-                # Remove current vertex from consideration for interpolation
-                idx = np.where((all_vertices == np.array([nz, nfd])).all(axis=1))[0][0]
-                all_vertices = np.delete(all_vertices, idx, axis=0)
+        true_values = np.array([self.experiments[exp_name][intr] for intr in self.intrinsics_ordering])
+        record["intrinsics_gt"] = {intr: float(true_values[self.dim_map[intr]]) for intr in self.intrinsics_ordering}
 
-                # Find all axis-aligned rectangles that can be formed with the surrounding vertices
-                rectangle_indices = get_axis_aligned_rectangles(all_vertices)
+        zoom_extreme = (nz == 0 or nz == self.nzoom - 1)
+        fdist_extreme = (nfd == 0 or nfd == self.nfdist - 1)
+        if zoom_extreme and fdist_extreme:  # skip corner points, no interpolation possible
+            record["reason"] = "corner_point"
+            return record
 
-                interpolated_values = {}
+        input_ind = np.array([[nz, nfd]])
+        input_val = np.array([self.get_point_values(input_ind)])
 
-                # Use rectangular interpolation if possible
-                if len(rectangle_indices) > 0:
-                    # Identify rectangle with least span over zoom indices; tiebreaks broken by overall rectangle size (all sizes computed in index differences)
-                    rectangle_diagonals = np.array([[rectangle[0], rectangle[1]] for rectangle in rectangle_indices])
-                    rectangle_diagonals = all_vertices[rectangle_diagonals]
-                    rectangle_diagonals = np.abs(rectangle_diagonals[:, 1] - rectangle_diagonals[:, 0])
+        grs, drs = self.get_surrounding_regions(nz, nfd, stars=stars)
 
-                    # Perform rectangle selection
-                    row_sum = rectangle_diagonals.sum(axis=1)
-                    idx = np.lexsort((row_sum, rectangle_diagonals[:, 0]))[0]
-                    selected_rectangle = rectangle_indices[idx]
-                    selected_rectangle = all_vertices[np.array(selected_rectangle)]
+        if len(grs) == 0 and len(drs) == 0:  # no experiment performed, skip
+            record["reason"] = "no_surrounding_regions"
+            return record
 
-                    # Perform interpolation
-                    zmin, zmax = np.min(selected_rectangle[:, 0]), np.max(selected_rectangle[:, 0])
-                    fdmin, fdmax = np.min(selected_rectangle[:, 1]), np.max(selected_rectangle[:, 1])
+        interpolation_type, reg = self.get_leave_one_out_region(nz, nfd, input_val, grs, drs)
 
-                    quad_reg = np.array([[zmin, fdmin],
-                                        [zmin, fdmax],
-                                        [zmax, fdmin],
-                                        [zmax, fdmax]])
+        if interpolation_type is None:
+            record["reason"] = "no_valid_interpolation_region"
+            return record
 
-                    for intrinsic in self.intrinsics_ordering:
-                        interp, _ = self.trapezoidal_interpolation(input_val, quad_reg, intrinsic, ensure_region_type=False)
-                        interpolated_values[intrinsic] = float(interp[0, 0])
+        interpolation = self.trapezoidal_interpolation if interpolation_type == "quadrilateral" else self.triangular_interpolation
 
-                    record["status"] = "present"
-                    record["reason"] = "normal"
-                    record["interpolation_type"] = "quadrilateral"
-                    record["intrinsics_interpolated"] = interpolated_values
+        interpolated_values = {}
+        for intrinsic in self.intrinsics_ordering:
+            interp, _ = interpolation(input_val, reg, intrinsic, ensure_region_type=False)
+            interpolated_values[intrinsic] = float(interp[0, 0])
 
-                else:
-                    # Use triangular interpolation if possible
-                    triangulation_points = all_vertices
+        record["status"] = "present"
+        record["reason"] = "normal"
+        record["interpolation_type"] = interpolation_type
+        record["intrinsics_interpolated"] = interpolated_values
 
-                    triangles = Delaunay(triangulation_points).simplices
-                    tri_regs = [triangulation_points[simplex] for simplex in triangles]
+        return record
 
-                    for tri_reg in tri_regs:
-                        if self.check_in_triangle(input_val, tri_reg, loose_check_percent_threshold=1.0)[0]:
-                            for intrinsic in self.intrinsics_ordering:
-                                interp, _ = self.triangular_interpolation(input_val, tri_reg, intrinsic, ensure_region_type=False)
-                                interpolated_values[intrinsic] = float(interp[0, 0])
 
-                            record["status"] = "present"
-                            record["reason"] = "normal"
-                            record["interpolation_type"] = "triangular"
-                            record["intrinsics_interpolated"] = interpolated_values
-                            break
+    def get_leave_one_out_records(self, n_workers=1):
+        '''
+        Compute leave-one-out records for every (zoom, fdist) vertex, keyed by experiment name in grid order.
 
-                if record["status"] == "skipped" and record["reason"] is None:
-                    record["reason"] = "no_valid_interpolation_region"
+        Args:
+            n_workers (int): number of worker processes to evaluate vertices with, evaluated in this process if 1
+        '''
+        stars = self.get_vertex_stars()
+        vertices = [(nz, nfd) for nz in range(0, self.nzoom) for nfd in range(0, self.nfdist)]
 
-                records[exp_name] = record
+        if n_workers > 1:
+            # Vertices are independent; map preserves their order, so the records match the sequential output
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=init_leave_one_out_worker, initargs=(self, stars)) as executor:
+                records = list(executor.map(get_leave_one_out_record_worker, vertices, chunksize=max(1, len(vertices) // (4 * n_workers))))
+        else:
+            records = [self.get_leave_one_out_record(nz, nfd, stars=stars) for nz, nfd in vertices]
 
-        return records
+        return {f"zoom_{nz}_focus_distance_{nfd}": record for (nz, nfd), record in zip(vertices, records)}
 
 
     def visualize_leave_one_out_experiment_trial_types(self, input, colors, used_triangles, interpolation_type_color_grid, n_zooms=150, n_fdists=150, region=None, show=True, alpha=0.5, ecol='black', save_path=None):
+        import matplotlib.pyplot as plt
+
         plt.rcParams['font.family'] = 'serif'
         fig, ax = plt.subplots(figsize=(15, 10))
 
@@ -794,6 +1165,705 @@ class LUT:
         plt.show()
 
 
+class InterpolationPlan:
+    '''
+    Array-backed interpolation geometry of a batch of LUT query points, as returned by LUT.plan.
+
+    Each point stores the id of its region (index into grid_regions + drone_regions, -1 if outside the LUT), its region type
+    code, the ids of its region vertices into LUT.vertex_values (N, 4), and their weights (N, 4). Triangle regions are padded
+    with a zero-weight fourth vertex, and points outside the LUT have NaN weights, so applying a plan propagates NaN to them.
+    '''
+    QUADRILATERAL = 0
+    TRIANGULAR = 1
+    REGION_TYPE_NAMES = {QUADRILATERAL: "quadrilateral", TRIANGULAR: "triangular"}
+
+    def __init__(self, lens, region_ids, region_types, vertex_ids, weights, n_unique=None, unique_inverse=None):
+        self.lens = lens
+        self.region_ids = region_ids
+        self.region_types = region_types
+        self.vertex_ids = vertex_ids
+        self.weights = weights
+
+        # Number of distinct query points that were actually located, the rest were served from duplicates. unique_inverse
+        # optionally maps every point to its distinct query point
+        self.n_unique = len(self) if n_unique is None else n_unique
+        self.unique_inverse = unique_inverse
+
+
+    def __len__(self):
+        return self.region_ids.shape[0]
+
+
+    @property
+    def n_cache_hits(self):
+        return len(self) - self.n_unique
+
+
+    @property
+    def cache_hit_rate(self):
+        return self.n_cache_hits / len(self) if len(self) > 0 else 0.0
+
+
+    @property
+    def is_within_lut(self):
+        return self.region_ids >= 0
+
+
+    def take(self, indices):
+        '''
+        Return the plan of a subset of the query points, selected by an index array, mask, or slice.
+        '''
+        return InterpolationPlan(self.lens, self.region_ids[indices], self.region_types[indices], self.vertex_ids[indices], self.weights[indices])
+
+
+    def apply(self, values):
+        '''
+        Interpolate per-vertex values, given as a (V,) or (V, C) array indexed like LUT.vertex_values.
+        '''
+        values = np.asarray(values)
+        if values.ndim == 1:
+            return np.einsum('nk,nk->n', self.weights, values[self.vertex_ids])
+
+        return np.einsum('nk,nkc->nc', self.weights, values[self.vertex_ids])
+
+
+    def get_used_region_ids(self):
+        return np.unique(self.region_ids[self.is_within_lut])
+
+
+    def save(self, path):
+        np.savez(
+            path,
+            lens=self.lens,
+            region_ids=self.region_ids,
+            region_types=self.region_types,
+            vertex_ids=self.vertex_ids,
+            weights=self.weights,
+            n_unique=self.n_unique,
+        )
+
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            n_unique = int(data['n_unique']) if 'n_unique' in data else None
+            return cls(str(data['lens']), data['region_ids'], data['region_types'], data['vertex_ids'], data['weights'], n_unique=n_unique)
+
+
+class MultiLensLUT:
+    '''
+    Several lens LUTs packed into stacked arrays indexed by lens id, so that (lens_id, zoom, fdist) queries over all lenses
+    are answered in one vectorized call.
+
+    Vertices, regions, and point-location index cells of every lens are offset into shared tables. The index edges and
+    extrapolation zoom grids of all lenses are combined by merge_sorted_rows into one array of merged edges and a per-lens
+    count table, so a single searchsorted on the merged edges, followed by a lookup in the count table of each query's
+    lens, gives the cell or interval every lens's own edges would. Per-lens grids and values are stacked with pad_rows and
+    only read within each lens's row length; value tables are padded with NaN. Results match querying each lens's LUT
+    separately.
+    '''
+    def __init__(self, luts):
+        self.lenses = list(luts.keys())
+        self.luts = [luts[lens] for lens in self.lenses]
+        self.lens_ids = {lens: lens_id for lens_id, lens in enumerate(self.lenses)}
+        self.n_lenses = len(self.lenses)
+
+        self.intrinsics_ordering = self.luts[0].intrinsics_ordering
+        self.dim_map = self.luts[0].dim_map
+        self.nintr = self.luts[0].nintr
+
+        # Vertex and region tables, with per-lens offsets into them
+        self.vertex_offsets = np.cumsum([0] + [lut.vertex_values.shape[0] for lut in self.luts])
+        self.region_offsets = np.cumsum([0] + [lut.n_regions for lut in self.luts])
+
+        self.vertex_values = np.vstack([lut.vertex_values for lut in self.luts])
+        self.region_vertex_ids = np.vstack([lut.region_vertex_ids + offset for lut, offset in zip(self.luts, self.vertex_offsets)])
+        self.region_points = np.concatenate([lut.region_points for lut in self.luts])
+        self.region_triangles = np.concatenate([lut.region_triangles for lut in self.luts])
+        self.region_is_triangular = np.concatenate([np.arange(lut.n_regions) >= len(lut.grid_regions) for lut in self.luts])
+
+        # Point-location index, with the candidate lists of all lens cells stacked and offset to global region ids
+        self.index_zoom_edges, self.index_zoom_counts = merge_sorted_rows([lut.index_zoom_edges for lut in self.luts])
+        self.index_fdist_edges, self.index_fdist_counts = merge_sorted_rows([lut.index_fdist_edges for lut in self.luts])
+        self.index_n_fdist_edges = np.array([len(lut.index_fdist_edges) for lut in self.luts], dtype=np.int64)
+        self.index_cell_offsets = np.cumsum([0] + [lut.index_candidates.shape[0] for lut in self.luts])
+
+        max_candidates = max(lut.index_candidates.shape[1] for lut in self.luts)
+        self.index_candidates = np.full((self.index_cell_offsets[-1], max_candidates), -1, dtype=np.int64)
+        for lut, cell_offset, region_offset in zip(self.luts, self.index_cell_offsets, self.region_offsets):
+            candidates = self.index_candidates[cell_offset:cell_offset + lut.index_candidates.shape[0], :lut.index_candidates.shape[1]]
+            candidates[:] = np.where(lut.index_candidates >= 0, lut.index_candidates + region_offset, -1)
+
+        # Extrapolation grids: thin lens constants over approx_zooms, and the top fdist boundary used for snapping
+        approx_zooms = [np.array(lut.approx_zooms, dtype=np.float64) for lut in self.luts]
+        self.approx_zooms, self.n_approx_zooms = pad_rows(approx_zooms)
+        self.approx_zoom_edges, self.approx_zoom_counts = merge_sorted_rows(approx_zooms)
+        self.extrapolation_constants, _ = pad_rows([lut.get_extrapolation_constants() for lut in self.luts], fill=np.nan)
+
+        top_boundaries = [lut.get_top_boundary() for lut in self.luts]
+        self.top_zooms, self.n_top_zooms = pad_rows([zooms for zooms, _ in top_boundaries])
+        self.top_zoom_edges, self.top_zoom_counts = merge_sorted_rows([zooms for zooms, _ in top_boundaries])
+        self.top_fds, _ = pad_rows([fds for _, fds in top_boundaries], fill=np.nan)
+
+
+    def split_input(self, input):
+        # Lens ids of (lens_id, zoom, fdist) rows; invalid lens ids are mapped to -1
+        lens_ids = input[:, 0]
+        valid = np.isfinite(lens_ids) & (lens_ids >= 0) & (lens_ids < self.n_lenses) & (lens_ids == np.floor(lens_ids))
+        return np.where(valid, lens_ids, -1).astype(np.int64), input[:, 1:]
+
+
+    def locate_regions(self, input):
+        '''
+        Return the global region id (into the stacked region tables) of each (lens_id, zoom, fdist) point, or -1.
+        '''
+        lens_ids, zoom_and_fdist = self.split_input(input)
+        region_ids = np.full(input.shape[0], -1, dtype=np.int64)
+
+        valid = (lens_ids >= 0) & np.isfinite(zoom_and_fdist).all(axis=-1)
+        if self.region_offsets[-1] == 0 or not valid.any():
+            return region_ids
+
+        valid_indices = np.where(valid)[0]
+        lens_ids = lens_ids[valid]
+        points = zoom_and_fdist[valid]
+
+        # Per-lens searchsorted(side='right') through the merged edges of all lenses
+        zoom_cells = self.index_zoom_counts[lens_ids, np.searchsorted(self.index_zoom_edges, points[:, 0], side='right')]
+        fdist_cells = self.index_fdist_counts[lens_ids, np.searchsorted(self.index_fdist_edges, points[:, 1], side='right')]
+        cells = self.index_cell_offsets[lens_ids] + zoom_cells * (self.index_n_fdist_edges[lens_ids] + 1) + fdist_cells
+
+        region_ids[valid_indices] = locate_in_candidates(points, self.index_candidates[cells], self.region_triangles)
+        return region_ids
+
+
+    def plan(self, input, deduplicate=True):
+        '''
+        Locate every (lens_id, zoom, fdist) query point and compute its interpolation weights.
+
+        Returns:
+            InterpolationPlan: global region ids and vertex ids into the stacked vertex_values of every query point
+        '''
+        if deduplicate and input.shape[0] > 1:
+            # Rows are compared bytewise, which is exact for the unique lookups needed here
+            packed = np.ascontiguousarray(input, dtype=np.float64).view(np.dtype((np.void, 3 * 8))).reshape(-1)
+            _, unique_indices, inverse = np.unique(packed, return_index=True, return_inverse=True)
+            unique_input = input[unique_indices]
+            inverse = inverse.reshape(-1)
+        else:
+            unique_input, inverse = input, None
+
+        region_ids = self.locate_regions(unique_input)
+        is_triangular = (region_ids >= 0) & self.region_is_triangular[region_ids]
+        vertex_ids, weights = region_weights(unique_input[:, 1:], region_ids, self.region_vertex_ids, self.region_points, is_triangular)
+
+        region_types = np.full(unique_input.shape[0], -1, dtype=np.int8)
+        region_types[region_ids >= 0] = InterpolationPlan.QUADRILATERAL
+        region_types[is_triangular] = InterpolationPlan.TRIANGULAR
+
+        if inverse is not None:
+            region_ids, region_types, vertex_ids, weights = region_ids[inverse], region_types[inverse], vertex_ids[inverse], weights[inverse]
+
+        return InterpolationPlan(None, region_ids, region_types, vertex_ids, weights, n_unique=unique_input.shape[0], unique_inverse=inverse)
+
+
+    def get_lens_plan(self, plan, input, lens):
+        '''
+        Restrict a plan over (lens_id, zoom, fdist) inputs to the rows of one lens, with region and vertex ids local to that
+        lens's LUT, so it can be used wherever LUT.plan output is expected.
+        '''
+        lens_id = self.lens_ids[lens]
+        rows = self.split_input(input)[0] == lens_id
+
+        region_ids = plan.region_ids[rows]
+        region_ids = np.where(region_ids >= 0, region_ids - self.region_offsets[lens_id], -1)
+        vertex_ids = plan.vertex_ids[rows] - self.vertex_offsets[lens_id]
+        vertex_ids[region_ids < 0] = 0
+
+        # Count the distinct query points among this lens's rows
+        n_unique = None
+        if plan.unique_inverse is not None:
+            is_used = np.zeros(plan.n_unique, dtype=bool)
+            is_used[plan.unique_inverse[rows]] = True
+            n_unique = int(is_used.sum())
+
+        return InterpolationPlan(lens, region_ids, plan.region_types[rows], vertex_ids, plan.weights[rows], n_unique=n_unique)
+
+
+    def interpolate_many(self, input, intrinsics=None, extrapolate=False, plan=None):
+        '''
+        Interpolate several intrinsics for (lens_id, zoom, fdist) query points of any lenses in one pass; see
+        LUT.interpolate_many.
+
+        Args:
+            input (np.ndarray): (N, 3) array of (lens id, zoom, focus distance) query points
+            intrinsics (list): intrinsics to interpolate, defaults to intrinsics_ordering
+            extrapolate (bool): whether to extrapolate values for points outside of the interpolation regions
+            plan (InterpolationPlan): precomputed plan for input, computed if not provided
+
+        Returns:
+            np.ndarray: (N, len(intrinsics)) array of interpolated values
+        '''
+        if intrinsics is None:
+            intrinsics = self.intrinsics_ordering
+        dims = [self.dim_map[intrinsic] for intrinsic in intrinsics]
+
+        if plan is None:
+            plan = self.plan(input)
+        output = plan.apply(self.vertex_values[:, dims])
+
+        if not extrapolate:
+            return output
+
+        lens_ids, zoom_and_fdist = self.split_input(input)
+        rows = np.arange(input.shape[0])
+        snapped_cols = []
+
+        # Assign every point to its lens's approx_zooms interval once
+        interval_ids = get_row_interval_ids(zoom_and_fdist[:, 0], lens_ids, self.approx_zooms, self.n_approx_zooms, self.approx_zoom_edges, self.approx_zoom_counts)
+
+        # A point on a shared zoom boundary falls through to the upper interval if the lower one gives NaN
+        on_upper_edge = (interval_ids >= 0) & (interval_ids + 2 < self.n_approx_zooms[lens_ids])
+        on_upper_edge[on_upper_edge] = zoom_and_fdist[on_upper_edge, 0] == self.approx_zooms[lens_ids[on_upper_edge], interval_ids[on_upper_edge] + 1]
+        upper_ids = np.where(on_upper_edge, interval_ids + 1, -1)
+
+        sensor_width_mm, _, sensor_resolution_x, _, _ = get_camera_info('arri')
+
+        for col, intrinsic in enumerate(intrinsics):
+            if intrinsic in ['fx', 'fy']:
+                for ids in (interval_ids, upper_ids):
+                    mask = (ids >= 0) & np.isnan(output[:, col])
+                    if mask.sum() > 0:
+                        lens, lower = lens_ids[mask], ids[mask]
+                        output[mask, col] = thin_lens_extrapolation(
+                            zoom_and_fdist[mask],
+                            self.approx_zooms[lens, lower], self.approx_zooms[lens, lower + 1],
+                            self.extrapolation_constants[lens, lower], self.extrapolation_constants[lens, lower + 1],
+                            sensor_width_mm, sensor_resolution_x,
+                        )
+            else:
+                snapped_cols.append(col)
+
+        # All remaining intrinsics share the snapped inputs, so they are located and weighted once
+        if len(snapped_cols) > 0:
+            mask = (~np.isnan(zoom_and_fdist)).all(axis=-1) & np.isnan(output[:, snapped_cols]).any(axis=-1)
+            if mask.sum() > 0:
+                snapped = np.full((mask.sum(), 3), np.nan)
+                snapped[:, 0] = input[mask, 0]
+
+                lens = lens_ids[mask]
+                ids = get_row_interval_ids(zoom_and_fdist[mask, 0], lens, self.top_zooms, self.n_top_zooms, self.top_zoom_edges, self.top_zoom_counts)
+                inside = ids >= 0
+                lens, lower, zoom, old_fd = lens[inside], ids[inside], zoom_and_fdist[mask, 0][inside], zoom_and_fdist[mask, 1][inside]
+
+                zoom_min, zoom_max = self.top_zooms[lens, lower], self.top_zooms[lens, lower + 1]
+                frac = (zoom - zoom_min) / (zoom_max - zoom_min)
+                new_fd = (1 - frac) * self.top_fds[lens, lower] + frac * self.top_fds[lens, lower + 1]
+
+                # Points below the top boundary cannot be snapped up to it, and are left NaN, see LUT.is_below_top_boundary
+                snappable = (old_fd >= new_fd) | (old_fd == -1)
+                inside[inside] = snappable
+
+                snapped[inside, 1] = zoom[snappable]
+                snapped[inside, 2] = new_fd[snappable]
+
+                modified_plan = self.plan(snapped)
+                output[np.ix_(mask, snapped_cols)] = modified_plan.apply(self.vertex_values[:, [dims[col] for col in snapped_cols]])
+
+        return output
+
+
+class RasterizedLUT:
+    '''
+    Dense table of a LUT's normal interpolation values, sampled on a regular (zoom, fdist) grid for O(1) lookups.
+
+    Each table node stores the interpolated intrinsics and the id of the region containing it. A query whose four surrounding
+    nodes all lie in the same region is answered by bilinear lookup; since regions are convex, the whole cell is then inside
+    that region, so barycentric regions are reproduced exactly and trapezoidal regions up to the bilinear approximation
+    error. All other queries (cells straddling region or LUT boundaries) fall back to exact interpolation. The table is
+    verified against exact interpolation on construction and rejected if any value differs by more than
+    atol + rtol * (largest magnitude of that intrinsic over the LUT vertices).
+    '''
+    NODES_PER_BLOCK = 1 << 18
+
+    def __init__(self, lut, zoom_step=0.1, fd_step=10.0, rtol=1e-4, atol=1e-12, n_verify_samples=100000, seed=0):
+        self.lut = lut
+        self.zoom_step = zoom_step
+        self.fd_step = fd_step
+        self.rtol = rtol
+        self.atol = atol
+
+        # Cover the bounding box of all interpolation regions
+        region_points = lut.region_points.reshape(-1, 2)
+        self.zoom_min, self.fd_min = region_points.min(axis=0)
+        zoom_max, fd_max = region_points.max(axis=0)
+
+        self.nzoom = int(np.ceil((zoom_max - self.zoom_min) / zoom_step)) + 1
+        self.nfdist = int(np.ceil((fd_max - self.fd_min) / fd_step)) + 1
+
+        self.table = np.empty((self.nzoom, self.nfdist, lut.nintr))
+        self.region_ids = np.empty((self.nzoom, self.nfdist), dtype=np.int32)
+
+        # Fill the table a block of zoom rows at a time to bound the memory of the intermediate plans
+        fds = self.fd_min + np.arange(self.nfdist) * fd_step
+        rows_per_block = max(1, self.NODES_PER_BLOCK // self.nfdist)
+        for start in range(0, self.nzoom, rows_per_block):
+            stop = min(start + rows_per_block, self.nzoom)
+            zooms = self.zoom_min + np.arange(start, stop) * zoom_step
+            nodes = np.stack(np.meshgrid(zooms, fds, indexing='ij'), axis=-1).reshape(-1, 2)
+
+            plan = lut.plan(nodes, deduplicate=False)
+            self.table[start:stop] = plan.apply(lut.vertex_values).reshape(stop - start, self.nfdist, lut.nintr)
+            self.region_ids[start:stop] = plan.region_ids.reshape(stop - start, self.nfdist)
+
+        self.max_error_ratio = self.verify(n_verify_samples, seed=seed)
+
+
+    def lookup(self, input):
+        '''
+        Return the normal interpolation values (N, nintr) and region ids (N,) of (zoom, focus distance) query points.
+        '''
+        output = np.full((input.shape[0], self.lut.nintr), np.nan)
+        region_ids = np.full(input.shape[0], -1, dtype=np.int64)
+
+        u = (input[:, 0] - self.zoom_min) / self.zoom_step
+        v = (input[:, 1] - self.fd_min) / self.fd_step
+        valid = np.isfinite(u) & np.isfinite(v) & (u >= 0) & (u < self.nzoom - 1) & (v >= 0) & (v < self.nfdist - 1)
+
+        i = np.where(valid, np.floor(u), 0).astype(np.int64)
+        j = np.where(valid, np.floor(v), 0).astype(np.int64)
+
+        # Gather through flat node indices, which is much faster than 2D fancy indexing
+        node = i * self.nfdist + j
+        flat_region_ids = self.region_ids.reshape(-1)
+        flat_table = self.table.reshape(-1, self.lut.nintr)
+
+        # Only cells whose four nodes share one region are answered from the table
+        r00 = flat_region_ids.take(node)
+        same_region = valid & (r00 >= 0)
+        for offset in (1, self.nfdist, self.nfdist + 1):
+            same_region &= flat_region_ids.take(node + offset) == r00
+
+        node = node[same_region]
+        fu = (u[same_region] - i[same_region])[:, None]
+        fv = (v[same_region] - j[same_region])[:, None]
+
+        low_zoom = (1 - fv) * flat_table.take(node, axis=0) + fv * flat_table.take(node + 1, axis=0)
+        high_zoom = (1 - fv) * flat_table.take(node + self.nfdist, axis=0) + fv * flat_table.take(node + self.nfdist + 1, axis=0)
+        output[same_region] = (1 - fu) * low_zoom + fu * high_zoom
+        region_ids[same_region] = r00[same_region]
+
+        # Exact interpolation for everything else, so that region and LUT boundaries are resolved exactly
+        fallback = ~same_region & np.isfinite(input).all(axis=-1)
+        if fallback.any():
+            plan = self.lut.plan(input[fallback])
+            output[fallback] = plan.apply(self.lut.vertex_values)
+            region_ids[fallback] = plan.region_ids
+
+        return output, region_ids
+
+
+    def verify(self, n_samples, seed=0):
+        '''
+        Compare table lookups against exact interpolation at random points and cell centers, raising a ValueError if any
+        value exceeds the tolerance. Returns the largest error relative to the tolerance.
+        '''
+        rng = np.random.default_rng(seed)
+        lo = np.array([self.zoom_min, self.fd_min])
+        hi = lo + np.array([(self.nzoom - 1) * self.zoom_step, (self.nfdist - 1) * self.fd_step])
+
+        cell_centers = lo + (rng.integers(0, [self.nzoom - 1, self.nfdist - 1], size=(n_samples, 2)) + 0.5) * np.array([self.zoom_step, self.fd_step])
+        samples = np.vstack((rng.uniform(lo, hi, size=(n_samples, 2)), cell_centers))
+
+        looked_up, region_ids = self.lookup(samples)
+        plan = self.lut.plan(samples)
+        exact = plan.apply(self.lut.vertex_values)
+
+        if not np.array_equal(region_ids, plan.region_ids) or not np.array_equal(np.isnan(looked_up), np.isnan(exact)):
+            raise ValueError(f"Rasterized LUT for lens {self.lut.lens} does not match the exact region assignment")
+
+        # Tolerances are relative to each intrinsic's scale, since distortion coefficients cross zero
+        scale = np.nanmax(np.abs(self.lut.vertex_values), axis=0)
+        inside = plan.is_within_lut
+        error_ratio = np.abs(looked_up[inside] - exact[inside]) / (self.atol + self.rtol * scale)
+        max_error_ratio = float(error_ratio.max()) if error_ratio.size > 0 else 0.0
+
+        if max_error_ratio > 1.0:
+            worst = self.lut.intrinsics_ordering[np.unravel_index(np.argmax(error_ratio), error_ratio.shape)[1]]
+            raise ValueError(
+                f"Rasterized LUT for lens {self.lut.lens} exceeds tolerance (rtol={self.rtol}, atol={self.atol}) by "
+                f"{max_error_ratio:.2f}x on {worst}; use a smaller zoom_step / fd_step or a larger tolerance"
+            )
+
+        return max_error_ratio
+
+
+def get_interval_ids(values, edges):
+    '''
+    Find the first interval [edges[k], edges[k + 1]] of sorted edges containing each value.
+
+    Args:
+        values (np.ndarray): (N,) array of values
+        edges (np.ndarray): (M,) array of ascending interval edges
+
+    Returns:
+        np.ndarray: (N,) array of lower edge indices k, -1 for values outside of [edges[0], edges[-1]] or NaN
+    '''
+    if len(edges) < 2:
+        return np.full(values.shape[0], -1, dtype=np.int64)
+
+    # side='left' assigns values on a shared edge to the lower interval
+    interval_ids = np.clip(np.searchsorted(edges, values, side='left') - 1, 0, len(edges) - 2)
+    interval_ids[~((edges[0] <= values) & (values <= edges[-1]))] = -1
+
+    return interval_ids
+
+
+def locate_in_candidates(points, candidates, region_triangles):
+    '''
+    Return the first candidate region (row of candidates, padded with -1) whose triangles contain each point, or -1.
+
+    Candidates are tested rank by rank, dropping points as soon as a region contains them. Candidates are sorted by region
+    id, so points on shared edges deterministically keep the earliest region in first-match order.
+    '''
+    found = np.full(points.shape[0], -1, dtype=np.int64)
+    pending = np.arange(points.shape[0])
+    for rank in range(candidates.shape[1]):
+        pending = pending[candidates[pending, rank] >= 0]
+        if len(pending) == 0:
+            break
+
+        candidate_ids = candidates[pending, rank]
+        inside = edge_function_mask(points[pending, None], region_triangles[candidate_ids]).any(axis=-1)
+
+        found[pending[inside]] = candidate_ids[inside]
+        pending = pending[~inside]
+
+    return found
+
+
+def region_weights(zoom_and_fdist, region_ids, region_vertex_ids, region_points, is_triangular):
+    '''
+    Return the vertex ids (N, 4) and interpolation weights (N, 4) of each point within its region.
+
+    Triangle regions (is_triangular, per point) get a zero weight on their padded fourth vertex. Points outside every
+    region (region id -1) get NaN weights.
+    '''
+    vertex_ids = np.zeros((zoom_and_fdist.shape[0], 4), dtype=np.int64)
+    weights = np.full((zoom_and_fdist.shape[0], 4), np.nan)
+
+    inside = region_ids >= 0
+    vertex_ids[inside] = region_vertex_ids[region_ids[inside]]
+
+    is_quad = inside & ~is_triangular
+    if is_quad.any():
+        weights[is_quad] = trapezoidal_weights(zoom_and_fdist[is_quad], region_points[region_ids[is_quad]])
+
+    is_tri = inside & is_triangular
+    if is_tri.any():
+        weights[is_tri, :3] = triangular_weights(zoom_and_fdist[is_tri], region_points[region_ids[is_tri], :3])
+        weights[is_tri, 3] = 0.0
+
+    return vertex_ids, weights
+
+
+def thin_lens_extrapolation(input, zoom_min, zoom_max, c_min, c_max, sensor_width_mm, sensor_resolution_x):
+    '''
+    Extrapolate focal length in pixels from the thin lens constants c_min, c_max fit at zoom_min, zoom_max (all per point).
+    '''
+    # Compute CFL based on 1 / cfl + 1 / (fd - cfl) = 1 / c; when fd is -1 (infinity), cfl = c. Convert mm to pixels
+    fd = input[:, 1][:, None]
+    c = np.stack((c_min, c_max), axis=-1)
+    with np.errstate(invalid='ignore'):
+        cfls = np.where(fd == -1, c, (fd - np.sqrt(fd ** 2 - 4 * c * fd)) / 2) * sensor_resolution_x / sensor_width_mm
+
+    # Interpolate between zooms
+    frac = (input[:, 0] - zoom_min) / (zoom_max - zoom_min)
+    return (1 - frac) * cfls[:, 0] + frac * cfls[:, 1]
+
+
+def get_row_interval_ids(values, row_ids, edges, n_edges, merged_edges, merged_counts):
+    '''
+    Like get_interval_ids, with a separate row of ascending edges per value.
+
+    Args:
+        values (np.ndarray): (N,) array of values
+        row_ids (np.ndarray): (N,) row of edges for every value, -1 for none
+        edges (np.ndarray): (R, M) array of ascending edges per row, padded as returned by pad_rows
+        n_edges (np.ndarray): (R,) number of valid edges per row
+        merged_edges, merged_counts (np.ndarray): the same rows as returned by merge_sorted_rows
+
+    Returns:
+        np.ndarray: (N,) array of lower edge indices k into each value's row, -1 for values outside of it
+    '''
+    interval_ids = np.full(values.shape[0], -1, dtype=np.int64)
+
+    valid = (row_ids >= 0) & np.isfinite(values)
+    valid[valid] = n_edges[row_ids[valid]] >= 2
+    if not valid.any():
+        return interval_ids
+
+    rows, values = row_ids[valid], values[valid]
+    row_n_edges = n_edges[rows]
+
+    # Per-row searchsorted(side='left') through the merged edges
+    lower = merged_counts[rows, np.searchsorted(merged_edges, values, side='left')] - 1
+    lower = np.clip(lower, 0, row_n_edges - 2)
+    inside = (edges[rows, 0] <= values) & (values <= edges[rows, row_n_edges - 1])
+
+    interval_ids[valid] = np.where(inside, lower, -1)
+    return interval_ids
+
+
+def merge_sorted_rows(rows):
+    '''
+    Merge ascending 1D arrays into one array of their distinct values, and count the entries of every row up to each merged
+    value, so that one searchsorted on the merged values answers a searchsorted on any row.
+
+    Returns:
+        np.ndarray: (M,) array of distinct values of all rows
+        np.ndarray: (R, M + 1) array, where entry [r, k] is the number of entries of rows[r] among the first k merged values
+    '''
+    merged = np.unique(np.concatenate([np.asarray(row, dtype=np.float64) for row in rows]))
+
+    counts = np.zeros((len(rows), len(merged) + 1), dtype=np.int64)
+    for row_idx, row in enumerate(rows):
+        counts[row_idx, 1:] = np.searchsorted(row, merged, side='right')
+
+    return merged, counts
+
+
+def pad_rows(rows, fill=np.inf):
+    '''
+    Stack 1D arrays of different lengths into an (R, M) array padded with fill, and return it with the row lengths.
+    '''
+    lengths = np.array([len(row) for row in rows], dtype=np.int64)
+    padded = np.full((len(rows), max(1, lengths.max(initial=0))), fill, dtype=np.float64)
+    for row_idx, row in enumerate(rows):
+        padded[row_idx, :len(row)] = row
+
+    return padded, lengths
+
+
+def triangle_area(x1, y1, x2, y2, x3, y3):
+    return np.abs((x1*(y2 - y3) + x2*(y3 - y1) + x3*(y1 - y2)) / 2.0)
+
+
+def triangle_overlaps_rectangles(triangle, rect_min, rect_max):
+    '''
+    Separating axis test of one (3, 2) triangle against (M, 2) axis-aligned rectangles given by their min and max corners.
+    '''
+    overlaps = (triangle.min(axis=0) <= rect_max).all(axis=-1) & (triangle.max(axis=0) >= rect_min).all(axis=-1)
+
+    rect_corners = np.stack((
+        rect_min,
+        np.stack((rect_min[:, 0], rect_max[:, 1]), axis=-1),
+        np.stack((rect_max[:, 0], rect_min[:, 1]), axis=-1),
+        rect_max,
+    ), axis=1)
+
+    for start, end in [(0, 1), (1, 2), (2, 0)]:
+        normal = np.array([triangle[start, 1] - triangle[end, 1], triangle[end, 0] - triangle[start, 0]])
+        triangle_proj = triangle @ normal
+        rect_proj = rect_corners @ normal
+        overlaps &= (rect_proj.min(axis=-1) <= triangle_proj.max()) & (rect_proj.max(axis=-1) >= triangle_proj.min())
+
+    return overlaps
+
+
+def edge_function_mask(points, triangles, rtol=1e-5, atol=1e-8):
+    '''
+    Closed point-in-triangle test based on the signs of the three edge functions.
+
+    Each edge function is twice the signed area of the triangle formed by the edge and the point. A point is inside when
+    every edge function, signed by the triangle's orientation, is at least -(rtol * A + atol), where A is the triangle
+    area; that is, when no sub-triangle has a signed area below -(rtol * A + atol) / 2. For a point just outside a single
+    edge this is close to, but not the same as, np.isclose(A, A1 + A2 + A3) in the previous area-sum test, which accepts an
+    outside sub-area d while 2 * d * (1 - rtol) <= rtol * A + atol. Unlike that test, it does not lose precision to
+    cancellation between the summed areas at large focus distances. Degenerate triangles contain no points.
+
+    Args:
+        points (np.ndarray): (..., 2) array of (zoom, fdist) points
+        triangles (np.ndarray): (..., 3, 2) array of triangle vertices, broadcastable against points
+
+    Returns:
+        np.ndarray: boolean mask of the broadcast shape of points and triangles
+    '''
+    a, b, c = triangles[..., 0, :], triangles[..., 1, :], triangles[..., 2, :]
+
+    def edge_function(start, end, p):
+        return (end[..., 0] - start[..., 0]) * (p[..., 1] - start[..., 1]) - (end[..., 1] - start[..., 1]) * (p[..., 0] - start[..., 0])
+
+    # Twice the signed triangle area gives the orientation that every inner edge function must share
+    orientation = edge_function(a, b, c)
+    sign = np.sign(orientation)
+    tolerance = rtol * np.abs(orientation) / 2.0 + atol
+
+    inside = sign != 0
+    for start, end in [(a, b), (b, c), (c, a)]:
+        inside = inside & (sign * edge_function(start, end, points) >= -tolerance)
+
+    return inside
+
+
+def trapezoidal_weights(zoom_and_fdist, quads):
+    '''
+    Vectorized bilinear weights of trapezoidal_interpolation, with one (4, 2) quad of actual zoom and fdist values per point.
+    '''
+    zoom_0, fdist_0 = quads[:, 0, 0], quads[:, 0, 1]
+    zoom_1, fdist_1 = quads[:, 1, 0], quads[:, 1, 1]
+    zoom_2, fdist_2 = quads[:, 2, 0], quads[:, 2, 1]
+    zoom_3, fdist_3 = quads[:, 3, 0], quads[:, 3, 1]
+
+    upper_m = (fdist_3 - fdist_1) / (zoom_3 - zoom_1)
+    upper_b = fdist_3 - upper_m * zoom_3
+    lower_m = (fdist_2 - fdist_0) / (zoom_2 - zoom_0)
+    lower_b = fdist_2 - lower_m * zoom_2
+
+    upper_line = upper_m * zoom_and_fdist[:, 0] + upper_b
+    lower_line = lower_m * zoom_and_fdist[:, 0] + lower_b
+
+    fx = (zoom_and_fdist[:, 0] - zoom_0) / (zoom_2 - zoom_0)
+    fy = (zoom_and_fdist[:, 1] - lower_line) / (upper_line - lower_line)
+
+    return np.vstack(((1 - fx) * (1 - fy), (1 - fx) * fy, fx * (1 - fy), fx * fy)).T
+
+
+def triangular_weights(zoom_and_fdist, tris):
+    '''
+    Vectorized barycentric weights of triangular_interpolation, with one (3, 2) triangle of actual zoom and fdist values per point.
+    '''
+    v0 = tris[:, 1] - tris[:, 0]
+    v1 = tris[:, 2] - tris[:, 0]
+    v2s = zoom_and_fdist - tris[:, 0]
+
+    d00 = np.sum(v0 * v0, axis=-1)
+    d01 = np.sum(v0 * v1, axis=-1)
+    d11 = np.sum(v1 * v1, axis=-1)
+    d20s = np.sum(v2s * v0, axis=-1)
+    d21s = np.sum(v2s * v1, axis=-1)
+
+    denom = d00 * d11 - d01 * d01
+
+    vs = (d11 * d20s - d01 * d21s) / denom
+    us = (d00 * d21s - d01 * d20s) / denom
+    ws = 1.0 - vs - us
+
+    return np.vstack((ws, vs, us)).T
+
+
+_leave_one_out_worker_state = {}
+
+def init_leave_one_out_worker(lut, stars):
+    _leave_one_out_worker_state['lut'] = lut
+    _leave_one_out_worker_state['stars'] = stars
+
+
+def get_leave_one_out_record_worker(vertex):
+    nz, nfd = vertex
+    return _leave_one_out_worker_state['lut'].get_leave_one_out_record(nz, nfd, stars=_leave_one_out_worker_state['stars'])
+
+
 def get_axis_aligned_rectangles(points):
     rectangles = []
     seen = set()
@@ -901,11 +1971,15 @@ def visualize_LUT(selected_trial_path, lens, intrinsic='fx', save_dir='', n_zoom
     X, Y = np.meshgrid(x, y)
     input_points = np.hstack((X.flatten()[..., None], Y.flatten()[..., None]))
 
-    _, colors, used_triangles = lut.interpolate_all(input_points, intrinsic)
+    plan = lut.plan(input_points)
+    _, colors, used_triangles = lut.interpolate_all(input_points, intrinsic, plan=plan)
     lut.visualize_regions(input_points, colors, used_triangles, n_zooms=n_zooms, n_fdists=n_fdists, show=True, alpha=1.0, ecol='black', save_path=os.path.join(save_dir, f"LUT_{lut.lens}.pdf"))
 
 
 def visualize_leave_one_out_errors(focal_length_grid, focus_distance_grid, error_grid, intrinsic, lens=None, using_barycentric=None, save_path='', use_percent_error=True):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     CMAP_FOR_ERRS = 'RdYlGn_r'
     cmap = plt.get_cmap(CMAP_FOR_ERRS)
 
@@ -971,7 +2045,7 @@ def visualize_leave_one_out_errors(focal_length_grid, focus_distance_grid, error
     print(f'median error for {intrinsic}: {np.median(error_grid[~na_mask])}')
 
 
-def run_leave_one_out_experiment(selected_trial_path, lens, save_dir='', records_dir=None, intrinsic_errors_dir=None, n_zooms=150, n_fdists=150):
+def run_leave_one_out_experiment(selected_trial_path, lens, save_dir='', records_dir=None, intrinsic_errors_dir=None, n_zooms=150, n_fdists=150, n_workers=1):
     '''
     Run leave one out validation experiment.
 
@@ -982,6 +2056,7 @@ def run_leave_one_out_experiment(selected_trial_path, lens, save_dir='', records
         save_dir (str): directory to save leave-one-out visualizations
         records_dir (str): directory to save machine-readable leave-one-out records
         intrinsic_errors_dir (str): directory to save per-intrinsic leave-one-out error visualizations
+        n_workers (int): number of worker processes used to evaluate leave-one-out vertices
     '''
     if records_dir is None:
         records_dir = save_dir
@@ -996,7 +2071,7 @@ def run_leave_one_out_experiment(selected_trial_path, lens, save_dir='', records
     lut = LUT(selected_trial_path, lens)
 
     # Save leave-one-out value records
-    leave_one_out_records = lut.get_leave_one_out_records()
+    leave_one_out_records = lut.get_leave_one_out_records(n_workers=n_workers)
     leave_one_out_json_path = os.path.join(records_dir, f"{lut.lens}_leave_one_out_values.json")
     with open(leave_one_out_json_path, "w") as f:
         json.dump(leave_one_out_records, f, indent=4)
@@ -1040,11 +2115,13 @@ def run_leave_one_out_experiment(selected_trial_path, lens, save_dir='', records
 
 
 if __name__ == "__main__":
+    config = get_config()
     parser = argparse.ArgumentParser(description="Lens type and real/synthetic flag parser")
     parser.add_argument("--lens", type=str, choices=config['lenses'].keys(), required=True)
     parser.add_argument("--selected-trials-dir", type=str, help="Specify path to folder containing selected trials .json files.", default=config['lut_creation']['SELECTED_TRIALS_DIR'])
     parser.add_argument("--output-path", type=str, help="Specify root path to save visualizations.", default='outputs')
     parser.add_argument("--artifact-path", type=str, help="Specify root path to save machine-readable artifacts.", default='artifacts')
+    parser.add_argument("--n-workers", type=int, help="Number of worker processes for leave-one-out evaluation.", default=1)
     args = parser.parse_args()
 
     lens = args.lens
@@ -1073,4 +2150,5 @@ if __name__ == "__main__":
         save_dir=leave_one_out_output_path,
         records_dir=leave_one_out_records_path,
         intrinsic_errors_dir=leave_one_out_intrinsic_errors_path,
+        n_workers=args.n_workers,
     )
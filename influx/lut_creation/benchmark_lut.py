@@ -0,0 +1,163 @@
+import argparse
+import numpy as np
+import os
+import subprocess
+import sys
+import time
+
+if __name__ == "__main__":
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+    sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from common_utils import get_config
+from LUT import LUT, triangle_area
+
+
+def legacy_locate_regions(lut, input):
+    '''
+    Reference first-match region lookup: scan every region over the full input with the area-sum containment test.
+    '''
+    region_ids = np.full(input.shape[0], -1, dtype=np.int64)
+    px, py = input[:, 0], input[:, 1]
+
+    for region_id in range(lut.n_regions):
+        inside = np.zeros(input.shape[0], dtype=bool)
+
+        for triangle in lut.region_triangles[region_id]:
+            (x1, y1), (x2, y2), (x3, y3) = triangle
+
+            A = triangle_area(x1, y1, x2, y2, x3, y3)
+            A1 = triangle_area(px, py, x2, y2, x3, y3)
+            A2 = triangle_area(x1, y1, px, py, x3, y3)
+            A3 = triangle_area(x1, y1, x2, y2, px, py)
+
+            inside |= np.isclose(A, A1 + A2 + A3)
+
+        mask = inside & (region_ids == -1)
+        region_ids[mask] = region_id
+
+    return region_ids
+
+
+def sample_query_points(lut, n_points, seed=0):
+    # Uniform samples over the LUT bounding box, so both in-region and out-of-region points are exercised
+    rng = np.random.default_rng(seed)
+    region_points = lut.region_points.reshape(-1, 2)
+    lo, hi = region_points.min(axis=0), region_points.max(axis=0)
+
+    return rng.uniform(lo, hi, size=(n_points, 2))
+
+
+def sample_edge_points(lut, edge_fractions=(0.5, 0.25, 0.75, 1e-3)):
+    # Region vertices and points along every region triangle edge, so shared and outer edges are exercised; random samples
+    # rarely land on an edge
+    triangles = lut.region_triangles.reshape(-1, 3, 2)
+    points = [triangles.reshape(-1, 2)]
+    for start, end in [(0, 1), (1, 2), (2, 0)]:
+        for fraction in edge_fractions:
+            points.append(triangles[:, start] + fraction * (triangles[:, end] - triangles[:, start]))
+
+    return np.unique(np.concatenate(points), axis=0)
+
+
+def time_call(fn, *args, repeats=3):
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+def benchmark_point_location(lut, n_points, seed=0):
+    input = sample_query_points(lut, n_points, seed=seed)
+
+    legacy_time, legacy_ids = time_call(legacy_locate_regions, lut, input)
+    indexed_time, indexed_ids = time_call(lut.locate_regions, input)
+
+    n_mismatches = int((legacy_ids != indexed_ids).sum())
+
+    edge_points = sample_edge_points(lut)
+    n_edge_mismatches = int((legacy_locate_regions(lut, edge_points) != lut.locate_regions(edge_points)).sum())
+
+    print(f"Point location for lens {lut.lens} ({n_points} points, {lut.n_regions} regions)")
+    print(f"\tLegacy area-sum region scan: {legacy_time:.4f} s")
+    print(f"\tIndexed edge-function lookup: {indexed_time:.4f} s ({legacy_time / indexed_time:.1f}x)")
+    print(f"\tRegion assignment mismatches: {n_mismatches}")
+    print(f"\tRegion assignment mismatches on {edge_points.shape[0]} region vertices and edge points: {n_edge_mismatches}")
+
+    return legacy_time, indexed_time, n_mismatches
+
+
+def benchmark_rasterized_lookup(lut, n_points, zoom_step, fd_step, seed=0):
+    input = sample_query_points(lut, n_points, seed=seed)
+
+    build_time, raster = time_call(lut.rasterize, zoom_step, fd_step, repeats=1)
+    exact_time, exact = time_call(lut.interpolate_many, input)
+    raster_time, (looked_up, _) = time_call(raster.lookup, input)
+
+    max_error = np.nanmax(np.abs(looked_up - exact), axis=0)
+
+    print(f"Rasterized lookup for lens {lut.lens} ({n_points} points, {raster.nzoom}x{raster.nfdist} table)")
+    print(f"\tTable build and verification: {build_time:.4f} s ({raster.table.nbytes / 1e6:.1f} MB)")
+    print(f"\tExact interpolation: {exact_time:.4f} s")
+    print(f"\tRasterized lookup: {raster_time:.4f} s ({exact_time / raster_time:.1f}x)")
+    for intrinsic, error in zip(lut.intrinsics_ordering, max_error):
+        print(f"\tMax abs error {intrinsic}: {error:.3e}")
+
+    return exact_time, raster_time, max_error
+
+
+# Start-up commands whose run time is dominated by imports, run from this folder in fresh interpreters
+IMPORT_TIME_COMMANDS = {
+    "python -c pass": ["-c", "pass"],
+    "import common_utils": ["-c", "import common_utils"],
+    "import LUT": ["-c", "import LUT"],
+    "import generate_real_world_gt": ["-c", "import generate_real_world_gt"],
+    "import lut_service": ["-c", "import lut_service"],
+    "generate_real_world_gt.py --help": ["generate_real_world_gt.py", "--help"],
+    "lut_service.py --help": ["lut_service.py", "--help"],
+}
+
+
+def benchmark_import_time(repeats=5):
+    '''
+    Time the start-up of the ground truth entry points, best of repeats runs each. The bare interpreter is included as a
+    baseline.
+    '''
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.dirname(script_dir), script_dir, os.environ.get("PYTHONPATH", "")]))
+
+    print(f"Start-up time (best of {repeats} runs)")
+    times = {}
+    for name, args in IMPORT_TIME_COMMANDS.items():
+        run = lambda: subprocess.run([sys.executable, *args], cwd=script_dir, env=env, stdout=subprocess.DEVNULL, check=True)
+        times[name], _ = time_call(run, repeats=repeats)
+        print(f"\t{name}: {times[name]:.3f} s")
+
+    return times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark LUT query performance against the reference implementations.")
+    parser.add_argument("--lens", type=str, choices=get_config()['lenses'].keys(), help="Lens to benchmark LUT queries for. Required unless --import-time is given.")
+    parser.add_argument("--selected-trials-dir", type=str, help="Specify path to folder containing selected trials .json files.", default=get_config()['lut_creation']['SELECTED_TRIALS_DIR'])
+    parser.add_argument("--n-points", type=int, help="Number of random query points to benchmark with.", default=650000)
+    parser.add_argument("--seed", type=int, help="Random seed for query point sampling.", default=0)
+    parser.add_argument("--raster-zoom-step", type=float, help="Zoom spacing (mm) of the rasterized LUT table.", default=0.1)
+    parser.add_argument("--raster-fd-step", type=float, help="Focus distance spacing (mm) of the rasterized LUT table.", default=10.0)
+    parser.add_argument("--import-time", action="store_true", help="Only benchmark the start-up time of the ground truth entry points.")
+    parser.add_argument("--import-time-repeats", type=int, help="Runs per start-up time measurement.", default=5)
+    args = parser.parse_args()
+
+    if args.import_time:
+        benchmark_import_time(repeats=args.import_time_repeats)
+        sys.exit(0)
+
+    if args.lens is None:
+        parser.error("--lens is required unless --import-time is given")
+
+    lut = LUT(f'{args.selected_trials_dir}/{args.lens}_selected_trials.json', args.lens)
+    benchmark_point_location(lut, args.n_points, seed=args.seed)
+    benchmark_rasterized_lookup(lut, args.n_points, args.raster_zoom_step, args.raster_fd_step, seed=args.seed)
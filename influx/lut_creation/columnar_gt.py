@@ -0,0 +1,178 @@
+import argparse
+import json
+import numpy as np
+import struct
+import zipfile
+
+from utils import BELOW_TOP_BOUNDARY_REASON, INTRINSIC_NAMES, LENS_METADATA_NAMES, get_exp_name, get_vertex_id
+
+# Columnar counterpart of gt_params.json: one uncompressed .npz per video, with a float64 column block per intrinsics
+# type and LUT provenance dictionary-encoded over the LUT vertices the video uses. Uncompressed members can be memory
+# mapped straight out of the archive, so loading does not copy or parse the frame data.
+
+REGION_TYPE_NAMES = ['quadrilateral', 'triangular']
+
+
+def write_columnar_gt(path, lut, intrinsics, plan):
+    '''
+    Write the ground truth of one video as a columnar .npz file.
+
+    Args:
+        path (str or file): output .npz path, or a binary file object to write to
+        lut (LUT): LUT of the video's lens
+        intrinsics (np.ndarray): (F, 18) array of normal intrinsics, extrapolated intrinsics, and (focal length mm, focus
+            distance mm) per frame, as computed by generate_real_world_gt.interpolate_all_frames
+        plan (InterpolationPlan): interpolation plan of the video's frames in lut
+    '''
+    is_within_lut = plan.is_within_lut
+
+    # Triangles only use their first three vertices; the padded fourth vertex is dropped like in the JSON provenance
+    n_region_vertices = np.where(plan.region_types == plan.TRIANGULAR, 3, 4)
+    has_vertex = is_within_lut[:, None] & (np.arange(4)[None] < n_region_vertices[:, None])
+
+    # Dictionary-encode the LUT vertices used by this video
+    vertex_table, vertex_indices = np.unique(plan.vertex_ids[has_vertex], return_inverse=True)
+    frame_vertex_indices = np.full(plan.vertex_ids.shape, -1, dtype=np.int32)
+    frame_vertex_indices[has_vertex] = vertex_indices.reshape(-1)
+
+    zoom_idx, focus_distance_idx = np.divmod(vertex_table, lut.nfdist)
+    vertex_names = np.array([get_vertex_id(lut.lens, z, f) for z, f in zip(zoom_idx, focus_distance_idx)], dtype=str).reshape(-1)
+
+    # Frames outside the LUT and below its top boundary, which get their own provenance reason
+    below_top_boundary = ~is_within_lut & lut.is_below_top_boundary(intrinsics[:, 16:18])
+
+    lens_metadata = intrinsics[:, 16:18].copy()
+    lens_metadata[:, 1] = lens_metadata[:, 1] / 1000.0
+
+    np.savez(
+        path,
+        lens=np.array(lut.lens),
+        intrinsic_names=np.array(INTRINSIC_NAMES),
+        lens_metadata_names=np.array(LENS_METADATA_NAMES),
+        region_type_names=np.array(REGION_TYPE_NAMES),
+        intrinsics_gt=np.ascontiguousarray(intrinsics[:, :8]),
+        intrinsics_gt_extrapolated=np.ascontiguousarray(intrinsics[:, 8:16]),
+        lens_metadata=lens_metadata,
+        is_within_lut=is_within_lut,
+        below_top_boundary=below_top_boundary,
+        region_ids=plan.region_ids.astype(np.int64),
+        region_types=plan.region_types.astype(np.int8),
+        vertex_indices=frame_vertex_indices,
+        weights=np.where(has_vertex, plan.weights, np.nan),
+        vertex_names=vertex_names,
+        vertex_zoom_idx=zoom_idx.astype(np.int64),
+        vertex_focus_distance_idx=focus_distance_idx.astype(np.int64),
+    )
+
+
+def load_columnar_gt(path, mmap_mode='r'):
+    '''
+    Load a columnar ground truth .npz file as a dict of arrays.
+
+    Args:
+        path (str): .npz path written by write_columnar_gt
+        mmap_mode (str): memory-map mode for the arrays, or None to read them into memory
+
+    Returns:
+        dict: column name to array; with mmap_mode, arrays are read-only views of the file contents
+    '''
+    if mmap_mode is None:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    columns = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            name = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    columns[name] = np.lib.format.read_array(member, allow_pickle=False)
+                continue
+
+            # Member data starts after the local file header, whose extra field may differ from the central directory
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            if dtype.hasobject:
+                raise ValueError(f"Column {name} of {path} holds Python objects and cannot be memory mapped")
+
+            if int(np.prod(shape)) == 0:
+                columns[name] = np.empty(shape, dtype=dtype)
+            else:
+                order = 'F' if fortran_order else 'C'
+                columns[name] = np.memmap(path, dtype=dtype, mode=mmap_mode, offset=f.tell(), shape=shape, order=order)
+
+    return columns
+
+
+def columnar_gt_to_frames(gt):
+    '''
+    Expand columnar ground truth into the per-frame dicts stored in gt_params.json.
+    '''
+    lens = str(gt['lens'])
+    intrinsic_names = [str(name) for name in gt['intrinsic_names']]
+    lens_metadata_names = [str(name) for name in gt['lens_metadata_names']]
+    region_type_names = [str(name) for name in gt['region_type_names']]
+    below_top_boundary = gt.get('below_top_boundary', np.zeros(gt['is_within_lut'].shape[0], dtype=bool))
+
+    vertices = [
+        {
+            "zoom_idx": int(zoom_idx),
+            "focus_distance_idx": int(focus_distance_idx),
+            "exp_name": get_exp_name(zoom_idx, focus_distance_idx),
+            "vertex_id": str(vertex_name),
+        }
+        for zoom_idx, focus_distance_idx, vertex_name in zip(gt['vertex_zoom_idx'], gt['vertex_focus_distance_idx'], gt['vertex_names'])
+    ]
+
+    frames = {}
+    for i in range(gt['intrinsics_gt'].shape[0]):
+        if gt['is_within_lut'][i]:
+            frame_vertex_indices = [int(vertex_idx) for vertex_idx in gt['vertex_indices'][i] if vertex_idx >= 0]
+            provenance = {
+                "lens": lens,
+                "is_within_lut": True,
+                "region_type": region_type_names[gt['region_types'][i]],
+                "vertex_ids": [vertices[vertex_idx]["vertex_id"] for vertex_idx in frame_vertex_indices],
+                "vertices": [dict(vertices[vertex_idx]) for vertex_idx in frame_vertex_indices],
+                "weights": [float(weight) for weight in gt['weights'][i, :len(frame_vertex_indices)]],
+                "reason": "normal_interpolation_region",
+            }
+        else:
+            provenance = {
+                "lens": lens,
+                "is_within_lut": False,
+                "region_type": None,
+                "vertex_ids": [],
+                "vertices": [],
+                "weights": [],
+                "reason": BELOW_TOP_BOUNDARY_REASON if below_top_boundary[i] else "no_normal_interpolation_region",
+            }
+
+        frames[str(i)] = {
+            "intrinsics_gt": {key: float(val) for key, val in zip(intrinsic_names, gt['intrinsics_gt'][i])},
+            "intrinsics_gt_extrapolated": {key: float(val) for key, val in zip(intrinsic_names, gt['intrinsics_gt_extrapolated'][i])},
+            "lens_metadata": {key: float(val) for key, val in zip(lens_metadata_names, gt['lens_metadata'][i])},
+            "lut_provenance": provenance,
+        }
+
+    return frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export columnar ground truth (.npz) to the gt_params.json format.")
+    parser.add_argument("--input", type=str, required=True, help="Path to a columnar ground truth .npz file.")
+    parser.add_argument("--output", type=str, required=True, help="Path to write the JSON export to.")
+    args = parser.parse_args()
+
+    with open(args.output, "w") as f:
+        json.dump(columnar_gt_to_frames(load_columnar_gt(args.input)), f, indent=4)
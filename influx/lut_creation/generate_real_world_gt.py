@@ -1,27 +1,56 @@
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
 import numpy as np
 import os
 import sys
+import threading
+import time
+import zipfile
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DEFAULT_VAL_TEST_SPLIT_DIR = os.path.join(SCRIPT_DIR, "data", "val_test_split")
+GT_MANIFEST_VERSION = 1
+# Bump whenever the interpolation or extrapolation results, or the layout of the written ground truth, change, so that
+# existing ground truth is regenerated
+GT_FORMAT_VERSION = 2
+DEFAULT_PROFILE_PATH = "gt_generation_profile.json"
 
 if __name__ == "__main__":
     sys.path.append(os.path.dirname(SCRIPT_DIR))
 
-from common_utils import config
-from LUT import LUT
+from common_utils import get_config
+from columnar_gt import write_columnar_gt
+from LUT import InterpolationPlan, LUT, MultiLensLUT
+from profiling import StageProfiler
 from real_world.utils import PER_FRAME_METADATA, RAW_DATA
-from utils import GT_PARAMS
-
-
-def get_exp_name(zoom_idx, focus_distance_idx):
-    return f"zoom_{int(zoom_idx)}_focus_distance_{int(focus_distance_idx)}"
-
-
-def get_vertex_id(lens, zoom_idx, focus_distance_idx):
-    return f"{lens}:{get_exp_name(zoom_idx, focus_distance_idx)}"
+from utils import BELOW_TOP_BOUNDARY_REASON, GT_MANIFEST, GT_PARAMS, GT_PARAMS_NPZ, INTRINSIC_NAMES, LENS_METADATA_NAMES, get_exp_name, get_vertex_id
+
+# Ground truth files written per video for each output format
+GT_OUTPUT_FILES = {
+    "json": [GT_PARAMS],
+    "npz": [GT_PARAMS_NPZ],
+    "both": [GT_PARAMS, GT_PARAMS_NPZ],
+}
+
+# Coverage categories of a frame under a trusted vertex threshold, and the invalid reasons counted for them
+COVERAGE_VALID = 0
+COVERAGE_UNTRUSTED = 1
+COVERAGE_OUTSIDE = 2
+N_COVERAGE_CATEGORIES = 3
+COVERAGE_INVALID_REASONS = {
+    COVERAGE_UNTRUSTED: "has_untrusted_lut_vertex",
+    COVERAGE_OUTSIDE: "no_normal_interpolation_region",
+}
+
+# Version/split memberships a video can be counted in
+SPLIT_GROUPS = [("v1", "val"), ("v1", "test"), ("v2", "val"), ("v2", "test"), ("unassigned", "unassigned")]
+
+# Dictionary-encoded split memberships, cached next to the split files
+SPLIT_MEMBERSHIPS_CACHE = "split_memberships_cache.npz"
+# Bump whenever the layout of the split memberships cache changes, so that older caches are rebuilt
+SPLIT_MEMBERSHIPS_CACHE_VERSION = 1
 
 
 def get_vertex_record(lens, vertex):
@@ -48,120 +77,94 @@ def make_empty_lut_provenance(lens, reason="no_normal_interpolation_region"):
     }
 
 
-def make_region_lut_provenance(lut, region, region_type, weights):
-    vertices = [get_vertex_record(lut.lens, vertex) for vertex in region]
-    vertex_ids = [vertex["vertex_id"] for vertex in vertices]
+class LUTProvenance:
+    '''
+    LUT provenance of a batch of frames of one lens, stored as arrays.
 
-    return {
-        "lens": lut.lens,
-        "is_within_lut": True,
-        "region_type": region_type,
-        "vertex_ids": vertex_ids,
-        "vertices": vertices,
-        "weights": [float(weight) for weight in weights],
-        "reason": "normal_interpolation_region",
-    }
+    Each frame stores its region id (-1 if outside the LUT), region type code and (N, 4) vertex weights, as in
+    InterpolationPlan. The vertex records of each used region are built once and shared by reference between the frames of
+    that region; the per-frame provenance dicts written to gt_params.json are only built when a frame is accessed. Frames
+    outside the LUT but below its top boundary are flagged, since they have no snapped extrapolated intrinsics either.
+    '''
+    def __init__(self, lens, region_ids, region_types, weights, region_vertices, below_top_boundary=None):
+        self.lens = lens
+        self.region_ids = region_ids
+        self.region_types = region_types
+        self.weights = weights
+        self.below_top_boundary = np.zeros(region_ids.shape[0], dtype=bool) if below_top_boundary is None else below_top_boundary
 
+        # Region id to (vertex ids, vertex records) of the region
+        self.region_vertices = region_vertices
 
-def compute_trapezoidal_weights(lut, input_points, quad):
-    zoom_0, fdist_0, zoom_1, fdist_1, zoom_2, fdist_2, zoom_3, fdist_3 = lut.get_point_values(quad)
 
-    assert zoom_0 - zoom_2 == zoom_1 - zoom_3
+    @classmethod
+    def from_plan(cls, lut, plan, input_points):
+        region_vertices = {}
+        for region_id in plan.get_used_region_ids():
+            vertices = [get_vertex_record(lut.lens, vertex) for vertex in lut.get_region(region_id)]
+            region_vertices[int(region_id)] = ([vertex["vertex_id"] for vertex in vertices], vertices)
 
-    def upper_line(x):
-        m = (fdist_3 - fdist_1) / (zoom_3 - zoom_1)
-        b = fdist_3 - m * zoom_3
-        return m * x + b
+        below_top_boundary = ~plan.is_within_lut & lut.is_below_top_boundary(input_points)
+        return cls(lut.lens, plan.region_ids, plan.region_types, plan.weights, region_vertices, below_top_boundary)
 
-    def lower_line(x):
-        m = (fdist_2 - fdist_0) / (zoom_2 - zoom_0)
-        b = fdist_2 - m * zoom_2
-        return m * x + b
 
-    fx = (input_points[:, 0] - zoom_0) / (zoom_2 - zoom_0)
-    fy = (input_points[:, 1] - lower_line(input_points[:, 0])) / (
-        upper_line(input_points[:, 0]) - lower_line(input_points[:, 0])
-    )
+    @classmethod
+    def empty(cls, lens):
+        return cls(lens, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8), np.zeros((0, 4)), {})
 
-    weights = np.vstack(
-        (
-            (1 - fx) * (1 - fy),
-            (1 - fx) * fy,
-            fx * (1 - fy),
-            fx * fy,
-        )
-    ).T
 
-    return weights
+    def __len__(self):
+        return self.region_ids.shape[0]
 
 
-def compute_triangular_weights(lut, input_points, tri):
-    x_0, y_0, x_1, y_1, x_2, y_2 = lut.get_point_values(tri)
+    def __getitem__(self, idx):
+        region_id = int(self.region_ids[idx])
+        if region_id < 0:
+            if self.below_top_boundary[idx]:
+                return make_empty_lut_provenance(self.lens, reason=BELOW_TOP_BOUNDARY_REASON)
+            return make_empty_lut_provenance(self.lens)
 
-    v0 = np.array([x_1 - x_0, y_1 - y_0])
-    v1 = np.array([x_2 - x_0, y_2 - y_0])
-    v2s = input_points - np.array([[x_0, y_0]])
+        vertex_ids, vertices = self.region_vertices[region_id]
+        return {
+            "lens": self.lens,
+            "is_within_lut": True,
+            "region_type": InterpolationPlan.REGION_TYPE_NAMES[self.region_types[idx]],
+            "vertex_ids": vertex_ids,
+            "vertices": vertices,
+            "weights": self.weights[idx, :len(vertices)].tolist(),
+            "reason": "normal_interpolation_region",
+        }
 
-    d00 = np.dot(v0, v0)
-    d01 = np.dot(v0, v1)
-    d11 = np.dot(v1, v1)
-    d20s = np.dot(v2s, v0)
-    d21s = np.dot(v2s, v1)
 
-    denom = d00 * d11 - d01 * d01
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
 
-    vs = (d11 * d20s - d01 * d21s) / denom
-    us = (d00 * d21s - d01 * d20s) / denom
-    ws = 1.0 - vs - us
 
-    weights = np.vstack((ws, vs, us)).T
+    @property
+    def is_within_lut(self):
+        return self.region_ids >= 0
 
-    return weights
 
+    def take(self, indices):
+        '''
+        Return the provenance of a subset of the frames, selected by an index array, mask, or slice.
+        '''
+        return LUTProvenance(
+            self.lens,
+            self.region_ids[indices],
+            self.region_types[indices],
+            self.weights[indices],
+            self.region_vertices,
+            self.below_top_boundary[indices],
+        )
 
-def get_lut_provenance_for_inputs(lut, input_points):
-    provenance = [
-        make_empty_lut_provenance(lut.lens)
-        for _ in range(input_points.shape[0])
-    ]
-
-    assigned = np.zeros(input_points.shape[0], dtype=bool)
-
-    for quad in lut.grid_regions:
-        mask = lut.region_mask(input_points, quad) & ~assigned
-
-        if mask.sum() > 0:
-            weights = compute_trapezoidal_weights(lut, input_points[mask], quad)
-            global_indices = np.where(mask)[0]
-
-            for local_idx, global_idx in enumerate(global_indices):
-                provenance[global_idx] = make_region_lut_provenance(
-                    lut,
-                    quad,
-                    "quadrilateral",
-                    weights[local_idx],
-                )
-
-            assigned[mask] = True
-
-    for tri in lut.drone_regions:
-        mask = lut.region_mask(input_points, tri) & ~assigned
-
-        if mask.sum() > 0:
-            weights = compute_triangular_weights(lut, input_points[mask], tri)
-            global_indices = np.where(mask)[0]
 
-            for local_idx, global_idx in enumerate(global_indices):
-                provenance[global_idx] = make_region_lut_provenance(
-                    lut,
-                    tri,
-                    "triangular",
-                    weights[local_idx],
-                )
+def get_lut_provenance_for_inputs(lut, input_points, plan=None):
+    if plan is None:
+        plan = lut.plan(input_points)
 
-            assigned[mask] = True
-
-    return provenance
+    return LUTProvenance.from_plan(lut, plan, input_points)
 
 
 def threshold_key(threshold):
@@ -197,38 +200,77 @@ def make_empty_coverage_record():
     }
 
 
-def increment_reason_count(record, reason):
-    if reason is None:
-        reason = "unknown"
+def make_coverage_record(counts, first_entry_idxs):
+    '''
+    Build a coverage record from the number of frames in each coverage category.
 
-    if reason not in record["invalid_reason_counts"]:
-        record["invalid_reason_counts"][reason] = 0
+    Args:
+        counts (np.ndarray): (3,) number of reliability-valid, untrusted-vertex, and outside-LUT frames
+        first_entry_idxs (np.ndarray): (3,) position of the first frame of each category, which orders the invalid reasons
+            as they are first encountered
 
-    record["invalid_reason_counts"][reason] += 1
+    Returns:
+        dict: coverage record, with coverage fractions
+    '''
+    n_valid, n_untrusted, n_outside = (int(count) for count in counts)
 
+    record = make_empty_coverage_record()
+    record["num_total_frames"] = n_valid + n_untrusted + n_outside
+    record["num_frames_with_normal_lut_provenance"] = n_valid + n_untrusted
+    record["num_reliability_valid_frames"] = n_valid
+    record["num_frames_without_normal_lut_provenance"] = n_outside
+    record["num_frames_with_untrusted_vertices"] = n_untrusted
 
-def update_coverage_record_for_frame(record, provenance, trusted_vertices):
-    record["num_total_frames"] += 1
+    for category in sorted([COVERAGE_UNTRUSTED, COVERAGE_OUTSIDE], key=lambda category: first_entry_idxs[category]):
+        if counts[category] > 0:
+            record["invalid_reason_counts"][COVERAGE_INVALID_REASONS[category]] = int(counts[category])
 
-    vertex_ids = provenance.get("vertex_ids", [])
-    is_within_lut = provenance.get("is_within_lut", False)
+    return add_coverage_fractions(record)
 
-    if is_within_lut and len(vertex_ids) > 0:
-        record["num_frames_with_normal_lut_provenance"] += 1
 
-        all_vertices_trusted = all(
-            vertex_id in trusted_vertices
-            for vertex_id in vertex_ids
-        )
+def count_coverage_categories(region_codes, group_ids, n_groups, region_trusted):
+    '''
+    Count frame entries per threshold, group and coverage category.
 
-        if all_vertices_trusted:
-            record["num_reliability_valid_frames"] += 1
-        else:
-            record["num_frames_with_untrusted_vertices"] += 1
-            increment_reason_count(record, "has_untrusted_lut_vertex")
-    else:
-        record["num_frames_without_normal_lut_provenance"] += 1
-        increment_reason_count(record, provenance.get("reason"))
+    The category of a frame only depends on its region, so entries are first reduced to their distinct (group, region)
+    pairs, and each pair is then categorized under every threshold.
+
+    Args:
+        region_codes (np.ndarray): (E,) region of each frame entry, -1 if outside the LUT
+        group_ids (np.ndarray): (E,) group of each frame entry
+        n_groups (int): number of groups
+        region_trusted (np.ndarray): (R, T) whether all vertices of each region are trusted under each threshold
+
+    Returns:
+        counts (np.ndarray): (T, n_groups, 3) number of entries in each category
+        first_entry_idxs (np.ndarray): (T, n_groups, 3) position of the first entry of each category, E if there is none
+    '''
+    n_regions, n_thresholds = region_trusted.shape
+    n_entries = region_codes.shape[0]
+
+    # Entry counts and first entries of each (group, region) pair, where region n_regions stands for outside the LUT
+    pair_keys = group_ids * (n_regions + 1) + np.where(region_codes < 0, n_regions, region_codes)
+    pair_counts = np.bincount(pair_keys, minlength=n_groups * (n_regions + 1))
+    pair_first_entry_idxs = np.full(pair_counts.shape, n_entries)
+    np.minimum.at(pair_first_entry_idxs, pair_keys, np.arange(n_entries))
+
+    pairs = np.flatnonzero(pair_counts)
+    pair_groups, pair_regions = np.divmod(pairs, n_regions + 1)
+
+    # Category of each pair under each threshold (T, P)
+    is_within_lut = pair_regions < n_regions
+    categories = np.full((n_thresholds, pairs.shape[0]), COVERAGE_OUTSIDE)
+    categories[:, is_within_lut] = np.where(region_trusted[pair_regions[is_within_lut]].T, COVERAGE_VALID, COVERAGE_UNTRUSTED)
+
+    size = n_thresholds * n_groups * N_COVERAGE_CATEGORIES
+    keys = ((np.arange(n_thresholds)[:, None] * n_groups + pair_groups[None]) * N_COVERAGE_CATEGORIES + categories).reshape(-1)
+
+    counts = np.bincount(keys, weights=np.tile(pair_counts[pairs], n_thresholds), minlength=size).astype(np.int64)
+    first_entry_idxs = np.full(size, n_entries)
+    np.minimum.at(first_entry_idxs, keys, np.tile(pair_first_entry_idxs[pairs], n_thresholds))
+
+    shape = (n_thresholds, n_groups, N_COVERAGE_CATEGORIES)
+    return counts.reshape(shape), first_entry_idxs.reshape(shape)
 
 
 def load_split_file(path):
@@ -284,66 +326,165 @@ def load_val_test_split_sets(val_test_split_dir):
     return split_sets, split_metadata
 
 
-def get_video_split_memberships(video_name, split_sets):
-    """
-    Return all version/split memberships for a video.
+def get_split_files_signature(val_test_split_dir):
+    '''
+    Return a JSON string identifying the current contents of the split files, from their sizes and modification times,
+    and the layout of the split memberships cache.
+    '''
+    signature = {"cache_version": SPLIT_MEMBERSHIPS_CACHE_VERSION}
+    for version, split_name in SPLIT_GROUPS[:-1]:
+        path = os.path.join(val_test_split_dir, f"{split_name}_split_{version}.npy")
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature[f"{version}_{split_name}"] = [stat.st_size, stat.st_mtime_ns]
+        else:
+            signature[f"{version}_{split_name}"] = None
 
-    A video may be counted once for v1 and once for v2 if it appears in both
-    version-specific split files.
-    """
-    memberships = []
+    return json.dumps(signature, sort_keys=True)
 
-    for version in ["v1", "v2"]:
-        for split_name in ["val", "test"]:
-            if video_name in split_sets[version][split_name]:
-                memberships.append((version, split_name))
 
-    if len(memberships) == 0:
-        memberships.append(("unassigned", "unassigned"))
+def build_split_memberships(split_sets):
+    '''
+    Dictionary-encode the split sets as a sorted array of video names and a bitmask per video, where bit i is set if the
+    video is in SPLIT_GROUPS[i]. Videos in no split file have an empty bitmask and are unassigned.
+    '''
+    video_names = np.array(sorted(set().union(*(split_sets[version][split_name] for version, split_name in SPLIT_GROUPS[:-1]))), dtype=str)
+    bitmasks = np.zeros(video_names.shape[0], dtype=np.uint8)
 
-    return memberships
+    for bit, (version, split_name) in enumerate(SPLIT_GROUPS[:-1]):
+        bitmasks[np.isin(video_names, list(split_sets[version][split_name]))] |= np.uint8(1 << bit)
 
+    return video_names, bitmasks
 
-def make_empty_version_split_summary():
-    return {
-        "v1": {
-            "val": make_empty_coverage_record(),
-            "test": make_empty_coverage_record(),
-        },
-        "v2": {
-            "val": make_empty_coverage_record(),
-            "test": make_empty_coverage_record(),
-        },
-        "unassigned": make_empty_coverage_record(),
-    }
 
+def get_split_metadata(val_test_split_dir, video_names, bitmasks):
+    '''
+    Describe the split files and their overlaps from the dictionary-encoded split memberships.
+    '''
+    split_metadata = {
+        "split_dir": val_test_split_dir,
+        "files": {},
+        "warnings": [],
+    }
 
-def finalize_version_split_summary(version_split_summary):
     for version in ["v1", "v2"]:
         for split_name in ["val", "test"]:
-            add_coverage_fractions(version_split_summary[version][split_name])
+            path = os.path.join(val_test_split_dir, f"{split_name}_split_{version}.npy")
+            found = os.path.exists(path)
+
+            bit = SPLIT_GROUPS.index((version, split_name))
+            split_metadata["files"][f"{version}_{split_name}"] = {
+                "path": path,
+                "found": bool(found),
+                "num_videos": int(((bitmasks >> bit) & 1).sum()),
+            }
+
+            if not found:
+                split_metadata["warnings"].append(f"Missing split file: {path}")
+
+        overlap_mask = np.uint8((1 << SPLIT_GROUPS.index((version, "val"))) | (1 << SPLIT_GROUPS.index((version, "test"))))
+        overlap = video_names[(bitmasks & overlap_mask) == overlap_mask]
+        if len(overlap) > 0:
+            split_metadata["warnings"].append(
+                f"{version} val/test split overlap contains {len(overlap)} videos. "
+                f"Preview: {overlap[:20].tolist()}"
+            )
 
-    add_coverage_fractions(version_split_summary["unassigned"])
+    return split_metadata
+
+
+def load_split_memberships(val_test_split_dir):
+    '''
+    Load the dictionary-encoded split memberships of all videos in the split files. They are cached in
+    SPLIT_MEMBERSHIPS_CACHE next to the split files, and rebuilt when any split file changes or the cache cannot be read.
+
+    Returns:
+        np.ndarray: sorted video names
+        np.ndarray: uint8 split membership bitmask of each video, see build_split_memberships
+        dict: split file metadata of the reliability report
+    '''
+    cache_path = os.path.join(val_test_split_dir, SPLIT_MEMBERSHIPS_CACHE)
+    signature = get_split_files_signature(val_test_split_dir)
+
+    video_names = None
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path, allow_pickle=False) as cache:
+                if str(cache["signature"]) == signature:
+                    video_names, bitmasks = cache["video_names"], cache["bitmasks"]
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+            # Treat an unreadable cache as a miss; it is overwritten below
+            print(f"WARNING: Could not load split memberships cache {cache_path} ({e}), rebuilding...")
+            video_names = None
+
+    if video_names is None:
+        split_sets, _ = load_val_test_split_sets(val_test_split_dir)
+        video_names, bitmasks = build_split_memberships(split_sets)
+
+        # The split folder may be read-only or missing, in which case the memberships are rebuilt on every run
+        if os.path.isdir(val_test_split_dir):
+            try:
+                write_file_atomically(
+                    cache_path,
+                    lambda f: np.savez(f, signature=np.array(signature), video_names=video_names, bitmasks=bitmasks),
+                    mode="wb",
+                )
+            except OSError as e:
+                print(f"WARNING: Could not cache split memberships to {cache_path}: {e}")
+
+    return video_names, bitmasks, get_split_metadata(val_test_split_dir, video_names, bitmasks)
+
+
+def get_split_membership_matrix(video_names, split_video_names, split_bitmasks):
+    '''
+    Return a (V, len(SPLIT_GROUPS)) boolean matrix of the version/split memberships of each video. A video may be counted
+    once for v1 and once for v2 if it appears in both version-specific split files, and videos in no split file are
+    unassigned.
+    '''
+    video_names = np.asarray(video_names, dtype=str)
+    bitmasks = np.zeros(video_names.shape[0], dtype=np.uint8)
+
+    if split_video_names.shape[0] > 0:
+        split_idxs = np.minimum(np.searchsorted(split_video_names, video_names), split_video_names.shape[0] - 1)
+        is_in_split_files = split_video_names[split_idxs] == video_names
+        bitmasks[is_in_split_files] = split_bitmasks[split_idxs[is_in_split_files]]
+
+    memberships = ((bitmasks[:, None] >> np.arange(len(SPLIT_GROUPS) - 1, dtype=np.uint8)) & 1).astype(bool)
+    return np.hstack((memberships, (bitmasks == 0)[:, None]))
+
+
+def get_region_trust_matrix(provenance, trusted_vertex_sets):
+    '''
+    Return a (R, T) boolean matrix of whether all vertices of each region used by the provenance are trusted under each
+    threshold's trusted vertex set. Unused regions are not trusted.
+    '''
+    n_regions = max(provenance.region_vertices.keys(), default=-1) + 1
+    trusted = np.zeros((n_regions, len(trusted_vertex_sets)), dtype=bool)
+
+    for region_id, (vertex_ids, _) in provenance.region_vertices.items():
+        for threshold_idx, trusted_vertices in enumerate(trusted_vertex_sets):
+            trusted[region_id, threshold_idx] = len(vertex_ids) > 0 and all(
+                vertex_id in trusted_vertices
+                for vertex_id in vertex_ids
+            )
 
-    return version_split_summary
+    return trusted
 
 
-def update_version_split_summary(version_split_summary, video_name, provenance, trusted_vertices, split_sets):
-    memberships = get_video_split_memberships(video_name, split_sets)
+def make_version_split_summary(counts, first_entry_idxs):
+    '''
+    Build the version/split summary from (len(SPLIT_GROUPS), 3) counts and first entry positions.
+    '''
+    summary = {}
+    for split_group_idx, (version, split_name) in enumerate(SPLIT_GROUPS):
+        record = make_coverage_record(counts[split_group_idx], first_entry_idxs[split_group_idx])
 
-    for version, split_name in memberships:
         if version == "unassigned":
-            update_coverage_record_for_frame(
-                version_split_summary["unassigned"],
-                provenance,
-                trusted_vertices,
-            )
+            summary["unassigned"] = record
         else:
-            update_coverage_record_for_frame(
-                version_split_summary[version][split_name],
-                provenance,
-                trusted_vertices,
-            )
+            summary.setdefault(version, {})[split_name] = record
+
+    return summary
 
 
 def compute_frame_reliability_coverage_report(
@@ -355,13 +496,14 @@ def compute_frame_reliability_coverage_report(
     with open(trusted_lut_vertices_json, "r") as f:
         trusted_artifact = json.load(f)
 
-    split_sets, split_metadata = load_val_test_split_sets(val_test_split_dir)
+    split_video_names, split_bitmasks, split_metadata = load_split_memberships(val_test_split_dir)
 
     trusted_vertices_by_threshold_px = trusted_artifact["trusted_vertices_by_threshold_px"]
     thresholds = trusted_artifact.get(
         "epe_thresholds_px",
         sorted(trusted_vertices_by_threshold_px.keys(), key=lambda x: float(x)),
     )
+    keys = [threshold_key(threshold) for threshold in thresholds]
 
     report = {
         "trusted_lut_vertices_json": trusted_lut_vertices_json,
@@ -380,64 +522,78 @@ def compute_frame_reliability_coverage_report(
         "summary_by_lens_version_split_and_threshold_px": {},
     }
 
-    for threshold in thresholds:
-        key = threshold_key(threshold)
-
-        aggregate_record = make_empty_coverage_record()
-        version_split_record = make_empty_version_split_summary()
+    lenses = list(video_frame_provenance_by_lens.keys())
+
+    # Stack the regions of all lenses into one (R, T) trust matrix, and give every frame its stacked region (-1 if outside
+    # the LUT), lens, and video, with frames ordered by lens
+    region_trusted = [np.zeros((0, len(keys)), dtype=bool)]
+    region_codes = [np.zeros(0, dtype=np.int64)]
+    lens_codes = [np.zeros(0, dtype=np.int64)]
+    video_codes = [np.zeros(0, dtype=np.int64)]
+    video_names = []
+    n_regions = 0
+    for lens_idx, (lens, provenance) in enumerate(video_frame_provenance_by_lens.items()):
+        frame_names = np.asarray(video_frame_names_by_lens.get(lens, []), dtype=str)
+
+        if len(frame_names) != len(provenance):
+            raise ValueError(
+                f"Frame name/provenance length mismatch for lens {lens}: "
+                f"{len(frame_names)} names vs {len(provenance)} provenance records"
+            )
 
-        report["summary_by_threshold_px"][key] = aggregate_record
-        report["summary_by_lens_and_threshold_px"][key] = {}
-        report["summary_by_version_split_and_threshold_px"][key] = version_split_record
-        report["summary_by_lens_version_split_and_threshold_px"][key] = {}
+        trusted_vertex_sets = [
+            set(trusted_vertices_by_threshold_px.get(key, {}).get(lens, []))
+            for key in keys
+        ]
+        region_trusted.append(get_region_trust_matrix(provenance, trusted_vertex_sets))
+
+        region_codes.append(np.where(provenance.is_within_lut, provenance.region_ids + n_regions, -1))
+        lens_codes.append(np.full(len(provenance), lens_idx))
+        n_regions += region_trusted[-1].shape[0]
+
+        # Frames of a video are contiguous, so videos start where the frame name changes
+        video_starts = np.flatnonzero(np.r_[True, frame_names[1:] != frame_names[:-1]]) if len(frame_names) > 0 else np.zeros(0, dtype=np.int64)
+        video_codes.append(len(video_names) + np.repeat(np.arange(len(video_starts)), np.diff(np.r_[video_starts, len(frame_names)])))
+        video_names.extend(frame_names[video_starts].tolist())
+
+    region_trusted = np.concatenate(region_trusted)
+    region_codes = np.concatenate(region_codes)
+    lens_codes = np.concatenate(lens_codes)
+    video_codes = np.concatenate(video_codes)
+
+    # A frame is counted once per version/split membership of its video
+    frame_idxs, split_group_codes = np.nonzero(get_split_membership_matrix(video_names, split_video_names, split_bitmasks)[video_codes])
+
+    n_lenses = len(lenses)
+    n_split_groups = len(SPLIT_GROUPS)
+    aggregate_counts = count_coverage_categories(region_codes, np.zeros(region_codes.shape[0], dtype=np.int64), 1, region_trusted)
+    lens_counts = count_coverage_categories(region_codes, lens_codes, n_lenses, region_trusted)
+    split_counts = count_coverage_categories(region_codes[frame_idxs], split_group_codes, n_split_groups, region_trusted)
+    lens_split_counts = count_coverage_categories(
+        region_codes[frame_idxs],
+        lens_codes[frame_idxs] * n_split_groups + split_group_codes,
+        n_lenses * n_split_groups,
+        region_trusted,
+    )
 
-        for lens, provenance_list in video_frame_provenance_by_lens.items():
-            frame_names = video_frame_names_by_lens.get(lens, [])
+    for threshold_idx, key in enumerate(keys):
+        counts, first_entry_idxs = (array[threshold_idx] for array in aggregate_counts)
+        report["summary_by_threshold_px"][key] = make_coverage_record(counts[0], first_entry_idxs[0])
 
-            if len(frame_names) != len(provenance_list):
-                raise ValueError(
-                    f"Frame name/provenance length mismatch for lens {lens}: "
-                    f"{len(frame_names)} names vs {len(provenance_list)} provenance records"
-                )
+        counts, first_entry_idxs = (array[threshold_idx] for array in lens_counts)
+        report["summary_by_lens_and_threshold_px"][key] = {
+            lens: make_coverage_record(counts[lens_idx], first_entry_idxs[lens_idx])
+            for lens_idx, lens in enumerate(lenses)
+        }
 
-            lens_record = make_empty_coverage_record()
-            lens_version_split_record = make_empty_version_split_summary()
+        counts, first_entry_idxs = (array[threshold_idx] for array in split_counts)
+        report["summary_by_version_split_and_threshold_px"][key] = make_version_split_summary(counts, first_entry_idxs)
 
-            trusted_vertices = set(
-                trusted_vertices_by_threshold_px.get(key, {}).get(lens, [])
-            )
-
-            for video_name, provenance in zip(frame_names, provenance_list):
-                update_coverage_record_for_frame(
-                    aggregate_record,
-                    provenance,
-                    trusted_vertices,
-                )
-                update_coverage_record_for_frame(
-                    lens_record,
-                    provenance,
-                    trusted_vertices,
-                )
-                update_version_split_summary(
-                    version_split_record,
-                    video_name,
-                    provenance,
-                    trusted_vertices,
-                    split_sets,
-                )
-                update_version_split_summary(
-                    lens_version_split_record,
-                    video_name,
-                    provenance,
-                    trusted_vertices,
-                    split_sets,
-                )
-
-            report["summary_by_lens_and_threshold_px"][key][lens] = add_coverage_fractions(lens_record)
-            report["summary_by_lens_version_split_and_threshold_px"][key][lens] = finalize_version_split_summary(lens_version_split_record)
-
-        report["summary_by_threshold_px"][key] = add_coverage_fractions(aggregate_record)
-        report["summary_by_version_split_and_threshold_px"][key] = finalize_version_split_summary(version_split_record)
+        counts, first_entry_idxs = (array[threshold_idx].reshape(n_lenses, n_split_groups, -1) for array in lens_split_counts)
+        report["summary_by_lens_version_split_and_threshold_px"][key] = {
+            lens: make_version_split_summary(counts[lens_idx], first_entry_idxs[lens_idx])
+            for lens_idx, lens in enumerate(lenses)
+        }
 
     return report
 
@@ -480,6 +636,428 @@ def write_reliability_coverage_report(
     print(f"Wrote LUT reliability frame coverage report to {reliability_report_path}")
 
 
+def load_video_frame_metadata(video_root, video_name):
+    '''
+    Read the per-frame lens metadata of one video.
+
+    Args:
+        video_root (str): folder containing all video subfolders
+        video_name (str): video subfolder name
+
+    Returns:
+        str: lens of the video, or None if the video has no metadata file
+        np.ndarray: (num_frames, 2) array of (focal length mm, focus distance mm), in metadata frame order
+        str: SHA-256 hash of the metadata file contents
+    '''
+    metadata_path = os.path.join(video_root, video_name, PER_FRAME_METADATA)
+    if not os.path.exists(metadata_path):
+        return None, None, None
+
+    with open(metadata_path, "rb") as f:
+        raw_metadata = f.read()
+
+    metadata_hash = hashlib.sha256(raw_metadata).hexdigest()
+    metadata = json.loads(raw_metadata)
+
+    frames = metadata["frames"].values()
+    focal_lengths = np.array([frame["focal_length_mm"] for frame in frames], dtype=np.float64)
+    focus_distances = np.array([frame["focus_distance_m"] for frame in frames], dtype=np.float64) * 1000  # Store in mm for LUT lookup
+
+    return metadata["lens"], np.stack((focal_lengths, focus_distances), axis=-1), metadata_hash
+
+
+def list_video_names(video_root):
+    return [subdir for subdir in sorted(os.listdir(video_root)) if os.path.isdir(os.path.join(video_root, subdir))]
+
+
+def load_all_video_frame_metadata(video_root, n_workers=8, video_names=None, executor=None):
+    '''
+    Read the per-frame lens metadata of every video under video_root, or of the given videos, using a thread pool since
+    parsing is dominated by storage latency. The pool is n_workers threads, unless an executor is passed to reuse.
+
+    Returns:
+        list: (video_name, lens, frame_metadata, metadata_hash) tuples in sorted video order; all but video_name are None
+            for videos without a metadata file
+    '''
+    if video_names is None:
+        video_names = list_video_names(video_root)
+
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max(1, n_workers)) as executor:
+            return load_all_video_frame_metadata(video_root, video_names=video_names, executor=executor)
+
+    results = list(executor.map(lambda video_name: load_video_frame_metadata(video_root, video_name), video_names))
+
+    return [(video_name, *result) for video_name, result in zip(video_names, results)]
+
+
+def load_gt_manifest(manifest_path):
+    '''
+    Load the manifest of previously generated ground truth, or an empty one if it is missing or from another version.
+    '''
+    empty_manifest = {"version": GT_MANIFEST_VERSION, "videos": {}}
+
+    if not os.path.exists(manifest_path):
+        return empty_manifest
+
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Could not read GT manifest {manifest_path} ({e}), regenerating all videos...")
+        return empty_manifest
+
+    if manifest.get("version") != GT_MANIFEST_VERSION:
+        return empty_manifest
+
+    return manifest
+
+
+def get_lut_hash(lut):
+    '''
+    Identify the ground truth a LUT produces, from its selected trials JSON, the LUT artifact version and the ground truth
+    format version. Other code changes are not detected; rerun with --force after them.
+    '''
+    return hashlib.sha256(f"{lut.source_hash}:{LUT.ARTIFACT_VERSION}:{GT_FORMAT_VERSION}".encode()).hexdigest()
+
+
+def make_gt_manifest_entry(lens, metadata_hash, lut_hash, output_format="json", compact=False):
+    return {
+        "lens": lens,
+        "metadata_hash": metadata_hash,
+        "lut_hash": lut_hash,
+        "output_format": output_format,
+        "compact": bool(compact),
+    }
+
+
+def is_gt_up_to_date(manifest, video_root, video_name, lens, metadata_hash, lut_hash, output_format="json", compact=False):
+    '''
+    Whether a video's ground truth was generated in output_format, compact or not, from its current metadata and its
+    lens's current LUT, and still exists.
+    '''
+    entry = manifest["videos"].get(video_name)
+    if entry != make_gt_manifest_entry(lens, metadata_hash, lut_hash, output_format, compact):
+        return False
+
+    return all(
+        os.path.exists(os.path.join(video_root, video_name, RAW_DATA, filename))
+        for filename in GT_OUTPUT_FILES[output_format]
+    )
+
+
+def write_file_atomically(path, write, mode="w"):
+    '''
+    Write a file through a temporary file in the same folder, which then replaces path, so that an interrupted write never
+    leaves a truncated file at path.
+
+    Args:
+        path (str): output path
+        write (callable): function writing the file contents to an open file object
+        mode (str): file mode, "w" or "wb"
+
+    Returns:
+        int: size of the written file in bytes
+    '''
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    try:
+        with open(tmp_path, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return os.path.getsize(path)
+
+
+def write_gt_manifest(manifest_path, manifest_videos):
+    manifest = {
+        "version": GT_MANIFEST_VERSION,
+        "videos": manifest_videos,
+    }
+
+    write_file_atomically(manifest_path, lambda f: json.dump(manifest, f, indent=4))
+
+
+def load_luts(lenses, selected_trials_dir, lut_artifact_dir=None, profiler=None):
+    luts = {}
+    profiler = StageProfiler() if profiler is None else profiler
+
+    for lens in lenses:
+        selected_trial_path = f'{selected_trials_dir}/{lens}_selected_trials.json'
+
+        with profiler.stage("lut_build", lens=lens):
+            if lut_artifact_dir is None:
+                luts[lens] = LUT(selected_trial_path, lens)
+            else:
+                # Reuse the precompiled LUT unless its selected trials JSON changed since it was saved
+                luts[lens] = LUT.from_artifact(selected_trial_path, lens, os.path.join(lut_artifact_dir, f'{lens}_lut.npz'))
+
+    return luts
+
+
+def select_videos(videos, luts, manifest, video_root, force=False, output_format="json", compact=False, include_up_to_date=False):
+    '''
+    Pick the videos to interpolate, and record the manifest entries of all videos with a recognized lens.
+
+    Args:
+        videos (list): (video_name, lens, frame_metadata, metadata_hash) tuples, as returned by load_all_video_frame_metadata
+        luts (dict): lens to LUT
+        manifest (dict): manifest of previously generated ground truth
+        video_root (str): folder containing all video subfolders
+        force (bool): whether to regenerate videos with up-to-date ground truth
+        output_format (str): ground truth output format, a key of GT_OUTPUT_FILES
+        compact (bool): whether JSON ground truth is written without indentation and whitespace
+        include_up_to_date (bool): whether to also interpolate videos with up-to-date ground truth, without writing them
+
+    Returns:
+        list: (video_name, lens, frame_metadata) of the videos to interpolate, in input order
+        dict: video name to manifest entry
+        set: names of the videos whose ground truth must be written
+        int: number of videos with up-to-date ground truth
+    '''
+    selected_videos = []
+    manifest_videos = {}
+    videos_to_write = set()
+    n_up_to_date_videos = 0
+
+    for video_name, lens, frame_metadata, metadata_hash in videos:
+        if lens is None:
+            print(f'WARNING: No {PER_FRAME_METADATA} found in', os.path.join(video_root, video_name) + ', skipping...')
+            continue
+
+        if lens not in luts:
+            print(f"WARNING: Lens {lens} not recognized, skipping video {video_name}...")
+            continue
+
+        lut_hash = get_lut_hash(luts[lens])
+        manifest_videos[video_name] = make_gt_manifest_entry(lens, metadata_hash, lut_hash, output_format, compact)
+        if not force and is_gt_up_to_date(manifest, video_root, video_name, lens, metadata_hash, lut_hash, output_format, compact):
+            n_up_to_date_videos += 1
+            if not include_up_to_date:
+                continue
+        else:
+            videos_to_write.add(video_name)
+
+        selected_videos.append((video_name, lens, frame_metadata))
+
+    return selected_videos, manifest_videos, videos_to_write, n_up_to_date_videos
+
+
+def count_frames_by_lens(videos):
+    '''
+    Count the frames of each lens among (video_name, lens, frame_metadata, metadata_hash) tuples, skipping videos without
+    metadata.
+    '''
+    n_frames_by_lens = {}
+    for _, lens, frame_metadata, _ in videos:
+        if frame_metadata is not None:
+            n_frames_by_lens[lens] = n_frames_by_lens.get(lens, 0) + frame_metadata.shape[0]
+
+    return n_frames_by_lens
+
+
+def interpolate_lens_frames(multi_lens_lut, luts, frame_metadata_by_lens, profiler=None):
+    '''
+    Interpolate the frames of several lenses at once, as (lens_id, zoom, fdist) queries into one multi-lens LUT.
+
+    Args:
+        multi_lens_lut (MultiLensLUT): LUTs of all lenses
+        luts (dict): lens to LUT, as passed to multi_lens_lut
+        frame_metadata_by_lens (dict): lens to non-empty (F, 2) array of (focal length mm, focus distance mm)
+        profiler (StageProfiler): optional profiler recording the locate, interpolation, extrapolation and provenance
+            stages
+
+    Returns:
+        dict: lens to (F, 18) array of normal intrinsics, extrapolated intrinsics, and lens metadata
+        dict: lens to LUTProvenance
+        dict: lens to InterpolationPlan
+    '''
+    intrinsics_by_lens = {}
+    provenance_by_lens = {}
+    plans_by_lens = {}
+    if len(frame_metadata_by_lens) == 0:
+        return intrinsics_by_lens, provenance_by_lens, plans_by_lens
+
+    lens_inputs = [
+        np.hstack((np.full((frame_metadata.shape[0], 1), multi_lens_lut.lens_ids[lens]), frame_metadata))
+        for lens, frame_metadata in frame_metadata_by_lens.items()
+    ]
+    lens_offsets = np.cumsum([0] + [lens_input.shape[0] for lens_input in lens_inputs])
+    all_inputs = np.vstack(lens_inputs)
+
+    profiler = StageProfiler() if profiler is None else profiler
+    n_frames_by_lens = {lens: int(lens_offsets[lens_idx + 1] - lens_offsets[lens_idx]) for lens_idx, lens in enumerate(frame_metadata_by_lens.keys())}
+
+    # Locate all frames within the LUTs once, and share the plan across intrinsics and provenance
+    with profiler.shared_stage("locate", n_frames_by_lens):
+        plan = multi_lens_lut.plan(all_inputs)
+
+    # Get ground truth intrinsics, without and with extrapolation, and report lens metadata as well. All intrinsics are
+    # interpolated in one pass over the shared plan
+    with profiler.shared_stage("interpolation", n_frames_by_lens):
+        interpolated = multi_lens_lut.interpolate_many(all_inputs, INTRINSIC_NAMES, extrapolate=False, plan=plan)
+
+    with profiler.shared_stage("extrapolation", n_frames_by_lens):
+        extrapolated = multi_lens_lut.interpolate_many(all_inputs, INTRINSIC_NAMES, extrapolate=True, plan=plan)
+
+    all_intrinsics = np.hstack((interpolated, extrapolated, all_inputs[:, 1:]))
+
+    for lens_idx, lens in enumerate(frame_metadata_by_lens.keys()):
+        with profiler.stage("provenance", lens=lens, n_frames=frame_metadata_by_lens[lens].shape[0]):
+            lens_plan = multi_lens_lut.get_lens_plan(plan, all_inputs, lens)
+            provenance_by_lens[lens] = get_lut_provenance_for_inputs(luts[lens], frame_metadata_by_lens[lens], plan=lens_plan)
+
+        plans_by_lens[lens] = lens_plan
+        intrinsics_by_lens[lens] = all_intrinsics[lens_offsets[lens_idx]:lens_offsets[lens_idx + 1]]
+
+    return intrinsics_by_lens, provenance_by_lens, plans_by_lens
+
+
+def get_frame_statistics(intrinsics, provenance, plan):
+    '''
+    Return the [total, NaN normal, NaN extrapolated, normal LUT provenance, unique query] frame counts of a batch of frames.
+    '''
+    return np.array([
+        intrinsics.shape[0],
+        np.isnan(intrinsics[:, :8]).any(axis=-1).sum(),
+        np.isnan(intrinsics[:, 8:16]).any(axis=-1).sum(),
+        provenance.is_within_lut.sum(),
+        plan.n_unique,
+    ], dtype=np.int64)
+
+
+def print_lens_statistics(lens, n_videos, frame_statistics=None):
+    print(f"Found {n_videos} videos for lens {lens}")
+    print(f"\tFound {0 if frame_statistics is None else frame_statistics[0]} total frames for lens {lens}")
+
+    # Print frame statistics, if any intrinsics exist
+    if frame_statistics is None:
+        return
+
+    n_total_frames, n_nan_frames, n_nan_extrapolated_frames, n_normal_lut_provenance_frames, n_unique = (int(count) for count in frame_statistics)
+    n_cache_hits = n_total_frames - n_unique
+    cache_hit_rate = n_cache_hits / n_total_frames if n_total_frames > 0 else 0.0
+
+    print(f"\tFound {n_nan_frames} frames with NaN intrinsics for lens {lens} (outside of LUT bounds)")
+    print(f"\tFound {n_nan_extrapolated_frames} frames with NaN intrinsics after extrapolation for lens {lens}")
+    print(f"\tFound {n_total_frames - n_nan_frames} frames with non-NaN normal intrinsics for lens {lens}")
+    print(f"\tFound {n_normal_lut_provenance_frames} frames with normal LUT provenance for lens {lens}")
+    print(f"\tPercent of frames with non-NaN extrapolated intrinsics: {(n_total_frames - n_nan_extrapolated_frames) / n_total_frames * 100:.2f}%")
+    print(f"\tInterpolated {n_unique} unique (zoom, focus distance) pairs for lens {lens}; {n_cache_hits} frames served from cache (hit rate {cache_hit_rate * 100:.2f}%)")
+
+
+def make_frame_gt_record(row, provenance):
+    '''
+    Build the ground truth record of one frame, as stored in gt_params.json.
+
+    Args:
+        row (np.ndarray): (18,) normal intrinsics, extrapolated intrinsics, and (focal length mm, focus distance mm)
+        provenance (dict): LUT provenance of the frame
+    '''
+    return {
+        "intrinsics_gt": {
+            key: float(val) for key, val in zip(INTRINSIC_NAMES, row[:8])
+        },
+        "intrinsics_gt_extrapolated": {
+            key: float(val) for key, val in zip(INTRINSIC_NAMES, row[8:16])
+        },
+        "lens_metadata": {
+            key: float(val / 1000.0 if key == "focus_distance_m" else val) for key, val in zip(LENS_METADATA_NAMES, row[16:])
+            # key: float(val) for key, val in zip(LENS_METADATA_NAMES, row[16:])
+        },
+        "lut_provenance": provenance,
+    }
+
+
+def write_video_gt(video_root, video_name, lut, intrinsics, provenance, plan, output_format="json", compact=False):
+    '''
+    Write the ground truth of one video in the given output format. Each file is written atomically.
+
+    Args:
+        video_root (str): folder containing all video subfolders
+        video_name (str): video subfolder name
+        lut (LUT): LUT of the video's lens
+        intrinsics (np.ndarray): (F, 18) normal intrinsics, extrapolated intrinsics, and lens metadata of the video's frames
+        provenance (LUTProvenance): LUT provenance of the video's frames
+        plan (InterpolationPlan): interpolation plan of the video's frames
+        output_format (str): ground truth output format, a key of GT_OUTPUT_FILES
+        compact (bool): whether to write JSON without indentation and whitespace
+
+    Returns:
+        int: number of bytes written
+    '''
+    n_bytes = 0
+
+    if output_format in ["npz", "both"]:
+        gt_params_npz_path = os.path.join(video_root, video_name, RAW_DATA, GT_PARAMS_NPZ)
+        n_bytes += write_file_atomically(gt_params_npz_path, lambda f: write_columnar_gt(f, lut, intrinsics, plan), mode="wb")
+
+    if output_format not in ["json", "both"]:
+        return n_bytes
+
+    gt_intrinsics_dict = {
+        str(i): make_frame_gt_record(row, provenance[i])
+        for i, row in enumerate(intrinsics)
+    }
+
+    gt_params_path = os.path.join(video_root, video_name, RAW_DATA, GT_PARAMS)
+
+    if compact:
+        n_bytes += write_file_atomically(gt_params_path, lambda f: json.dump(gt_intrinsics_dict, f, separators=(",", ":")))
+    else:
+        n_bytes += write_file_atomically(gt_params_path, lambda f: json.dump(gt_intrinsics_dict, f, indent=4))
+
+    return n_bytes
+
+
+def write_videos_gt(video_jobs, output_format="json", compact=False, n_workers=8, profiler=None, executor=None):
+    '''
+    Write the ground truth of several videos over a thread pool, one lens at a time.
+
+    Args:
+        video_jobs (list): (video_root, video_name, lut, intrinsics, provenance, plan) of each video, as taken by
+            write_video_gt
+        output_format (str): ground truth output format, a key of GT_OUTPUT_FILES
+        compact (bool): whether to write JSON without indentation and whitespace
+        n_workers (int): number of writer threads
+        profiler (StageProfiler): optional profiler recording the writing stage of each lens
+        executor (ThreadPoolExecutor): optional thread pool to write with instead of a new one of n_workers threads
+
+    Returns:
+        int: number of bytes written
+    '''
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max(1, n_workers)) as executor:
+            return write_videos_gt(video_jobs, output_format=output_format, compact=compact, profiler=profiler, executor=executor)
+
+    profiler = StageProfiler() if profiler is None else profiler
+
+    video_jobs_by_lens = {}
+    for video_job in video_jobs:
+        video_jobs_by_lens.setdefault(video_job[2].lens, []).append(video_job)
+
+    n_bytes = 0
+    for lens, lens_video_jobs in video_jobs_by_lens.items():
+        with profiler.stage("writing", lens=lens, n_frames=sum(video_job[3].shape[0] for video_job in lens_video_jobs)):
+            n_bytes += sum(executor.map(
+                lambda video_job: write_video_gt(*video_job, output_format=output_format, compact=compact),
+                lens_video_jobs,
+            ))
+
+    return n_bytes
+
+
+def print_write_throughput(n_videos, n_bytes, write_time):
+    videos_per_s = n_videos / write_time if write_time > 0 else 0.0
+    mb_per_s = n_bytes / 1e6 / write_time if write_time > 0 else 0.0
+
+    print(f"Wrote ground truth for {n_videos} videos ({n_bytes / 1e6:.2f} MB) in {write_time:.2f} s: {videos_per_s:.1f} videos/s, {mb_per_s:.2f} MB/s")
+
+
 def interpolate_all_frames(
     video_root,
     selected_trials_dir,
@@ -487,153 +1065,271 @@ def interpolate_all_frames(
     trusted_lut_vertices_json=None,
     reliability_report_path=None,
     val_test_split_dir=DEFAULT_VAL_TEST_SPLIT_DIR,
+    lut_artifact_dir=None,
+    n_workers=8,
+    force=False,
+    manifest_path=None,
+    output_format="json",
+    compact=False,
+    profile_path=None,
 ):
+    profiler = StageProfiler()
+
     # Generate all LUTs for each lens type
-    lenses = list(config['lenses'].keys())
-    luts = {lens: LUT(f'{selected_trials_dir}/{lens}_selected_trials.json', lens) for lens in lenses}
+    lenses = list(get_config()['lenses'].keys())
+    luts = load_luts(lenses, selected_trials_dir, lut_artifact_dir=lut_artifact_dir, profiler=profiler)
+
+    # Parse all video metadata files concurrently, then group videos by lens in sorted video order
+    with profiler.shared_stage("metadata_ingestion") as n_frames_by_lens:
+        videos = load_all_video_frame_metadata(video_root, n_workers=n_workers)
+        n_frames_by_lens.update(count_frames_by_lens(videos))
+
+    # Videos whose metadata and lens LUT are unchanged since their ground truth was written are not regenerated, unless
+    # forced. The reliability report covers all frames, so they are still interpolated when it is requested
+    if manifest_path is None:
+        manifest_path = os.path.join(video_root, GT_MANIFEST)
+    manifest = load_gt_manifest(manifest_path)
+    selected_videos, manifest_videos, videos_to_write, n_up_to_date_videos = select_videos(
+        videos,
+        luts,
+        manifest,
+        video_root,
+        force=force,
+        output_format=output_format,
+        compact=compact,
+        include_up_to_date=trusted_lut_vertices_json is not None,
+    )
 
-    # Create per-lens data structures
     video_names_and_frame_counts_by_lens = {lens: [] for lens in lenses}
-    video_frame_metadata_by_lens = {lens: [] for lens in lenses}
-    video_frame_names_by_lens = {lens: [] for lens in lenses}
-    video_frame_intrinsics_by_lens = {}
-    video_frame_provenance_by_lens = {lens: [] for lens in lenses}
-
-    for subdir in sorted(os.listdir(video_root)):
-        # Check that item is a video directory, and metadata file exists
-        if os.path.isdir(os.path.join(video_root, subdir)):
-            metadata_path = os.path.join(video_root, subdir, PER_FRAME_METADATA)
-            if os.path.exists(metadata_path):
-                with open(metadata_path, "r") as f:
-                    metadata = json.load(f)
-
-                # Extract needed info from each metadata file
-                lens = metadata["lens"]
-                if lens not in lenses:
-                    print(f"WARNING: Lens {lens} not recognized, skipping video {subdir}...")
-                    continue
+    video_frame_metadata_by_lens = {}
+    video_frame_names_by_lens = {}
+    video_frame_provenance_by_lens = {lens: LUTProvenance.empty(lens) for lens in lenses}
 
-                video_name = subdir
-                num_frames = len(metadata["frames"])
-                video_names_and_frame_counts_by_lens[lens].append((video_name, num_frames))
+    video_metadata_by_lens = {lens: [] for lens in lenses}
+    for video_name, lens, frame_metadata in selected_videos:
+        video_names_and_frame_counts_by_lens[lens].append((video_name, frame_metadata.shape[0]))
+        video_metadata_by_lens[lens].append(frame_metadata)
 
-                for frame in metadata["frames"]:
-                    focus_distance = metadata["frames"][frame]["focus_distance_m"] * 1000  # Store in mm for LUT lookup
-                    focal_length = metadata["frames"][frame]["focal_length_mm"]
+    # Concatenate once per lens; video frame ranges follow from the frame counts
+    for lens in lenses:
+        video_names = [video_name for video_name, _ in video_names_and_frame_counts_by_lens[lens]]
+        frame_counts = [num_frames for _, num_frames in video_names_and_frame_counts_by_lens[lens]]
 
-                    video_frame_metadata_by_lens[lens].append([focal_length, focus_distance])
-                    video_frame_names_by_lens[lens].append(video_name)
-            else:
-                print(f'WARNING: No {PER_FRAME_METADATA} found in', os.path.join(video_root, subdir) + ', skipping...')
+        video_frame_metadata_by_lens[lens] = np.concatenate(video_metadata_by_lens[lens]) if len(frame_counts) > 0 else np.zeros((0, 2))
+        video_frame_names_by_lens[lens] = np.repeat(np.array(video_names, dtype=str), frame_counts)
 
-    # Run LUT interpolation for all frames, by lens
-    intr_keys_to_retrieve = ['fx', 'fy', 'cx', 'cy', 'k1', 'k2', 'p1', 'p2']
-    lens_metadata_to_retrieve = ['focal_length_mm', 'focus_distance_m']
+    # Run LUT interpolation for the frames of all lenses at once
+    with profiler.stage("lut_build"):
+        multi_lens_lut = MultiLensLUT(luts)
 
+    frame_metadata_by_lens = {}
     for lens in video_frame_metadata_by_lens.keys():
-        frame_metadata = np.array(video_frame_metadata_by_lens[lens])
+        frame_metadata = video_frame_metadata_by_lens[lens]
         if frame_metadata.shape[0] == 0:
             print(f"WARNING: No frames found for lens {lens}, skipping...")
             continue
 
-        intrinsics = []
-
-        # Get ground truth intrinsics, no extrapolation
-        for intr_key in intr_keys_to_retrieve:
-            result, _, _ = luts[lens].interpolate_all(frame_metadata, intr_key, extrapolate=False)
-            intrinsics.append(result)
+        frame_metadata_by_lens[lens] = frame_metadata
 
-        # Get ground truth intrinsics, with extrapolation
-        for intr_key in intr_keys_to_retrieve:
-            result, _, _ = luts[lens].interpolate_all(frame_metadata, intr_key, extrapolate=True)
-            intrinsics.append(result)
+    video_frame_intrinsics_by_lens, provenance_by_lens, video_frame_plans_by_lens = interpolate_lens_frames(multi_lens_lut, luts, frame_metadata_by_lens, profiler=profiler)
+    video_frame_provenance_by_lens.update(provenance_by_lens)
 
-        # Report lens metadata as well
-        intrinsics.append(frame_metadata)
-
-        video_frame_intrinsics_by_lens[lens] = np.hstack(intrinsics)
-        video_frame_provenance_by_lens[lens] = get_lut_provenance_for_inputs(luts[lens], frame_metadata)
+    if n_up_to_date_videos > 0:
+        print(f"Found {n_up_to_date_videos} videos with up-to-date ground truth; they will not be rewritten (use --force to regenerate them)")
 
     # Print statistics
     for lens in video_names_and_frame_counts_by_lens.keys():
-        print(f"Found {len(video_names_and_frame_counts_by_lens[lens])} videos for lens {lens}")
-        print(f"\tFound {len(video_frame_metadata_by_lens[lens])} total frames for lens {lens}")
-
-        # Compute number of frames with non-nan intrinsics, if any intrinsics exist
+        frame_statistics = None
         if lens in video_frame_intrinsics_by_lens:
-            n_nan_frames = np.isnan(video_frame_intrinsics_by_lens[lens][:, :8]).any(axis=-1).sum()
-            n_nan_extrapolated_frames = np.isnan(video_frame_intrinsics_by_lens[lens][:, 8:16]).any(axis=-1).sum()
-            n_total_frames = video_frame_intrinsics_by_lens[lens].shape[0]
-            n_normal_lut_provenance_frames = sum(
-                provenance.get("is_within_lut", False)
-                for provenance in video_frame_provenance_by_lens[lens]
+            frame_statistics = get_frame_statistics(
+                video_frame_intrinsics_by_lens[lens],
+                video_frame_provenance_by_lens[lens],
+                video_frame_plans_by_lens[lens],
             )
 
-            print(f"\tFound {n_nan_frames} frames with NaN intrinsics for lens {lens} (outside of LUT bounds)")
-            print(f"\tFound {n_nan_extrapolated_frames} frames with NaN intrinsics after extrapolation for lens {lens}")
-            print(f"\tFound {n_total_frames - n_nan_frames} frames with non-NaN normal intrinsics for lens {lens}")
-            print(f"\tFound {n_normal_lut_provenance_frames} frames with normal LUT provenance for lens {lens}")
-            print(f"\tPercent of frames with non-NaN extrapolated intrinsics: {(n_total_frames - n_nan_extrapolated_frames) / n_total_frames * 100:.2f}%")
+        print_lens_statistics(lens, len(video_names_and_frame_counts_by_lens[lens]), frame_statistics)
 
     if trusted_lut_vertices_json is not None and not dry_run:
-        write_reliability_coverage_report(
-            video_frame_provenance_by_lens,
-            video_frame_names_by_lens,
-            trusted_lut_vertices_json,
-            reliability_report_path,
-            val_test_split_dir,
-        )
+        with profiler.shared_stage("reliability_report", {lens: len(provenance) for lens, provenance in video_frame_provenance_by_lens.items()}):
+            write_reliability_coverage_report(
+                video_frame_provenance_by_lens,
+                video_frame_names_by_lens,
+                trusted_lut_vertices_json,
+                reliability_report_path,
+                val_test_split_dir,
+            )
     elif trusted_lut_vertices_json is not None and dry_run:
         print("Dry run enabled; skipping LUT reliability frame coverage report write.")
 
     if not dry_run:
-        print("Writing ground truth json to disk...")
+        print(f"Writing ground truth {output_format} to disk...")
 
-        # Write results to json files
+        # Write results to json and/or columnar npz files
+        write_start_time = time.perf_counter()
+        video_jobs = []
         for lens in video_frame_intrinsics_by_lens.keys():
             intrinsics = video_frame_intrinsics_by_lens[lens]
             provenance = video_frame_provenance_by_lens[lens]
+            plan = video_frame_plans_by_lens[lens]
             video_names_and_frame_counts = video_names_and_frame_counts_by_lens[lens]
 
             curr_intrinsics_idx = 0
             for video_name, num_frames in video_names_and_frame_counts:
                 start_idx = curr_intrinsics_idx
                 end_idx = curr_intrinsics_idx + num_frames
-                intrinsics_slice = intrinsics[start_idx:end_idx, :]
-                provenance_slice = provenance[start_idx:end_idx]
-
-                gt_intrinsics_dict = {
-                    str(i): {
-                        "intrinsics_gt": {
-                            key: float(val) for key, val in zip(intr_keys_to_retrieve, row[:8])
-                        },
-                        "intrinsics_gt_extrapolated": {
-                            key: float(val) for key, val in zip(intr_keys_to_retrieve, row[8:16])
-                        },
-                        "lens_metadata": {
-                            key: float(val / 1000.0 if key == "focus_distance_m" else val) for key, val in zip(lens_metadata_to_retrieve, row[16:])
-                            # key: float(val) for key, val in zip(lens_metadata_to_retrieve, row[16:])
-                        },
-                        "lut_provenance": provenance_slice[i],
-                    }
-                    for i, row in enumerate(intrinsics_slice)
-                }
-
-                gt_params_path = os.path.join(video_root, video_name, RAW_DATA, GT_PARAMS)
-
-                with open(gt_params_path, "w") as f:
-                    json.dump(gt_intrinsics_dict, f, indent=4)
 
                 # Update index for next video
                 curr_intrinsics_idx += num_frames
 
+                # Up-to-date videos are only interpolated for the reliability report
+                if video_name not in videos_to_write:
+                    continue
+
+                video_frames = slice(start_idx, end_idx)
+                video_jobs.append((
+                    video_root,
+                    video_name,
+                    luts[lens],
+                    intrinsics[video_frames],
+                    provenance.take(video_frames),
+                    plan.take(video_frames),
+                ))
+
+        n_bytes = write_videos_gt(video_jobs, output_format=output_format, compact=compact, n_workers=n_workers, profiler=profiler)
+        print_write_throughput(len(video_jobs), n_bytes, time.perf_counter() - write_start_time)
+
+        # Record the inputs of all current ground truth, so that the next run only regenerates what changed
+        write_gt_manifest(manifest_path, manifest_videos)
+
+    if profile_path is not None:
+        profiler.write(profile_path)
+
     return video_frame_intrinsics_by_lens
 
 
+def interpolate_all_frames_streaming(
+    video_root,
+    selected_trials_dir,
+    dry_run=False,
+    lut_artifact_dir=None,
+    n_workers=8,
+    force=False,
+    manifest_path=None,
+    output_format="json",
+    compact=False,
+    chunk_size=None,
+    profile_path=None,
+):
+    '''
+    Streaming variant of interpolate_all_frames, which reads, interpolates and writes chunk_size videos at a time, so that
+    peak memory is bounded by the largest chunk rather than the whole corpus. Chunks default to n_workers videos, so that
+    every reader and writer thread has a video, and share one thread pool. Unique query deduplication is per chunk, and
+    no reliability report is written, since it needs the provenance of all frames.
+    '''
+    chunk_size = max(1, n_workers) if chunk_size is None else max(1, chunk_size)
+
+    profiler = StageProfiler()
+
+    lenses = list(get_config()['lenses'].keys())
+    luts = load_luts(lenses, selected_trials_dir, lut_artifact_dir=lut_artifact_dir, profiler=profiler)
+    with profiler.stage("lut_build"):
+        multi_lens_lut = MultiLensLUT(luts)
+
+    if manifest_path is None:
+        manifest_path = os.path.join(video_root, GT_MANIFEST)
+    manifest = load_gt_manifest(manifest_path)
+    manifest_videos = {}
+    n_written_videos = 0
+    n_written_bytes = 0
+    write_time = 0.0
+    n_up_to_date_videos = 0
+
+    # Per lens video counts and accumulated frame statistics
+    n_videos_by_lens = {lens: 0 for lens in lenses}
+    frame_statistics_by_lens = {}
+
+    video_names = list_video_names(video_root)
+
+    # One pool reads and writes all chunks, rather than one pool per chunk
+    with ThreadPoolExecutor(max_workers=max(1, n_workers)) as executor:
+        for chunk_start in range(0, len(video_names), chunk_size):
+            with profiler.shared_stage("metadata_ingestion") as n_frames_by_lens:
+                videos = load_all_video_frame_metadata(video_root, video_names=video_names[chunk_start:chunk_start + chunk_size], executor=executor)
+                n_frames_by_lens.update(count_frames_by_lens(videos))
+
+            selected_videos, chunk_manifest_videos, videos_to_write, n_chunk_up_to_date_videos = select_videos(
+                videos,
+                luts,
+                manifest,
+                video_root,
+                force=force,
+                output_format=output_format,
+                compact=compact,
+            )
+            manifest_videos.update(chunk_manifest_videos)
+            n_up_to_date_videos += n_chunk_up_to_date_videos
+
+            # Group the chunk's videos by lens, and keep the frame range of each video
+            video_ranges_by_lens = {}
+            frame_metadata_by_lens = {}
+            for video_name, lens, frame_metadata in selected_videos:
+                n_videos_by_lens[lens] += 1
+
+                start_idx = sum(metadata.shape[0] for metadata in frame_metadata_by_lens.get(lens, []))
+                video_ranges_by_lens.setdefault(lens, []).append((video_name, slice(start_idx, start_idx + frame_metadata.shape[0])))
+                frame_metadata_by_lens.setdefault(lens, []).append(frame_metadata)
+
+            frame_metadata_by_lens = {lens: np.concatenate(metadata) for lens, metadata in frame_metadata_by_lens.items()}
+            frame_metadata_by_lens = {lens: metadata for lens, metadata in frame_metadata_by_lens.items() if metadata.shape[0] > 0}
+            intrinsics_by_lens, provenance_by_lens, plans_by_lens = interpolate_lens_frames(multi_lens_lut, luts, frame_metadata_by_lens, profiler=profiler)
+
+            video_jobs = []
+            for lens in intrinsics_by_lens.keys():
+                frame_statistics = get_frame_statistics(intrinsics_by_lens[lens], provenance_by_lens[lens], plans_by_lens[lens])
+                frame_statistics_by_lens[lens] = frame_statistics_by_lens.get(lens, 0) + frame_statistics
+
+                for video_name, video_frames in video_ranges_by_lens[lens]:
+                    video_jobs.append((
+                        video_root,
+                        video_name,
+                        luts[lens],
+                        intrinsics_by_lens[lens][video_frames],
+                        provenance_by_lens[lens].take(video_frames),
+                        plans_by_lens[lens].take(video_frames),
+                    ))
+
+            # Finish writing the chunk before reading the next one, so that memory stays bounded
+            if not dry_run:
+                write_start_time = time.perf_counter()
+                n_written_bytes += write_videos_gt(video_jobs, output_format=output_format, compact=compact, profiler=profiler, executor=executor)
+                n_written_videos += len(video_jobs)
+                write_time += time.perf_counter() - write_start_time
+
+    for lens in lenses:
+        if lens not in frame_statistics_by_lens:
+            print(f"WARNING: No frames found for lens {lens}, skipping...")
+
+    if n_up_to_date_videos > 0:
+        print(f"Found {n_up_to_date_videos} videos with up-to-date ground truth; they will not be rewritten (use --force to regenerate them)")
+
+    # Print statistics
+    for lens in lenses:
+        print_lens_statistics(lens, n_videos_by_lens[lens], frame_statistics_by_lens.get(lens))
+
+    if not dry_run:
+        print_write_throughput(n_written_videos, n_written_bytes, write_time)
+
+        # Record the inputs of all current ground truth, so that the next run only regenerates what changed
+        write_gt_manifest(manifest_path, manifest_videos)
+
+    if profile_path is not None:
+        profiler.write(profile_path)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate per-frame ground truth intrinsics for all real world videos using LUT interpolation.")
-    parser.add_argument("--video-root", type=str, help="Specify path to folder containing all of the video subfolders with frame metadata.", default=config['lut_creation']['VIDEO_ROOT'])
-    parser.add_argument("--selected-trials-dir", type=str, help="Specify path to folder containing all of the selected trials .json files.", default=config['lut_creation']['SELECTED_TRIALS_DIR'])
+    parser.add_argument("--video-root", type=str, help="Specify path to folder containing all of the video subfolders with frame metadata.", default=get_config()['lut_creation']['VIDEO_ROOT'])
+    parser.add_argument("--selected-trials-dir", type=str, help="Specify path to folder containing all of the selected trials .json files.", default=get_config()['lut_creation']['SELECTED_TRIALS_DIR'])
     parser.add_argument("--dry-run", action='store_true', help="If set, will not write to disk, but will return the interpolated results.")
     parser.add_argument(
         "--trusted-lut-vertices-json",
@@ -656,14 +1352,70 @@ if __name__ == "__main__":
         default=DEFAULT_VAL_TEST_SPLIT_DIR,
         help="Directory containing val_split_v1.npy, test_split_v1.npy, val_split_v2.npy, and test_split_v2.npy.",
     )
+    parser.add_argument(
+        "--lut-artifact-dir",
+        type=str,
+        default=None,
+        help="Optional directory of precompiled <lens>_lut.npz LUT artifacts. Artifacts are created, or rebuilt when their selected trials JSON changes.",
+    )
+    parser.add_argument("--n-workers", type=int, default=8, help="Number of threads used to read per-frame metadata files and to write ground truth files.")
+    parser.add_argument("--force", action='store_true', help="Regenerate ground truth for all videos, even if their metadata and LUT are unchanged since the last run. Required after changes to the interpolation code.")
+    parser.add_argument(
+        "--manifest-path",
+        type=str,
+        default=None,
+        help=f"Optional path of the manifest recording the inputs of the generated ground truth. Defaults to <video-root>/{GT_MANIFEST}.",
+    )
+    parser.add_argument(
+        "--output-format",
+        type=str,
+        choices=GT_OUTPUT_FILES.keys(),
+        default="json",
+        help=f"Write ground truth as {GT_PARAMS}, as columnar {GT_PARAMS_NPZ}, or both.",
+    )
+    parser.add_argument("--compact", action='store_true', help=f"Write {GT_PARAMS} without indentation and whitespace.")
+    parser.add_argument(
+        "--stream",
+        action='store_true',
+        help="Read, interpolate and write videos a chunk at a time, so that memory is bounded by the largest chunk instead of all videos.",
+    )
+    parser.add_argument("--chunk-size", type=int, default=None, help="Number of videos per chunk in --stream mode. Defaults to --n-workers.")
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="?",
+        const=DEFAULT_PROFILE_PATH,
+        default=None,
+        help=f"Write a JSON report of the wall time, frames/s and peak RSS of each stage, per lens where applicable, to this path (default {DEFAULT_PROFILE_PATH}).",
+    )
     args = parser.parse_args()
 
+    if args.stream and args.trusted_lut_vertices_json is not None:
+        parser.error("--stream does not support the LUT reliability frame coverage report, which needs all frames at once")
+
     video_root = args.video_root
     selected_trials_dir = args.selected_trials_dir
     dry_run = args.dry_run
     trusted_lut_vertices_json = args.trusted_lut_vertices_json
     reliability_report_path = args.reliability_report_path
     val_test_split_dir = args.val_test_split_dir
+    lut_artifact_dir = args.lut_artifact_dir
+
+    if args.stream:
+        interpolate_all_frames_streaming(
+            video_root,
+            selected_trials_dir,
+            dry_run=dry_run,
+            lut_artifact_dir=lut_artifact_dir,
+            n_workers=args.n_workers,
+            force=args.force,
+            manifest_path=args.manifest_path,
+            output_format=args.output_format,
+            compact=args.compact,
+            chunk_size=args.chunk_size,
+            profile_path=args.profile,
+        )
+        sys.exit(0)
 
     interpolate_all_frames(
         video_root,
@@ -672,4 +1424,11 @@ if __name__ == "__main__":
         trusted_lut_vertices_json=trusted_lut_vertices_json,
         reliability_report_path=reliability_report_path,
         val_test_split_dir=val_test_split_dir,
+        lut_artifact_dir=lut_artifact_dir,
+        n_workers=args.n_workers,
+        force=args.force,
+        manifest_path=args.manifest_path,
+        output_format=args.output_format,
+        compact=args.compact,
+        profile_path=args.profile,
     )
\ No newline at end of file
@@ -0,0 +1,182 @@
+import argparse
+import json
+import numpy as np
+import os
+import socketserver
+import stat
+import sys
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+from common_utils import get_config
+from generate_real_world_gt import interpolate_lens_frames, load_luts, make_frame_gt_record
+from LUT import MultiLensLUT
+
+# Long-running ground truth query service for newly ingested footage. All lens LUTs are built once and kept resident,
+# and each request is a JSON line holding a batch of frames:
+#
+#   {"id": 7, "frames": [{"lens": "canon17", "focal_length_mm": 35.0, "focus_distance_m": 2.5}, ...]}
+#
+# which is answered by one JSON line with the gt_params.json record of every frame, in request order:
+#
+#   {"id": 7, "frames": [{"lens": "canon17", "intrinsics_gt": {...}, "intrinsics_gt_extrapolated": {...}, ...}, ...]}
+#
+# Malformed requests are answered with {"id": ..., "error": "..."} and do not stop the service.
+
+
+class GTQueryService:
+    '''
+    Answers batches of (lens, focal length, focus distance) ground truth queries against resident LUTs.
+    '''
+    def __init__(self, luts):
+        self.luts = luts
+        self.multi_lens_lut = MultiLensLUT(luts)
+
+        # Serializes queries from concurrent socket connections
+        self.lock = threading.Lock()
+
+
+    @classmethod
+    def from_selected_trials(cls, selected_trials_dir, lut_artifact_dir=None):
+        lenses = list(get_config()['lenses'].keys())
+        return cls(load_luts(lenses, selected_trials_dir, lut_artifact_dir=lut_artifact_dir))
+
+
+    def query(self, lenses, focal_lengths_mm, focus_distances_m):
+        '''
+        Interpolate ground truth for a batch of frames.
+
+        Args:
+            lenses (list): lens of each frame
+            focal_lengths_mm (list): focal length of each frame, in mm
+            focus_distances_m (list): focus distance of each frame, in m
+
+        Returns:
+            list: gt_params.json record of each frame, with its lens, in query order
+        '''
+        lenses = np.asarray(lenses, dtype=str).reshape(-1)
+        frame_metadata = np.stack((
+            np.asarray(focal_lengths_mm, dtype=np.float64).reshape(-1),
+            np.asarray(focus_distances_m, dtype=np.float64).reshape(-1) * 1000,  # Store in mm for LUT lookup
+        ), axis=-1)
+
+        if lenses.shape[0] != frame_metadata.shape[0]:
+            raise ValueError(f"Got {lenses.shape[0]} lenses for {frame_metadata.shape[0]} frames")
+
+        unknown_lenses = sorted(set(lenses.tolist()) - set(self.luts.keys()))
+        if len(unknown_lenses) > 0:
+            raise ValueError(f"Lenses not recognized: {unknown_lenses}")
+
+        frame_idxs_by_lens = {lens: np.flatnonzero(lenses == lens) for lens in self.luts.keys()}
+        frame_idxs_by_lens = {lens: frame_idxs for lens, frame_idxs in frame_idxs_by_lens.items() if frame_idxs.shape[0] > 0}
+
+        with self.lock:
+            intrinsics_by_lens, provenance_by_lens, _ = interpolate_lens_frames(
+                self.multi_lens_lut,
+                self.luts,
+                {lens: frame_metadata[frame_idxs] for lens, frame_idxs in frame_idxs_by_lens.items()},
+            )
+
+        records = [None] * frame_metadata.shape[0]
+        for lens, frame_idxs in frame_idxs_by_lens.items():
+            provenance = provenance_by_lens[lens]
+
+            for i, (frame_idx, row) in enumerate(zip(frame_idxs, intrinsics_by_lens[lens])):
+                records[frame_idx] = {"lens": lens, **make_frame_gt_record(row, provenance[i])}
+
+        return records
+
+
+    def handle_request(self, request):
+        '''
+        Answer one decoded JSON request, see the module comment for the format.
+        '''
+        response = {"id": request.get("id")} if isinstance(request, dict) else {"id": None}
+
+        try:
+            frames = request["frames"]
+            response["frames"] = self.query(
+                [frame["lens"] for frame in frames],
+                [frame["focal_length_mm"] for frame in frames],
+                [frame["focus_distance_m"] for frame in frames],
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            response["error"] = f"{type(e).__name__}: {e}"
+        except Exception as e:
+            # Unexpected failures are answered like malformed requests, so one bad batch cannot stop the service
+            response["error"] = f"Internal error, {type(e).__name__}: {e}"
+
+        return response
+
+
+    def handle_line(self, line):
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            return json.dumps({"id": None, "error": f"Invalid JSON request: {e}"})
+
+        return json.dumps(self.handle_request(request))
+
+
+def serve_stdio(service, input_stream=sys.stdin, output_stream=sys.stdout):
+    '''
+    Answer JSON-lines requests from input_stream on output_stream until input_stream is closed.
+    '''
+    for line in input_stream:
+        if not line.strip():
+            continue
+
+        output_stream.write(service.handle_line(line) + "\n")
+        output_stream.flush()
+
+
+def serve_unix_socket(service, socket_path):
+    '''
+    Answer JSON-lines requests from any number of clients connected to a Unix domain socket at socket_path.
+    '''
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+
+                self.wfile.write((service.handle_line(line) + "\n").encode())
+                self.wfile.flush()
+
+    # Only replace a stale socket left by a previous run, never another file given by mistake
+    if os.path.exists(socket_path):
+        if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            raise FileExistsError(f"{socket_path} exists and is not a socket")
+        os.remove(socket_path)
+
+    with socketserver.ThreadingUnixStreamServer(socket_path, RequestHandler) as server:
+        print(f"Serving ground truth queries on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve per-frame ground truth intrinsics queries from resident LUTs, as JSON lines.")
+    parser.add_argument("--selected-trials-dir", type=str, help="Specify path to folder containing all of the selected trials .json files.", default=get_config()['lut_creation']['SELECTED_TRIALS_DIR'])
+    parser.add_argument(
+        "--lut-artifact-dir",
+        type=str,
+        default=None,
+        help="Optional directory of precompiled <lens>_lut.npz LUT artifacts. Artifacts are created, or rebuilt when their selected trials JSON changes.",
+    )
+    parser.add_argument("--socket", type=str, default=None, help="Serve on a Unix domain socket at this path instead of stdin/stdout.")
+    args = parser.parse_args()
+
+    service = GTQueryService.from_selected_trials(args.selected_trials_dir, lut_artifact_dir=args.lut_artifact_dir)
+    print(f"Loaded LUTs for lenses {list(service.luts.keys())}", file=sys.stderr)
+
+    if args.socket is None:
+        serve_stdio(service)
+    else:
+        serve_unix_socket(service, args.socket)
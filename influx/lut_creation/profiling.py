@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+import json
+import os
+import resource
+import sys
+import time
+
+
+def get_peak_rss_mb():
+    '''
+    Peak resident set size of this process so far, in MB.
+    '''
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak_rss / 1e6
+    return peak_rss * 1024 / 1e6
+
+
+class StageProfiler:
+    '''
+    Accumulates the wall time and processed frames of named pipeline stages, overall and per lens. Stages may be entered
+    several times, e.g. once per chunk, and their times and frame counts add up. Since the peak RSS of a process only
+    grows, each stage records the peak RSS observed when it last finished.
+    '''
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.stages = {}
+
+
+    @contextmanager
+    def stage(self, name, lens=None, n_frames=0):
+        '''
+        Time the enclosed block as stage name, optionally for one lens, which processed n_frames frames.
+        '''
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start_time, lens=lens, n_frames=n_frames)
+
+
+    @contextmanager
+    def shared_stage(self, name, n_frames_by_lens=None):
+        '''
+        Time the enclosed block as stage name, a single pass over the frames of several lenses. The yielded
+        n_frames_by_lens maps each lens to its processed frames, and may be filled in by the block when the frame counts
+        are only known once it has run.
+        '''
+        n_frames_by_lens = {} if n_frames_by_lens is None else n_frames_by_lens
+        start_time = time.perf_counter()
+        try:
+            yield n_frames_by_lens
+        finally:
+            self.add_shared(name, time.perf_counter() - start_time, n_frames_by_lens)
+
+
+    def add_shared(self, name, wall_time, n_frames_by_lens):
+        '''
+        Add a stage that processed the frames of several lenses in one pass. Its wall time cannot be measured per lens, so
+        each lens is attributed the share of the wall time of its frames.
+        '''
+        n_frames = sum(int(lens_frames) for lens_frames in n_frames_by_lens.values())
+        self.add(name, wall_time, n_frames=n_frames)
+
+        by_lens = self.stages[name]["by_lens"]
+        peak_rss_mb = get_peak_rss_mb()
+        for lens, lens_frames in n_frames_by_lens.items():
+            record = by_lens.setdefault(lens, {"wall_time_s": 0.0, "frames": 0})
+            record["wall_time_s"] += wall_time * int(lens_frames) / n_frames if n_frames > 0 else 0.0
+            record["frames"] += int(lens_frames)
+            record["peak_rss_mb"] = peak_rss_mb
+
+
+    def add(self, name, wall_time, lens=None, n_frames=0):
+        stage = self.stages.setdefault(name, {"wall_time_s": 0.0, "frames": 0, "by_lens": {}})
+        records = [stage]
+        if lens is not None:
+            records.append(stage["by_lens"].setdefault(lens, {"wall_time_s": 0.0, "frames": 0}))
+
+        peak_rss_mb = get_peak_rss_mb()
+        for record in records:
+            record["wall_time_s"] += wall_time
+            record["frames"] += int(n_frames)
+            record["peak_rss_mb"] = peak_rss_mb
+
+
+    def report(self):
+        '''
+        Return the profile as a JSON-serializable dict, with frame throughput for every stage that processed frames.
+        '''
+        def finalize(record):
+            record = dict(record)
+            record["frames_per_s"] = record["frames"] / record["wall_time_s"] if record["frames"] > 0 and record["wall_time_s"] > 0 else None
+            return record
+
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = finalize({key: val for key, val in stage.items() if key != "by_lens"})
+            if len(stage["by_lens"]) > 0:
+                stages[name]["by_lens"] = {lens: finalize(record) for lens, record in stage["by_lens"].items()}
+
+        return {
+            "total_wall_time_s": time.perf_counter() - self.start_time,
+            "peak_rss_mb": get_peak_rss_mb(),
+            "stages": stages,
+        }
+
+
+    def write(self, path):
+        if os.path.dirname(path) != "":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=4)
+
+        print(f"Wrote profile to {path}")
@@ -1,55 +1,31 @@
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import json
 import numpy as np
 import os
 import os.path as osp
 import re
-import statistics
 import sys
+import warnings
 
 if __name__ == "__main__":
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
     sys.path.append(os.path.dirname(SCRIPT_DIR))
-from common_utils import config, get_exp_settings_by_lens
+from common_utils import EXP_NAME_IDXS_PATTERN, EXP_NAME_LENS_PATTERN, get_config, get_exp_settings_by_lens, get_idxs_by_exp_name
 
 
-def select_trial(raw_fx, raw_fy, raw_cx, raw_cy, results_names):
-    to_keep = not_outlier(raw_fx) & not_outlier(raw_fy) & not_outlier(raw_cx) & not_outlier(raw_cy)
-
-    raw_fx = raw_fx[to_keep]
-    raw_fy = raw_fy[to_keep]
-    raw_cx = raw_cx[to_keep]
-    raw_cy = raw_cy[to_keep]
-    to_keep_original_indices = np.arange(len(to_keep))[to_keep]
-
-    median_fx = statistics.median(raw_fx)
-    median_fy = statistics.median(raw_fy)
-    median_cx = statistics.median(raw_cx)
-    median_cy = statistics.median(raw_cy)
-
-    # Compute percent deviation from each metric's median result
-    fx_percent_err = np.fabs(raw_fx - median_fx) / median_fx * 100
-    fy_percent_err = np.fabs(raw_fy - median_fy) / median_fy * 100
-    cx_percent_err = np.fabs(raw_cx - median_cx) / median_cx * 100
-    cy_percent_err = np.fabs(raw_cy - median_cy) / median_cy * 100
-
-    scores = fx_percent_err + fy_percent_err + cx_percent_err + cy_percent_err
-
-    selected_trial = results_names[to_keep_original_indices[np.argmin(scores)]]
-    return selected_trial
+# Intrinsics that trials are selected by, in the order of the last axis of gathered trial data
+SELECTION_INTRINSICS = ['fx', 'fy', 'cx', 'cy']
 
 def not_outlier(data):
-    # Ignore nan values for outlier bound computations
-    valid_data = data[~np.isnan(data)]
-
-    # Sort the data
-    sorted_data = sorted(valid_data)
-
-    assert len(sorted_data) >= 1  # we should have at least one valid trial due to previous checks
-
-    # Calculate Q1 and Q3
-    q1 = np.percentile(sorted_data, 25)
-    q3 = np.percentile(sorted_data, 75)
+    '''
+    Flags the non-NaN values of each row of data (..., T) that lie within 1.5 IQR of the quartiles of the row's non-NaN
+    values. Rows may be NaN padded.
+    '''
+    # Ignore nan values for outlier bound computations; rows without valid values give NaN bounds and flag nothing
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        q1, q3 = np.nanpercentile(data, [25, 75], axis=-1)
 
     # Calculate IQR
     iqr = q3 - q1
@@ -59,41 +35,167 @@ def not_outlier(data):
     upper_bound = q3 + 1.5 * iqr
 
     # Filter out the outliers
-    outlier_flags = [(x >= lower_bound and x <= upper_bound) for x in data]
+    return (data >= lower_bound[..., None]) & (data <= upper_bound[..., None])
 
-    return np.array(outlier_flags) & ~np.isnan(data)
+def select_trials(raw):
+    '''
+    Selects the representative trial of several experiments at once. Trials that are outliers in any of fx, fy, cx or cy
+    are removed, and the remaining trial with the smallest total percent deviation from the medians of the remaining trials
+    is selected.
 
-# gather all of the trial data needed to make a selection using our selection algorithm
-def gather_all_trial_data(results_dir, results_names, pause=False):
-    raw_fx = []
-    raw_fy = []
-    raw_cx = []
-    raw_cy = []
-
-    for results_name in results_names:
-        print(f"  Reading {results_dir}/{results_name}", flush=True)
-        with open(f'{results_dir}/{results_name}', 'r') as file:
+    Args:
+        raw (np.ndarray): (E, T, 4) fx, fy, cx, cy of each trial of each experiment, NaN for invalid trials and padding
+
+    Returns:
+        np.ndarray: (E,) index of the selected trial of each experiment, -1 if no trial remains
+    '''
+    to_keep = not_outlier(np.moveaxis(raw, 1, 2)).all(axis=1)
+    n_kept = to_keep.sum(axis=1)
+
+    # Median of each intrinsic over the remaining trials; experiments without any give NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        medians = np.nanmedian(np.where(to_keep[..., None], raw, np.nan), axis=1)
+
+    # Compute percent deviation from each metric's median result
+    percent_err = np.fabs(raw - medians[:, None]) / medians[:, None] * 100
+    scores = percent_err[..., 0] + percent_err[..., 1] + percent_err[..., 2] + percent_err[..., 3]
+
+    selected_trials = np.argmin(np.where(to_keep, scores, np.inf), axis=1)
+    selected_trials[n_kept == 0] = -1
+    return selected_trials
+
+def read_trial_result(path):
+    '''
+    Reads one trial result JSON, returning (result JSON, None), or (None, exception) if it cannot be read or lacks an
+    intrinsic used for selection.
+    '''
+    print(f"  Reading {path}", flush=True)
+    try:
+        with open(path, 'r') as file:
             result_json = json.load(file)
-        if(result_json == None):
-            raw_fx.append(np.nan)
-            raw_fy.append(np.nan)
-            raw_cx.append(np.nan)
-            raw_cy.append(np.nan)
-        else:
-            raw_fx.append(result_json['fx'])
-            raw_fy.append(result_json['fy'])
-            raw_cx.append(result_json['cx'])
-            raw_cy.append(result_json['cy'])
-
-    raw_fx = np.array(raw_fx)
-    raw_fy = np.array(raw_fy)
-    raw_cx = np.array(raw_cx)
-    raw_cy = np.array(raw_cy)
-
-    return raw_fx, raw_fy, raw_cx, raw_cy
-
-
-def select_trials_over_experiment(lens, exp_folders_root, empirical_mode, output_filepath, synth_selection=None, threshold=-1, threshold_cx_target=1712., threshold_cy_target=1101.):
+    except (OSError, ValueError) as e:
+        return None, e
+
+    if result_json is not None and not isinstance(result_json, dict):
+        return None, ValueError(f"{path} does not hold a JSON object")
+
+    if result_json is not None:
+        missing = [intrinsic for intrinsic in SELECTION_INTRINSICS if intrinsic not in result_json]
+        if len(missing) > 0:
+            return None, KeyError(f"{path} is missing {missing}")
+
+    return result_json, None
+
+# gather all of the trial data needed to make a selection using our selection algorithm
+def gather_all_trial_data(results_dirs, results_names, n_workers=8):
+    '''
+    Reads the trial results of several experiments concurrently.
+
+    Args:
+        results_dirs (list): results folder of each experiment
+        results_names (list): result file names of each experiment
+        n_workers (int): number of reader threads
+
+    Returns:
+        np.ndarray: (E, T, 4) fx, fy, cx, cy of each trial, NaN for null results and padding
+        list: parsed result JSONs of each experiment
+        list: exception of the first unreadable result of each experiment, or None if all results were read
+    '''
+    paths = [f'{results_dir}/{results_name}' for results_dir, names in zip(results_dirs, results_names) for results_name in names]
+    with ThreadPoolExecutor(max_workers=max(1, n_workers)) as executor:
+        results = list(executor.map(read_trial_result, paths))
+
+    n_trials = max([len(names) for names in results_names], default=0)
+    raw = np.full((len(results_dirs), n_trials, len(SELECTION_INTRINSICS)), np.nan)
+    result_jsons = []
+    read_errors = []
+
+    offset = 0
+    for exp_idx, names in enumerate(results_names):
+        exp_results = results[offset:offset + len(names)]
+        offset += len(names)
+
+        result_jsons.append([result_json for result_json, _ in exp_results])
+        read_errors.append(next((e for _, e in exp_results if e is not None), None))
+
+        for trial_idx, (result_json, _) in enumerate(exp_results):
+            if result_json is not None:
+                raw[exp_idx, trial_idx] = [result_json[intrinsic] for intrinsic in SELECTION_INTRINSICS]
+
+    return raw, result_jsons, read_errors
+
+# select the trial that works well
+def valid_result(result_name, is_real, synth_selection = None):
+    if is_real and "trial" in result_name and "result" in result_name:
+        return True
+    if not is_real:
+        # Only use eval files
+        if 'eval' not in result_name:
+            return False
+
+        # Check for one of four settings
+        is_guess = 'guess' in result_name
+        is_old = 'old' in result_name
+
+        if synth_selection == 'old_guess':
+            return is_old and is_guess
+        elif synth_selection == 'old_normal':
+            return is_old and not is_guess
+        elif synth_selection == 'new_guess':
+            return not is_old and is_guess
+        elif synth_selection == 'new_normal':
+            return not is_old and not is_guess
+    return False
+
+
+# Experiment folders whose names contain any of these are skipped
+# TODO: do we actually need this anymore?
+EXP_DESCR_TO_FILTER = ['REFILMED', 'moved', 'BAD', '.DS_Store']
+
+def should_keep_experiment(exp_name):
+    for descr in EXP_DESCR_TO_FILTER:
+        if descr in exp_name:
+            return False
+    return True
+
+def get_exp_folder_index(exp_folders_root):
+    '''
+    Lists the valid experiment folders of exp_folders_root, keyed by (lens, zoom_idx, focus_distance_idx) parsed from
+    their names. The (None, zoom_idx, focus_distance_idx) key holds the folder of that setting for any lens, which also
+    covers folder names without a lens suffix. If several folders share a key, the first one listed is kept.
+    '''
+    exp_folder_index = {}
+    for exp_name in os.listdir(exp_folders_root):
+        if not should_keep_experiment(exp_name):
+            continue
+
+        idxs_match = EXP_NAME_IDXS_PATTERN.search(exp_name)
+        if idxs_match is None:
+            continue
+        zoom_idx, focus_distance_idx = map(int, idxs_match.groups())
+
+        lens_match = EXP_NAME_LENS_PATTERN.search(exp_name)
+        if lens_match is not None:
+            exp_folder_index.setdefault((lens_match.group(1), zoom_idx, focus_distance_idx), exp_name)
+        exp_folder_index.setdefault((None, zoom_idx, focus_distance_idx), exp_name)
+
+    return exp_folder_index
+
+def get_exp_folder_name(exp_folder_index, lens, exp_key):
+    '''
+    Returns the experiment folder of setting exp_key (zoom_<i>_focus_distance_<j>), preferring a folder of this lens, or None
+    if there is none.
+    '''
+    zoom_idx, focus_distance_idx = get_idxs_by_exp_name(exp_key)
+
+    exp_name = exp_folder_index.get((lens, zoom_idx, focus_distance_idx))
+    if exp_name is None:
+        exp_name = exp_folder_index.get((None, zoom_idx, focus_distance_idx))
+    return exp_name
+
+
+def select_trials_over_experiment(lens, exp_folders_root, empirical_mode, output_filepath, synth_selection=None, threshold=-1, threshold_cx_target=1712., threshold_cy_target=1101., n_workers=8, exp_folder_index=None):
     target_lfls, target_focus_distances, target_exp_details = get_exp_settings_by_lens(lens, empirical_mode)
 
     ret = {
@@ -103,24 +205,34 @@ def select_trials_over_experiment(lens, exp_folders_root, empirical_mode, output
     }
 
     ### Get actual experiment folder
-    # Lambda to filter out bad experiments
-    # TODO: do we actually need this anymore?
-    descr_to_filter = ['REFILMED', 'moved', 'BAD', '.DS_Store']
-    def should_keep_experiment(x):
-        for descr in descr_to_filter:
-            if descr in x:
-                return False
-        return True
+    # Index of all valid experiment names in the folder, which callers selecting several lenses may list once and pass in
+    if exp_folder_index is None:
+        exp_folder_index = get_exp_folder_index(exp_folders_root)
+
+    # Read the results of all experiments concurrently, and select the representative trial of every experiment at once
+    exp_idxs = {}
+    list_errors = {}
+    results_dirs = []
+    all_results_names = []
+    for exp_key in target_exp_details:
+        exp_name = get_exp_folder_name(exp_folder_index, lens, exp_key)
+        if exp_name is None:
+            continue
 
-    # gets all valid experiment names from the folder
-    exp_names = [exp_name for exp_name in os.listdir(exp_folders_root) if should_keep_experiment(exp_name)]
+        results_dir = osp.join(exp_folders_root, exp_name, "results")
+        try:
+            results_names = [result_name for result_name in os.listdir(results_dir) if valid_result(result_name, empirical_mode, synth_selection=synth_selection)]
+        except OSError as e:
+            # Reported when the experiment is processed below
+            list_errors[exp_key] = e
+            continue
 
-    # get the experiment name
-    def get_exp_name(exp_key):
-        for exp_name in exp_names:
-            if exp_key in exp_name:
-                return exp_name
-        return None
+        exp_idxs[exp_key] = len(results_dirs)
+        results_dirs.append(results_dir)
+        all_results_names.append(results_names)
+
+    raw, result_jsons, read_errors = gather_all_trial_data(results_dirs, all_results_names, n_workers=n_workers)
+    selected_trials = select_trials(raw)
 
     # Iterate over ever single experiment
     for exp_key in target_exp_details:
@@ -166,7 +278,7 @@ def select_trials_over_experiment(lens, exp_folders_root, empirical_mode, output
             }
 
         # Find the experiment that corresponds to this key
-        exp_name = get_exp_name(exp_key)
+        exp_name = get_exp_folder_name(exp_folder_index, lens, exp_key)
         if exp_name is not None:
             curr_exp_details['zoom'] = target_info['zoom']
             curr_exp_details['board_size'] = target_info['board_size']
@@ -196,49 +308,35 @@ def select_trials_over_experiment(lens, exp_folders_root, empirical_mode, output
                     # Copy target metadata's focus_distance
                     curr_exp_details["focus_distance"] = target_info["focus_distance"]
 
-                # select the trial that works well
-                def valid_result(result_name, is_real, synth_selection = None):
-                    if is_real and "trial" in result_name and "result" in result_name:
-                        return True
-                    if not is_real:
-                        # Only use eval files
-                        if 'eval' not in result_name:
-                            return False
-
-                        # Check for one of four settings
-                        is_guess = 'guess' in result_name
-                        is_old = 'old' in result_name
-
-                        if synth_selection == 'old_guess':
-                            return is_old and is_guess
-                        elif synth_selection == 'old_normal':
-                            return is_old and not is_guess
-                        elif synth_selection == 'new_guess':
-                            return not is_old and is_guess
-                        elif synth_selection == 'new_normal':
-                            return not is_old and not is_guess
-                    return False
-
-                results_dir = osp.join(curr_exp_path, "results")
-                if empirical_mode:
-                    results_names = [result_name for result_name in os.listdir(results_dir) if valid_result(result_name, empirical_mode)]
-                else:
+                if not empirical_mode:
                     assert(synth_selection != None)
-                    results_names = [result_name for result_name in os.listdir(results_dir) if valid_result(result_name, empirical_mode, synth_selection=synth_selection)]
 
-                raw_fx, raw_fy, raw_cx, raw_cy = gather_all_trial_data(results_dir, results_names)
+                # The results of all experiments were read up front; an experiment with an unreadable result is invalid
+                read_error = list_errors.get(exp_key)
+                if read_error is None:
+                    exp_idx = exp_idxs[exp_key]
+                    results_names = all_results_names[exp_idx]
+                    read_error = read_errors[exp_idx]
+                if read_error is not None:
+                    print(f"Error processing experiment {exp_key} at path {curr_exp_path}: {read_error}")
+                    ret['exp_details'][exp_key] = curr_exp_details
+                    continue
 
                 # If no valid results found, skip filling in data
-                if np.isnan(raw_fx).all():
+                if np.isnan(raw[exp_idx, :, 0]).all():
                     # Just add what we have and skip; no valid results
                     ret['exp_details'][exp_key] = curr_exp_details
                     continue
 
-                # Select a trial and get its data
-                selected_trial_name = select_trial(raw_fx, raw_fy, raw_cx, raw_cy, results_names)
+                # Trials missing an intrinsic, or outlying in one, are removed, which may leave none
+                if selected_trials[exp_idx] < 0:
+                    print(f"WARNING: No trial of experiment {exp_key} at path {curr_exp_path} remains after outlier rejection, leaving it invalid")
+                    ret['exp_details'][exp_key] = curr_exp_details
+                    continue
 
-                with open(f'{osp.join(curr_exp_path, "results", selected_trial_name)}', 'r') as file:
-                    selected_trial_data = json.load(file)
+                # Select a trial and get its data
+                selected_trial_name = results_names[selected_trials[exp_idx]]
+                selected_trial_data = result_jsons[exp_idx][selected_trials[exp_idx]]
 
                 curr_exp_details['selected_trial'] = selected_trial_name.split("_")[1]
                 curr_exp_details['fx'] = selected_trial_data['fx']
@@ -320,7 +418,7 @@ def select_trials_over_experiment(lens, exp_folders_root, empirical_mode, output
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Per lens representative trial selection script")
-    parser.add_argument("--lens", type=str, choices=config['lenses'].keys(), required=True)
+    parser.add_argument("--lens", type=str, choices=get_config()['lenses'].keys(), required=True)
     parser.add_argument("--real", action="store_true", help="Include to specify real trial")
     parser.add_argument("--synth_selection", type=str, choices=['old_guess', 'old_normal', 'new_guess', 'new_normal'], help="Select from {old_guess, old_normal, new_guess, new_normal}")
     parser.add_argument("--threshold", type=float, help="Threshold to apply swap method", default=-1)
@@ -328,6 +426,7 @@ if __name__ == "__main__":
     parser.add_argument("--threshold-cy-target", type=float, help="The ideal cx value to compare against when applying threshold", default=1101.)
     parser.add_argument("--exp-folders-root", type=str, help="Path to folder containing all experiments to be parsed", required=True)
     parser.add_argument("--output-filepath", type=str, help="Path to .json output file containing all selected experiments and intrinsics", required=True)
+    parser.add_argument("--n-workers", type=int, help="Number of threads used to read trial result files", default=8)
     args = parser.parse_args()
 
     empirical_mode = args.real
@@ -339,5 +438,6 @@ if __name__ == "__main__":
     exp_folders_root = args.exp_folders_root
     output_filepath = args.output_filepath
 
-    # Call utility function, with all file paths determined
-    select_trials_over_experiment(lens, exp_folders_root, empirical_mode, output_filepath, synth_selection=synth_selection, threshold=threshold, threshold_cx_target=threshold_cx_target, threshold_cy_target=threshold_cy_target)
+    # Call utility function, with all file paths determined and the experiment folders listed once
+    exp_folder_index = get_exp_folder_index(exp_folders_root)
+    select_trials_over_experiment(lens, exp_folders_root, empirical_mode, output_filepath, synth_selection=synth_selection, threshold=threshold, threshold_cx_target=threshold_cx_target, threshold_cy_target=threshold_cy_target, n_workers=args.n_workers, exp_folder_index=exp_folder_index)
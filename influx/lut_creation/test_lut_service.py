@@ -0,0 +1,85 @@
+import json
+import math
+import os
+import sys
+
+import pytest
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+sys.path.insert(1, os.path.dirname(SCRIPT_DIR))
+
+from common_utils import get_config, get_experiment_params, get_thin_lens_conversions
+from LUT import LUT
+from lut_service import GTQueryService
+from utils import BELOW_TOP_BOUNDARY_REASON
+
+LENS = "canon17"
+
+
+def write_selected_trials(path, lens):
+    # Selected trials of every planned setting, with thin lens focal lengths and fixed distortion; a board size of -1 marks
+    # a drone setting
+    lens_config = get_config()['lenses'][lens]
+    lens_focal_lengths, focus_distances, experiment_indices, experiment_raw_values, board_sizes = get_experiment_params(
+        lens,
+        'arri',
+        get_config()['n_focus_distance_samples'],
+        lens_config['soft_min_focus_distance'],
+        max_board_size=lens_config['max_board_size'],
+    )
+
+    exp_details = {}
+    for (zoom_idx, focus_distance_idx), (zoom, focus_distance), board_size in zip(experiment_indices, experiment_raw_values, board_sizes):
+        _, cfl, _, _ = get_thin_lens_conversions(zoom, focus_distance)
+        exp_details[f"zoom_{zoom_idx}_focus_distance_{focus_distance_idx}"] = {
+            'zoom': float(zoom),
+            'focus_distance': float(focus_distance),
+            'board_size': 'drone' if board_size == -1 else float(board_size),
+            'selected_trial': '3' if board_size > 0 or board_size == -1 else 'invalid',
+            'fx': cfl / 28.25 * 3424,
+            'fy': cfl / 18.17 * 2202,
+            'cx': 1712.0,
+            'cy': 1101.0,
+            'k1': -0.1,
+            'k2': 0.0,
+            'p1': 0.0,
+            'p2': 0.0,
+        }
+
+    with open(path, 'w') as f:
+        json.dump({
+            'zooms': [float(zoom) for zoom in lens_focal_lengths],
+            'focus_distances': [float(focus_distance) for focus_distance in focus_distances],
+            'exp_details': exp_details,
+        }, f)
+
+
+@pytest.fixture(scope="module")
+def service(tmp_path_factory):
+    path = tmp_path_factory.mktemp("selected_trials") / f"{LENS}_selected_trials.json"
+    write_selected_trials(path, LENS)
+    return GTQueryService({LENS: LUT(str(path), LENS)})
+
+
+def test_focus_distance_below_lut_range(service):
+    lut = service.luts[LENS]
+    zoom = float(lut.approx_zooms[len(lut.approx_zooms) // 2])
+
+    response = service.handle_request({"id": 1, "frames": [
+        {"lens": LENS, "focal_length_mm": zoom, "focus_distance_m": 0.05},
+        {"lens": LENS, "focal_length_mm": zoom, "focus_distance_m": 2.5},
+    ]})
+
+    assert response["id"] == 1
+    assert "error" not in response
+
+    below_range, in_range = response["frames"]
+    assert below_range["lut_provenance"]["reason"] == BELOW_TOP_BOUNDARY_REASON
+    assert all(math.isnan(below_range["intrinsics_gt_extrapolated"][key]) for key in ['cx', 'cy', 'k1', 'k2', 'p1', 'p2'])
+    assert in_range["lut_provenance"]["is_within_lut"]
+
+
+def test_failed_request_does_not_stop_service(service):
+    assert "error" in service.handle_request({"id": 2, "frames": [{"lens": LENS}]})
+    assert "error" not in service.handle_request({"id": 3, "frames": [{"lens": LENS, "focal_length_mm": 30.0, "focus_distance_m": 2.5}]})
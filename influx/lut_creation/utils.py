@@ -1 +1,18 @@
-GT_PARAMS = 'gt_params.json'
\ No newline at end of file
+GT_PARAMS = 'gt_params.json'
+GT_PARAMS_NPZ = 'gt_params.npz'
+GT_MANIFEST = 'gt_params_manifest.json'
+
+# Intrinsics and lens metadata of every ground truth frame, in the column order of both ground truth formats
+INTRINSIC_NAMES = ['fx', 'fy', 'cx', 'cy', 'k1', 'k2', 'p1', 'p2']
+LENS_METADATA_NAMES = ['focal_length_mm', 'focus_distance_m']
+
+# LUT provenance reason of frames outside the LUT and below its top boundary, which are not extrapolated beyond fx and fy
+BELOW_TOP_BOUNDARY_REASON = 'no_normal_interpolation_region_below_top_boundary'
+
+
+def get_exp_name(zoom_idx, focus_distance_idx):
+    return f"zoom_{int(zoom_idx)}_focus_distance_{int(focus_distance_idx)}"
+
+
+def get_vertex_id(lens, zoom_idx, focus_distance_idx):
+    return f"{lens}:{get_exp_name(zoom_idx, focus_distance_idx)}"
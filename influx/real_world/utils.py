@@ -1,4 +1,3 @@
-import cv2
 import json
 import os
 import subprocess
@@ -39,6 +38,8 @@ def get_image_size(EXP_FOLDER):
         for f in files:
             path = f"{EXP_FOLDER}/{RAW_DATA}/{f}"
             if os.path.isfile(path) and os.path.splitext(path)[1].lower() in [".tiff", ".png", ".jpg", ".jpeg"]:
+                import cv2
+
                 img = cv2.imread(path)
                 return img.shape[1], img.shape[0]
         raise Exception("Unable to get size of images")
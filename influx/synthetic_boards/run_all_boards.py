@@ -5,7 +5,7 @@ import sys
 
 sys.path.append('..')
 
-from common_utils import config, get_thin_lens_conversions, get_camera_info, get_exp_settings_filename, compute_k1, get_synth_board_exp_name, get_exp_settings_by_lens, get_param_string_by_zoom_and_focus
+from common_utils import config, get_thin_lens_conversions, get_camera_info, get_exp_settings_filename, compute_k1, get_synth_board_exp_name, get_exp_settings_by_lens, get_idxs_snapping_to_settings, get_param_string
 
 if __name__ == "__main__":
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -36,7 +36,8 @@ def main(args):
         # from the experiment file instead
         zooms, focus_distances, all_exp_details = get_exp_settings_by_lens(lens, empirical_mode=False, settings_path=settings_path)
         experiment_params = np.array(np.meshgrid(zooms, focus_distances)).T.reshape(-1, 2)
-        board_sizes = [all_exp_details[get_param_string_by_zoom_and_focus(zoom, dist, lens, empirical_mode=False, settings_path=settings_path)]["board_size"] for zoom, dist in experiment_params]
+        zoom_idxs, focus_idxs = get_idxs_snapping_to_settings(experiment_params[:, 0], experiment_params[:, 1] / 1000, lens, empirical_mode=False, settings_path=settings_path)
+        board_sizes = [all_exp_details[get_param_string(zoom_idx, focus_idx)]["board_size"] for zoom_idx, focus_idx in zip(zoom_idxs, focus_idxs)]
         # include all the experiments with board_size != "drone"
         experiment_params = experiment_params[np.array(board_sizes) != "drone"]
         board_sizes = [size for size in board_sizes if size != "drone"]
@@ -12,7 +12,7 @@ if __name__ == "__main__":
 
 from run_drone_pipeline import run_drone_experiment
 
-from common_utils import config, get_exp_settings_filename, compute_k1, get_thin_lens_conversions, get_camera_info, get_synth_drone_exp_name, get_exp_settings_by_lens, get_param_string_by_zoom_and_focus
+from common_utils import config, get_exp_settings_filename, compute_k1, get_thin_lens_conversions, get_camera_info, get_synth_drone_exp_name, get_exp_settings_by_lens, get_idxs_snapping_to_settings, get_param_string
 
 
 def main(args):
@@ -52,7 +52,8 @@ def main(args):
             experiment_params = np.array(np.meshgrid(zooms, distances)).T.reshape(-1, 2)
             print("Settings from experiment file: ", experiment_params)
             # include all the experiments with board_size == "drone"
-            board_sizes = [all_exp_details[get_param_string_by_zoom_and_focus(zoom, dist, lens, empirical_mode=False, settings_path=settings_path)]["board_size"] for zoom, dist in experiment_params]
+            zoom_idxs, focus_idxs = get_idxs_snapping_to_settings(experiment_params[:, 0], experiment_params[:, 1] / 1000, lens, empirical_mode=False, settings_path=settings_path)
+            board_sizes = [all_exp_details[get_param_string(zoom_idx, focus_idx)]["board_size"] for zoom_idx, focus_idx in zip(zoom_idxs, focus_idxs)]
             experiment_params = experiment_params[np.array(board_sizes) == "drone"]
         else:
             experiment_params = np.array(hardcoded_settings).reshape(-1, 2)